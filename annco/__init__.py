@@ -0,0 +1,9 @@
+"""Headless batch tools built on the AnnCo annotation model.
+
+The model and file I/O import no GUI code, format modules are imported
+only when a file of their format is read or written (see annco.formats).
+"""
+
+from annco.formats import TierCache
+from annco.model import Annotation, Interval, Tier
+from annco.fileio import read_annotation, sniff, write_annotation, write_annotations
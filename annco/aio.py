@@ -0,0 +1,139 @@
+"""Asynchronous conversion API for asyncio programs.
+
+Parsing and serializing are CPU-bound and would block the event loop, so
+they run on a process pool, while reading and writing files run on
+threads. convert_many() keeps a bounded number of files in flight, taking
+the next job only when one finishes, so reading, converting and writing
+of different files overlap without queueing the whole input.
+"""
+
+import asyncio
+import io
+import os
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+
+from annco.fileio import atomic_output, read_annotation, write_annotation
+
+
+def _read_bytes(path) -> bytes:
+    """Returns contents of file path, run on a thread."""
+
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def _write_bytes(path, data: bytes) -> None:
+    """Writes data into path atomically, run on a thread."""
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with atomic_output(path) as f:
+        f.write(data)
+
+
+def _convert_data(data: bytes, fmt: str, tiers, window, options: dict) -> bytes:
+    """Converts contents of an annotation file in a worker process and
+    returns contents of the output file."""
+
+    ann = read_annotation(io.BytesIO(data), tiers, window)
+    output = io.BytesIO()
+    write_annotation(ann, output, fmt, **options)
+
+    return output.getvalue()
+
+
+async def convert(src, dst, fmt: str, executor, tiers=None, window=None,
+                  **options) -> dict:
+    """Converts src into dst of given output format without blocking the
+    event loop.
+
+    The file is read and written on threads and converted on executor, a
+    process pool. Returns result of the job with its status, error message
+    if any and timings in seconds, as annco.server does.
+    """
+
+    loop = asyncio.get_running_loop()
+    result = {'src': src, 'dst': dst, 'status': 'ok', 'error': None}
+    started = time.perf_counter()
+
+    try:
+        data = await asyncio.to_thread(_read_bytes, src)
+        read = time.perf_counter()
+        data = await loop.run_in_executor(executor, _convert_data, data, fmt,
+                                          tiers, window, options)
+        converted = time.perf_counter()
+        await asyncio.to_thread(_write_bytes, dst, data)
+    except Exception as e:
+        result.update(status='failed', error=f"{type(e).__name__}: {e}",
+                      timings={'total': time.perf_counter() - started})
+        return result
+
+    written = time.perf_counter()
+    result['timings'] = {'read': read - started, 'convert': converted - read,
+                         'write': written - converted, 'total': written - started}
+
+    return result
+
+
+async def convert_many(jobs, fmt: str, workers=None, limit=None, executor=None,
+                       tiers=None, window=None, **options):
+    """Converts (src, dst) jobs into given output format, yielding results
+    of convert() as files finish.
+
+    jobs is an iterable or an asynchronous iterable; at most limit files
+    (by default twice the number of workers) are in flight and the next
+    job is taken only when one of them finishes. Files are converted on
+    executor, or on a new pool of that many worker processes shut down at
+    the end. Closing the generator or cancelling the task consuming it cancels
+    files in flight; outputs are written atomically, so none is left
+    half-written.
+    """
+
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(workers)
+    limit = limit or 2 * (workers or os.cpu_count() or 1)
+
+    if hasattr(jobs, '__aiter__'):
+        job_iter = jobs.__aiter__()
+
+        async def next_job():
+            try:
+                return await job_iter.__anext__()
+            except StopAsyncIteration:
+                return None
+    else:
+        job_iter = iter(jobs)
+
+        async def next_job():
+            return next(job_iter, None)
+
+    pending = set()
+    try:
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) < limit:
+                job = await next_job()
+                if job is None:
+                    exhausted = True
+                else:
+                    src, dst = job
+                    pending.add(asyncio.ensure_future(
+                        convert(src, dst, fmt, executor, tiers, window, **options)
+                    ))
+            if not pending:
+                break
+
+            done, pending = await asyncio.wait(pending,
+                                               return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+
+    finally:
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+        if own_executor:
+            executor.shutdown(wait=False, cancel_futures=True)
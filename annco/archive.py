@@ -0,0 +1,203 @@
+"""Conversion of annotation files packed in ZIP or TAR archives.
+
+Members are streamed straight into the readers without extracting the
+archive. ZIP members are read and converted by worker processes in
+parallel, as ZIP allows random access. TAR archives can only be read
+sequentially, so members are read in order and handed to the workers for
+conversion. Outputs go into a new archive or a directory.
+"""
+
+import io
+import ntpath
+import os
+import posixpath
+import tarfile
+import zipfile
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from annco.fileio import (OUTPUT_FORMATS, iter_archive, atomic_output, read_contents,
+                          sniff_stream, strip_compression, write_annotation)
+from annco.model import Annotation
+
+
+TAR_MODES = {'.tar': 'w', '.tgz': 'w:gz', '.tar.gz': 'w:gz',
+             '.tar.bz2': 'w:bz2', '.tar.xz': 'w:xz'}
+
+_zip_files = {}  # archives opened by the current worker process
+
+
+def _archive_suffix(path) -> str:
+    """Returns ZIP or TAR suffix of path or an empty string."""
+
+    lower = path.lower()
+    for suffix in ('.zip', *TAR_MODES):
+        if lower.endswith(suffix):
+            return suffix
+
+    return ''
+
+
+def safe_member_name(name: str) -> str:
+    """Returns archive member name as a normalized relative path, without
+    leading separators or drive. Raises ValueError if it points outside the
+    output."""
+
+    path = ntpath.splitdrive(name.replace('\\', '/'))[1].lstrip('/')
+    path = posixpath.normpath(path)
+    if path in ('.', '..') or path.startswith('../'):
+        raise ValueError(f"Unsafe member name: {name}")
+
+    return path
+
+
+def member_output_name(member: str, fmt: str, compress=None) -> str:
+    """Returns name of the output for archive member."""
+
+    base = os.path.splitext(strip_compression(member))[0]
+    return base + OUTPUT_FORMATS[fmt] + (compress or '')
+
+
+def convert_data(member: str, data: bytes, fmt: str, options: dict,
+                 tiers=None, window=None) -> tuple:
+    """Converts member contents and returns (status, member, result),
+    where result is the output bytes with the problems fixed, or an error
+    message. options are those of write_annotation and repair, fixes
+    applied before writing (see annco.validate.repair).
+    """
+
+    in_fmt, encoding, stream = sniff_stream(io.BytesIO(data))
+    if in_fmt is None:
+        return 'ignored', member, None
+
+    options = dict(options)
+    fixes = options.pop('repair', None)
+    issues = []
+    try:
+        ann = Annotation.from_format(in_fmt, read_contents(stream, in_fmt, encoding),
+                                     tiers, window)
+        if fixes:
+            from annco.validate import repair
+            issues = repair(ann, fixes)
+        out = io.BytesIO()
+        write_annotation(ann, out, fmt, **options)
+    except Exception as e:
+        return 'failed', member, f"{type(e).__name__}: {e}"
+
+    return 'ok', member, (out.getvalue(), issues)
+
+
+def _convert_zip_member(archive, member: str, fmt: str, options: dict,
+                        tiers=None, window=None) -> tuple:
+    """Reads member from ZIP archive in a worker and converts it."""
+
+    if archive not in _zip_files:
+        _zip_files[archive] = zipfile.ZipFile(archive)
+
+    return convert_data(member, _zip_files[archive].read(member), fmt, options,
+                        tiers, window)
+
+
+class ArchiveWriter:
+    """Writes converted members into a ZIP or TAR archive or a directory.
+
+    The kind of output is chosen by suffix of its path, anything without
+    an archive suffix is a directory.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        suffix = _archive_suffix(path)
+        if suffix == '.zip':
+            self._zip = zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED)
+            self._tar = None
+        elif suffix:
+            self._zip = None
+            self._tar = tarfile.open(path, TAR_MODES[suffix])
+        else:
+            self._zip = self._tar = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def add(self, name: str, data: bytes) -> None:
+        """Adds output file name with contents data. Raises ValueError if
+        name points outside the output (see safe_member_name)."""
+
+        name = safe_member_name(name)
+        if self._zip is not None:
+            self._zip.writestr(name, data)
+        elif self._tar is not None:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            self._tar.addfile(info, io.BytesIO(data))
+        else:
+            dst = os.path.join(self.path, *name.split('/'))
+            os.makedirs(os.path.dirname(dst) or '.', exist_ok=True)
+            with atomic_output(dst) as f:
+                f.write(data)
+
+    def close(self) -> None:
+        if self._zip is not None:
+            self._zip.close()
+        if self._tar is not None:
+            self._tar.close()
+
+
+def convert_archive(archive, out, fmt: str, workers=None, compress=None,
+                    tiers=None, window=None, **options) -> dict:
+    """Converts annotation members of archive into out.
+
+    out is a new ZIP or TAR archive or a directory, compress suffix applies
+    to directory outputs only. tiers and window select the part of each
+    member to convert, see read_annotation. Members which are not
+    annotations are ignored. Returns a summary of the run.
+    """
+
+    summary = {'converted': [], 'ignored': 0, 'repaired': {}, 'failed': {}}
+    if _archive_suffix(out):
+        compress = None
+    workers = workers or os.cpu_count() or 1
+
+    with ProcessPoolExecutor(workers) as pool, ArchiveWriter(out) as writer:
+        pending = deque()
+
+        def collect(limit):
+            while len(pending) > limit:
+                status, member, result = pending.popleft().result()
+                if status == 'ok':
+                    data, issues = result
+                    try:
+                        writer.add(member_output_name(member, fmt, compress), data)
+                    except ValueError as e:
+                        summary['failed'][member] = str(e)
+                        continue
+                    summary['converted'].append(member)
+                    if issues:
+                        summary['repaired'][member] = issues
+                elif status == 'ignored':
+                    summary['ignored'] += 1
+                else:
+                    summary['failed'][member] = result
+
+        if zipfile.is_zipfile(archive):
+            with zipfile.ZipFile(archive) as zf:
+                members = [i.filename for i in zf.infolist() if not i.is_dir()]
+            path = os.path.abspath(archive)
+            for member in members:
+                pending.append(pool.submit(_convert_zip_member, path, member,
+                                           fmt, options, tiers, window))
+                collect(4 * workers)
+        else:
+            for member, stream in iter_archive(archive):
+                pending.append(pool.submit(convert_data, member, stream.read(),
+                                           fmt, options, tiers, window))
+                collect(4 * workers)
+
+        collect(0)
+
+    return summary
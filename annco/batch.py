@@ -0,0 +1,421 @@
+"""Batch conversion of annotation corpora.
+
+Converts every annotation file under a source directory into the selected
+output format, mirroring the directory layout. With a manifest the run is
+incremental: inputs unchanged since the previous run are skipped, outputs
+of removed inputs are deleted and only changed files are converted. With a
+journal an interrupted run can be restarted and resumes where it stopped.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+
+from annco.fileio import (COMPRESSIONS, OUTPUT_FORMATS, TG_MODES, is_archive,
+                          read_annotation, sniff, strip_compression, write_annotation)
+from annco.archive import convert_archive
+from annco.scheduler import Scheduler
+
+
+HASH_CHUNK = 1 << 20
+
+# options of write_annotation which do not change the output
+RUNTIME_OPTIONS = ('write_workers',)
+
+
+def convert_file(src, dst, fmt: str, tiers=None, window=None, repair=None,
+                 **options) -> list:
+    """Converts a single annotation file into dst of given output format.
+
+    tiers and window select the part of the file to convert, see
+    read_annotation. If repair is a collection of fixes, problems of the
+    annotation are fixed before it is written (see annco.validate.repair).
+    Returns the problems found.
+    """
+
+    ann = read_annotation(src, tiers, window)
+    issues = []
+    if repair:
+        from annco.validate import repair as repair_issues
+        issues = repair_issues(ann, repair)
+    os.makedirs(os.path.dirname(dst) or '.', exist_ok=True)
+    write_annotation(ann, dst, fmt, **options)
+
+    return issues
+
+
+def output_path(src, src_root, out_root, fmt: str, compress=None) -> str:
+    """Returns path of the output file for src mirrored under out_root.
+
+    compress is a compression suffix such as '.gz' added to the output.
+    """
+
+    rel = strip_compression(os.path.relpath(src, src_root))
+    return os.path.join(out_root, os.path.splitext(rel)[0]
+                        + OUTPUT_FORMATS[fmt] + (compress or ''))
+
+
+def iter_inputs(src_root):
+    """Yields paths of all files under src_root in a stable order."""
+
+    for dirpath, dirnames, filenames in os.walk(src_root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            yield os.path.join(dirpath, name)
+
+
+def file_hash(path) -> str:
+    """Returns hex digest of the file contents."""
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+class Manifest:
+    """Records converted inputs to skip unchanged ones in later runs.
+
+    Maps input path to its size, mtime, content hash, output options and
+    output path. Size and mtime are compared first, the file is hashed only
+    when they differ, so touched but unchanged files are not reconverted.
+    """
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        try:
+            with open(path, encoding='UTF-8') as f:
+                self.entries = json.load(f)
+        except FileNotFoundError:
+            self.entries = {}
+
+    def __contains__(self, src):
+        return src in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def is_current(self, src, stat, options: dict, dst) -> bool:
+        """Returns True if src is converted into dst with the same options
+        and has not changed since.
+        """
+
+        entry = self.entries.get(src)
+        if (entry is None or entry['options'] != options
+                or entry['output'] != dst or not os.path.exists(dst)):
+            return False
+
+        if entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime_ns:
+            return True
+        if entry['size'] != stat.st_size or entry['hash'] != file_hash(src):
+            return False
+
+        entry['mtime'] = stat.st_mtime_ns
+        return True
+
+    def record(self, src, stat, options: dict, dst, digest=None) -> str:
+        """Records src as converted into dst, with digest of its contents
+        if it is already known. Returns the output path previously recorded
+        for src if it differs from dst, else None."""
+
+        previous = self.entries.get(src, {}).get('output')
+        self.entries[src] = {
+            'size': stat.st_size,
+            'mtime': stat.st_mtime_ns,
+            'hash': digest or file_hash(src),
+            'options': options,
+            'output': dst,
+        }
+
+        return previous if previous != dst else None
+
+    def forget(self, src) -> str:
+        """Removes src from the manifest and returns its output path."""
+
+        return self.entries.pop(src)['output']
+
+    def save(self) -> None:
+        """Writes manifest atomically next to its final location."""
+
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='UTF-8') as f:
+            json.dump(self.entries, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.path)
+
+
+class Journal:
+    """Append-only log of files converted by a run, for resuming it.
+
+    The first line holds the run parameters, every further line an input
+    converted into its output with its size and mtime at that moment.
+    Lines are flushed as they are written, so the journal survives an
+    interrupted run; a partially written last line is ignored. Outputs are
+    written atomically, so every journalled output is complete.
+    """
+
+    def __init__(self, path, run: dict):
+        self.path = path
+        self.entries = {}
+
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            data = b''
+
+        # drop a line left partially written by an interrupted run
+        complete = data[:data.rfind(b'\n') + 1]
+        if len(complete) < len(data):
+            os.truncate(path, len(complete))
+
+        records = [json.loads(line) for line in complete.decode('UTF-8').splitlines()]
+        if records and records[0] != run:
+            raise ValueError(f"Journal {path} belongs to a different run")
+        for entry in records[1:]:
+            self.entries[entry['src']] = entry
+
+        self._file = open(path, 'a', encoding='UTF-8')
+        if not records:
+            self._write(run)
+
+    def _write(self, record: dict) -> None:
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._file.flush()
+
+    def is_done(self, src, stat, dst) -> bool:
+        """Returns True if src is journalled as converted into dst and has
+        not changed since.
+        """
+
+        entry = self.entries.get(src)
+        return (entry is not None and entry['dst'] == dst
+                and entry['size'] == stat.st_size
+                and entry['mtime'] == stat.st_mtime_ns
+                and os.path.exists(dst))
+
+    def record(self, src, stat, dst) -> None:
+        """Appends src as converted into dst."""
+
+        entry = {'src': src, 'dst': dst, 'size': stat.st_size,
+                 'mtime': stat.st_mtime_ns}
+        self.entries[src] = entry
+        self._write(entry)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def convert_corpus(src_root, out_root, fmt: str, manifest_path=None,
+                   compress=None, workers=None, tiers=None, window=None,
+                   memory_budget=None, timeout=None, journal_path=None,
+                   **options) -> dict:
+    """Converts all annotation files under src_root into out_root.
+
+    Files whose format is not recognised are ignored, compressed inputs are
+    read as is and outputs are compressed if compress suffix is given. If
+    manifest_path is given, unchanged inputs are skipped and outputs of
+    inputs that no longer exist or are no longer annotations, as well as
+    previous outputs of inputs converted under another output path, are
+    removed; RUNTIME_OPTIONS do not count as changed options. Files are converted by a
+    Scheduler with given number of workers, largest first, keeping the
+    total size of files converted at once within memory_budget bytes and
+    failing files which take longer than timeout seconds. If journal_path
+    is given, converted files are journalled as they finish and a run
+    restarted with the same journal skips them; the journal is removed once
+    the run completes without failures. If src_root is a ZIP or TAR archive, its members are
+    converted by convert_archive(). Returns a summary of the run.
+    """
+
+    if is_archive(src_root):
+        if manifest_path or journal_path:
+            raise ValueError("Manifest and journal are not supported for archive inputs")
+        if memory_budget or timeout:
+            raise ValueError("Memory budget and timeout are not supported "
+                             "for archive inputs")
+        return convert_archive(src_root, out_root, fmt, workers, compress,
+                               tiers, window, **options)
+
+    summary = {'converted': [], 'skipped': 0, 'resumed': 0, 'ignored': 0,
+               'removed': [], 'repaired': {}, 'failed': {}}
+    manifest = Manifest(manifest_path) if manifest_path else None
+    run_options = {key: value for key, value in options.items()
+                   if key not in RUNTIME_OPTIONS}
+    run_options.update(format=fmt, compress=compress,
+                       tiers=_tiers_key(tiers),
+                       window=list(window) if window else None)
+    journal = (Journal(journal_path, {'src_root': src_root, 'out_root': out_root,
+                                      'options': run_options})
+               if journal_path else None)
+    own_files = {os.path.abspath(p) for p in (manifest_path, journal_path) if p}
+    seen = set()
+    jobs, stats = [], {}
+
+    try:
+        for src in iter_inputs(src_root):
+            if os.path.abspath(src) in own_files:
+                continue
+            dst = output_path(src, src_root, out_root, fmt, compress)
+            stat = os.stat(src)
+
+            if manifest is not None and manifest.is_current(src, stat, run_options, dst):
+                seen.add(src)
+                summary['skipped'] += 1
+                continue
+
+            if journal is not None and journal.is_done(src, stat, dst):
+                seen.add(src)
+                summary['resumed'] += 1
+                if manifest is not None:
+                    _record(manifest, src, stat, run_options, dst, summary)
+                continue
+
+            if sniff(src)[0] is None:
+                summary['ignored'] += 1
+                continue
+
+            seen.add(src)
+            stats[src] = stat, dst
+            jobs.append((src, stat.st_size, _convert_job,
+                         (src, dst, fmt, tiers, window, options,
+                          manifest is not None)))
+
+        scheduler = Scheduler(workers, memory_budget, timeout)
+        for src, status, result in scheduler.run(jobs):
+            if status != 'ok':
+                summary['failed'][src] = result
+                continue
+
+            issues, digest = result
+            summary['converted'].append(src)
+            if issues:
+                summary['repaired'][src] = issues
+            stat, dst = stats[src]
+            if journal is not None:
+                journal.record(src, stat, dst)
+            if manifest is not None:
+                _record(manifest, src, stat, run_options, dst, summary, digest)
+
+        summary['converted'].sort()
+
+        if manifest is not None:
+            for src in [s for s in manifest.entries if s not in seen]:
+                dst = manifest.forget(src)
+                if os.path.exists(dst):
+                    os.remove(dst)
+                summary['removed'].append(dst)
+
+    finally:
+        if manifest is not None:
+            manifest.save()
+        if journal is not None:
+            journal.close()
+
+    if journal is not None and not summary['failed']:
+        os.remove(journal_path)
+
+    return summary
+
+
+def _record(manifest, src, stat, options: dict, dst, summary: dict,
+            digest=None) -> None:
+    """Records src in manifest, removing its previous output if the output
+    path changed (e.g. with the output format)."""
+
+    previous = manifest.record(src, stat, options, dst, digest)
+    if previous is not None:
+        if os.path.exists(previous):
+            os.remove(previous)
+        summary['removed'].append(previous)
+
+
+def _convert_job(src, dst, fmt: str, tiers, window, options: dict,
+                 digest=False) -> tuple:
+    """Runs convert_file in a worker of the scheduler, returns the problems
+    found and, if digest is True, the hash of src taken before reading it,
+    so the parent recording it in the manifest does not read src again."""
+
+    file_digest = file_hash(src) if digest else None
+
+    return convert_file(src, dst, fmt, tiers, window, **options), file_digest
+
+
+def _tiers_key(tiers):
+    """Returns tier selection in a form which can be stored in manifest."""
+
+    if tiers is None:
+        return None
+    if isinstance(tiers, re.Pattern):
+        return tiers.pattern
+
+    return sorted(tiers)
+
+
+def main(argv=None) -> int:
+    from annco.validate import FIXES
+
+    parser = argparse.ArgumentParser(
+        prog='python -m annco.batch',
+        description="Convert every annotation file in a directory."
+    )
+    parser.add_argument('src_root', help="directory or ZIP/TAR archive")
+    parser.add_argument('out_root', help="directory or, for archive inputs, "
+                                         "a new ZIP/TAR archive")
+    parser.add_argument('-f', '--format', choices=OUTPUT_FORMATS, required=True)
+    parser.add_argument('-m', '--manifest',
+                        help="manifest file enabling incremental conversion")
+    parser.add_argument('-j', '--journal',
+                        help="journal file allowing an interrupted run to resume")
+    parser.add_argument('-c', '--compress', choices=COMPRESSIONS,
+                        help="compress outputs")
+    parser.add_argument('-w', '--workers', type=int,
+                        help="worker processes (default: number of CPUs)")
+    parser.add_argument('--memory-budget', type=float, metavar='MB',
+                        help="maximum total size of input files converted at once")
+    parser.add_argument('--timeout', type=float, metavar='SECONDS',
+                        help="fail files whose conversion takes longer")
+    parser.add_argument('-t', '--tiers', type=re.compile,
+                        help="regular expression matching names of tiers to convert")
+    parser.add_argument('--window', type=float, nargs=2, metavar=('START', 'END'),
+                        help="convert only annotations within this time window")
+    parser.add_argument('--tg-mode', choices=TG_MODES, default='long')
+    parser.add_argument('--incl-empty', action='store_true')
+    parser.add_argument('--incl-point', action='store_true')
+    parser.add_argument('--write-workers', type=int,
+                        help="processes serializing chunks of each output file")
+    parser.add_argument('--repair', nargs='+', choices=FIXES, metavar='FIX',
+                        help="fix unsorted, overlapping, inverted and out of range "
+                             f"intervals before writing ({', '.join(FIXES)})")
+    args = parser.parse_args(argv)
+    if (args.manifest or args.journal) and is_archive(args.src_root):
+        parser.error("--manifest and --journal are not supported for archive inputs")
+    if (args.memory_budget or args.timeout) and is_archive(args.src_root):
+        parser.error("--memory-budget and --timeout are not supported for archive inputs")
+    memory_budget = int(args.memory_budget * 2**20) if args.memory_budget else None
+
+    try:
+        summary = convert_corpus(args.src_root, args.out_root, args.format,
+                                 args.manifest, args.compress, args.workers,
+                                 args.tiers, args.window, memory_budget, args.timeout,
+                                 args.journal, tg_mode=args.tg_mode,
+                                 incl_empty=args.incl_empty,
+                                 incl_point=args.incl_point,
+                                 write_workers=args.write_workers,
+                                 repair=args.repair)
+    except ValueError as e:
+        parser.error(str(e))
+
+    # archive runs have no skipped, resumed and removed files
+    print(', '.join(f"{key}: {value if isinstance(value, int) else len(value)}"
+                    for key, value in summary.items()))
+    for src, error in summary['failed'].items():
+        print(f"{src}: {error}")
+
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,349 @@
+"""Reading and writing annotation files.
+
+Formats of input files are sniffed from their leading bytes, compressed
+files and archives are read transparently. Formats themselves are
+implemented by the modules of annco.formats, which are imported only when
+a file of their format is actually read or written.
+"""
+
+import bz2
+import gzip
+import io
+import lzma
+import os
+import re
+import tarfile
+import zipfile
+
+from contextlib import contextmanager, suppress
+
+from annco import formats
+from annco.formats import TG_BINARY_HEADER, TG_MODES
+from annco.model import Annotation
+
+
+SNIFF_SIZE = 4096
+
+OUTPUT_FORMATS = formats.output_formats()
+
+RE_XML_ENCODING = re.compile(rb'^<\?xml[^>]*?encoding=["\']([\w.:-]+)["\']')
+RE_XML_PROLOG = re.compile(r'<\?.*?\?>|<!--.*?-->|<!DOCTYPE[^>]*>|\s+', re.S)
+RE_XML_ROOT = re.compile(r'<([\w.:-]+)')
+
+COMPRESSIONS = {'.gz': gzip, '.bz2': bz2, '.xz': lzma}
+COMPRESSION_MAGIC = ((b'\x1f\x8b', gzip), (b'BZh', bz2), (b'\xfd7zXZ\x00', lzma))
+
+
+class _Prefixed(io.RawIOBase):
+    """Raw stream returning already consumed head before the rest of f."""
+
+    def __init__(self, head: bytes, f):
+        self._head = head
+        self._f = f
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        if self._head:
+            n = min(len(b), len(self._head))
+            b[:n] = self._head[:n]
+            self._head = self._head[n:]
+            return n
+
+        data = self._f.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
+
+def _peek(f, size: int) -> tuple:
+    """Returns leading bytes of binary stream f and a stream reading f
+    from its current position.
+    """
+
+    try:
+        seekable = f.seekable()
+    except AttributeError:  # members of TAR archives read as a stream
+        seekable = False
+
+    if seekable:
+        pos = f.tell()
+        head = f.read(size)
+        f.seek(pos)
+        return head, f
+
+    head = f.read(size)
+    return head, io.BufferedReader(_Prefixed(head, f))
+
+
+def decompressed(f):
+    """Returns binary stream of f contents, decompressing them if their
+    magic bytes are those of gzip, bz2 or xz.
+    """
+
+    magic, f = _peek(f, 6)
+    for signature, module in COMPRESSION_MAGIC:
+        if magic.startswith(signature):
+            return module.open(f, 'rb')
+
+    return f
+
+
+def open_output(path):
+    """Opens binary stream for writing into path, compressed if path ends
+    with .gz, .bz2 or .xz.
+    """
+
+    module = COMPRESSIONS.get(os.path.splitext(path)[1].lower())
+    if module is None:
+        return open(path, 'wb')
+
+    return module.open(path, 'wb')
+
+
+@contextmanager
+def atomic_output(path):
+    """Opens binary stream for writing into path like open_output, but
+    through a temporary file next to it which replaces path only once the
+    stream is written without error, so path is never left half-written.
+    """
+
+    tmp_path = os.fspath(path) + '.tmp'
+    module = COMPRESSIONS.get(os.path.splitext(path)[1].lower())
+
+    try:
+        with open(tmp_path, 'wb') as raw:
+            if module is None:
+                yield raw
+            elif module is gzip:
+                # file name stored in gzip header is that of path
+                with gzip.GzipFile(path, 'wb', fileobj=raw) as f:
+                    yield f
+            else:
+                with module.open(raw, 'wb') as f:
+                    yield f
+    except BaseException:
+        with suppress(FileNotFoundError):
+            os.remove(tmp_path)
+        raise
+
+    os.replace(tmp_path, path)
+
+
+def is_archive(path) -> bool:
+    """Returns True if path is a ZIP or (possibly compressed) TAR archive."""
+
+    return os.path.isfile(path) and (zipfile.is_zipfile(path)
+                                     or tarfile.is_tarfile(path))
+
+
+def iter_archive(path):
+    """Yields (member name, binary stream) for every file in ZIP or TAR
+    archive. TAR archives are read sequentially, each stream is valid
+    only until the next member is yielded.
+    """
+
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as zf:
+            for info in zf.infolist():
+                if not info.is_dir():
+                    with zf.open(info) as f:
+                        yield info.filename, f
+    else:
+        with tarfile.open(path, 'r|*') as tf:
+            for member in tf:
+                if member.isfile():
+                    yield member.name, tf.extractfile(member)
+
+
+def strip_compression(path) -> str:
+    """Returns path without its compression suffix."""
+
+    base, ext = os.path.splitext(path)
+    return base if ext.lower() in COMPRESSIONS else path
+
+
+def sniff(path) -> tuple:
+    """Returns (format, encoding) of annotation file detected from its header.
+
+    Only the first SNIFF_SIZE bytes are read, after decompression if the
+    file is compressed. Format is the name of a registered format or None
+    if the header is not recognised. Encoding of binary .TextGrid
+    files is None.
+    """
+
+    with open(path, 'rb') as f, decompressed(f) as stream:
+        head = stream.read(SNIFF_SIZE)
+
+    return sniff_bytes(head)
+
+
+def sniff_stream(f) -> tuple:
+    """Returns (format, encoding, stream) of annotation in binary stream f,
+    where stream reads decompressed contents of f from the start.
+    """
+
+    head, stream = _peek(decompressed(f), SNIFF_SIZE)
+    return (*sniff_bytes(head), stream)
+
+
+def sniff_bytes(head: bytes) -> tuple:
+    """Returns (format, encoding) of annotation file from its leading bytes."""
+
+    if head.startswith(TG_BINARY_HEADER):
+        return 'textgrid', None
+
+    encoding = _sniff_encoding(head)
+    text = head.decode(encoding, errors='ignore').lstrip('\ufeff \t\r\n')
+
+    if text.startswith('File type = "ooTextFile'):
+        if 'Object class = "TextGrid"' in text:
+            return 'textgrid', encoding
+        return None, encoding
+
+    if text.startswith('<'):
+        # skip declaration, comments and doctype to reach the root element
+        pos = 0
+        while True:
+            match = RE_XML_PROLOG.match(text, pos)
+            if not match:
+                break
+            pos = match.end()
+        root = RE_XML_ROOT.match(text, pos)
+        if root:
+            return formats.by_xml_root(root.group(1)), encoding
+
+    return None, encoding
+
+
+def _sniff_encoding(head: bytes) -> str:
+    """Returns name of a codec for decoding file from its leading bytes."""
+
+    if head.startswith(b'\xef\xbb\xbf'):
+        return 'utf-8-sig'
+    if head.startswith((b'\xff\xfe', b'\xfe\xff')):
+        return 'utf-16'
+    # UTF-16 without BOM, ASCII characters are padded with null bytes
+    if len(head) > 1 and head[0] and not head[1]:
+        return 'utf-16-le'
+    if len(head) > 1 and not head[0] and head[1]:
+        return 'utf-16-be'
+
+    declared = RE_XML_ENCODING.match(head)
+    if declared:
+        return declared.group(1).decode('ascii').lower()
+
+    return 'utf-8'
+
+
+def read_contents(source, fmt: str, encoding: str):
+    """Returns contents of annotation file in a form expected by its reader.
+
+    source is a path or a binary stream, compressed files are decompressed
+    on the fly. .TextGrid files are decoded into a string (binary ones are
+    returned as bytes), XML formats are parsed into an Element Tree, which
+    takes encoding from the XML declaration.
+    """
+
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f, decompressed(f) as stream:
+            return read_contents(stream, fmt, encoding)
+
+    return formats.load(fmt).load(source, encoding)
+
+
+def read_annotation(source, tiers=None, window=None) -> Annotation:
+    """Creates Annotation instance from a file of any supported format.
+
+    source is a path or a binary stream, gzip, bz2 and xz compressed files
+    are recognised by their magic bytes. Raises ValueError if format of the
+    file is not recognised.
+
+    tiers selects tiers to read: a collection of tier names or a compiled
+    regular expression matching whole names. window is a (start, end) pair
+    in seconds: annotations outside it are skipped, the others are clipped
+    to it, times stay relative to the start of the file. Both are applied
+    while parsing, so unselected parts of the file are never resolved.
+    """
+
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            return read_annotation(f, tiers, window)
+
+    fmt, encoding, stream = sniff_stream(source)
+    if fmt is None:
+        name = getattr(source, 'name', source)
+        raise ValueError(f"Unrecognised annotation format: {name}")
+
+    return Annotation.from_format(fmt, read_contents(stream, fmt, encoding),
+                                  tiers, window)
+
+
+def write_annotation(ann: Annotation, target, fmt: str, incl_empty=False,
+                     incl_point=False, tg_mode='long', write_workers=None,
+                     tier_cache=None) -> None:
+    """Writes Annotation into a file of given output format.
+
+    target is a path or a binary stream, paths ending with .gz, .bz2 or .xz
+    are compressed, paths are written atomically (see atomic_output).
+    fmt is one of OUTPUT_FORMATS, tg_mode is one of TG_MODES
+    and selects long, short or binary .TextGrid. incl_empty and incl_point
+    apply to .eaf and .antx only. With write_workers greater than one, tiers
+    of a large annotation are serialized in chunks on that many processes.
+    With tier_cache, an annotation saved repeatedly with the same TierCache
+    is serialized again only in tiers changed since the previous save.
+    """
+
+    _check_output(fmt, tg_mode)
+
+    if isinstance(target, (str, os.PathLike)):
+        with atomic_output(target) as f:
+            return write_annotation(ann, f, fmt, incl_empty, incl_point, tg_mode,
+                                    write_workers, tier_cache)
+
+    formats.load(fmt).write(ann, target, incl_empty=incl_empty,
+                            incl_point=incl_point, tg_mode=tg_mode,
+                            write_workers=write_workers, tier_cache=tier_cache)
+
+
+def write_annotations(ann: Annotation, targets, workers=None, **options) -> None:
+    """Writes Annotation into several targets, each in its own output format.
+
+    targets is an iterable of (target, fmt) pairs, options are those of
+    write_annotation. Writers leave Annotation unchanged, so a file parsed
+    once can be written into any number of formats. With workers greater
+    than one, targets are written in parallel on that many processes,
+    unless a tier_cache is given, which only this process can keep.
+    """
+
+    targets = list(targets)
+    for _, fmt in targets:
+        _check_output(fmt, options.get('tg_mode', 'long'))
+
+    if (not workers or workers < 2 or len(targets) < 2
+            or options.get('tier_cache') is not None):
+        for target, fmt in targets:
+            write_annotation(ann, target, fmt, **options)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(min(workers, len(targets))) as pool:
+        futures = [pool.submit(write_annotation, ann, target, fmt, **options)
+                   for target, fmt in targets]
+        for future in futures:
+            future.result()
+
+
+def _check_output(fmt: str, tg_mode: str) -> None:
+    """Raises ValueError if fmt is not an output format or tg_mode is not
+    one of TG_MODES for .TextGrid."""
+
+    try:
+        writable = formats.get(fmt).writable
+    except ValueError:
+        writable = False
+    if not writable:
+        raise ValueError(f"Unsupported output format: {fmt}")
+    if fmt == 'textgrid' and tg_mode not in TG_MODES:
+        raise ValueError(f"Unsupported .TextGrid mode: {tg_mode}")
@@ -0,0 +1,229 @@
+"""Registry of annotation formats.
+
+Formats are registered by name together with the name of the module
+implementing them, which is imported only when the format is first used.
+A format module provides
+
+    load(stream, encoding)
+        returns contents of a binary stream in the form its reader expects
+    from_contents(cls, contents, tiers=None, window=None)
+        creates an instance of Annotation class cls from the contents
+
+and, if annotations can be written in the format,
+
+    write(ann, f, **options)
+        writes Annotation into binary stream f, ignoring output options
+        meant for other formats
+
+Writers of built-in formats accept write_workers: with more than one
+worker, tiers are cut into chunks of CHUNK_SIZE intervals which are
+serialized on a process pool and written out in order (see write_chunks).
+They also accept tier_cache, a TierCache keeping serialized tiers between
+writes of the same annotation, so that only tiers changed since the
+previous write are serialized again.
+
+Other formats are added with register() or declared as entry points in
+the 'annco.formats' group, named after the format, with the module name
+as value. Such modules also define SUFFIX and, for XML formats, XML_ROOT.
+Entry points are looked up only when a format is not found among the
+registered ones.
+"""
+
+import importlib
+import weakref
+
+from collections import deque, namedtuple
+
+
+TG_BINARY_HEADER = b'ooBinaryFile\x08TextGrid'
+TG_MODES = ('long', 'short', 'binary')
+
+CHUNK_SIZE = 20000
+CHUNK_MARKER = 'annco-chunk'
+FIELD_MARKER = 'annco-field'
+
+Format = namedtuple('Format', 'name module suffix xml_root writable')
+
+_formats = {}
+_entry_points_loaded = False
+
+
+def register(name: str, module: str, suffix: str, xml_root=None,
+             writable=False) -> None:
+    """Registers format name implemented by module.
+
+    suffix is the extension of output files, xml_root the name of the root
+    element by which files of XML formats are recognised.
+    """
+
+    _formats[name] = Format(name, module, suffix, xml_root, writable)
+
+
+def _load_entry_points() -> None:
+    """Registers formats declared as entry points, only once."""
+
+    global _entry_points_loaded
+    if _entry_points_loaded:
+        return
+    _entry_points_loaded = True
+
+    from importlib.metadata import entry_points
+
+    eps = entry_points()
+    eps = eps.select(group='annco.formats') if hasattr(eps, 'select') \
+        else eps.get('annco.formats', [])
+
+    for ep in eps:
+        if ep.name not in _formats:
+            module = importlib.import_module(ep.value)
+            register(ep.name, ep.value, module.SUFFIX,
+                     getattr(module, 'XML_ROOT', None), hasattr(module, 'write'))
+
+
+def get(name: str) -> Format:
+    """Returns registered format name, raises ValueError if there is none."""
+
+    if name not in _formats:
+        _load_entry_points()
+    try:
+        return _formats[name]
+    except KeyError:
+        raise ValueError(f"Unsupported annotation format: {name}") from None
+
+
+def load(name: str):
+    """Returns module implementing format name, importing it if needed."""
+
+    return importlib.import_module(get(name).module)
+
+
+def by_xml_root(root: str):
+    """Returns name of the XML format with given root element or None."""
+
+    for fmt in _formats.values():
+        if fmt.xml_root == root:
+            return fmt.name
+
+    if not _entry_points_loaded:
+        _load_entry_points()
+        return by_xml_root(root)
+
+    return None
+
+
+def names() -> list:
+    """Returns names of registered formats."""
+
+    return list(_formats)
+
+
+def output_formats() -> dict:
+    """Returns suffixes of output files of writable formats by format name."""
+
+    return {fmt.name: fmt.suffix for fmt in _formats.values() if fmt.writable}
+
+
+def chunks(intervals, size=CHUNK_SIZE):
+    """Yields (index of the first interval counting from 1, intervals) for
+    consecutive chunks of at most size intervals.
+    """
+
+    for start in range(0, len(intervals), size):
+        yield start + 1, intervals[start:start+size]
+
+
+def write_chunks(f, layout, func, jobs, workers: int) -> None:
+    """Writes layout into binary stream f.
+
+    layout is a sequence of bytes and of indices into jobs, which are
+    replaced by func(*jobs[index]) computed on a pool of worker processes.
+    Indices must appear in order; at most two jobs per worker are in flight
+    so that chunks of a large file are not all pickled at once.
+    """
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(workers) as pool:
+        pending = deque()
+        submitted = 0
+        for piece in layout:
+            if isinstance(piece, bytes):
+                f.write(piece)
+                continue
+            while submitted < len(jobs) and len(pending) < 2 * workers:
+                pending.append(pool.submit(func, *jobs[submitted]))
+                submitted += 1
+            f.write(pending.popleft().result())
+
+
+class TierCache:
+    """Serialized tiers of annotations kept between their writes.
+
+    Writers store the serialized form of every tier under the tier object
+    and a key of their own (format, options and whatever else the form
+    depends on). An entry is valid while the tier keeps its list of
+    intervals, their number and its version (see Tier.touch), so saving an
+    annotation after editing some of its tiers serializes only those.
+    Entries are dropped together with their tiers.
+    """
+
+    def __init__(self):
+        self._entries = weakref.WeakKeyDictionary()
+
+    @staticmethod
+    def _state(obj) -> tuple:
+        "Returns version, list of intervals and their number of obj"
+
+        intervals = getattr(obj, 'intervals', None)
+        return (getattr(obj, '_version', None), intervals,
+                None if intervals is None else len(intervals))
+
+    def get(self, obj, key, stale=False):
+        """Returns data stored under obj and key or None if obj changed
+        since; with stale True, data is returned even then."""
+
+        entry = self._entries.get(obj, {}).get(key)
+        if entry is None:
+            return None
+        state, data = entry
+        if stale:
+            return data
+
+        version, intervals, size = self._state(obj)
+        if state[0] == version and state[1] is intervals and state[2] == size:
+            return data
+
+        return None
+
+    def put(self, obj, key, data) -> None:
+        "Stores data under obj and key"
+
+        self._entries.setdefault(obj, {})[key] = (self._state(obj), data)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+def xml_layout(tree) -> list:
+    """Returns layout for write_chunks of Element Tree tree whose chunks
+    are marked with Comment(CHUNK_MARKER) elements.
+    """
+
+    import io
+
+    buffer = io.BytesIO()
+    tree.write(buffer, 'UTF-8', xml_declaration=True)
+    parts = buffer.getvalue().split(f'<!--{CHUNK_MARKER}-->'.encode('UTF-8'))
+
+    layout = [parts[0]]
+    for i, part in enumerate(parts[1:]):
+        layout.extend((i, part))
+
+    return layout
+
+
+register('textgrid', 'annco.formats.textgrid', '.TextGrid', writable=True)
+register('eaf', 'annco.formats.eaf', '.eaf', 'ANNOTATION_DOCUMENT', writable=True)
+register('trs', 'annco.formats.trs', '.trs', 'Trans')
+register('antx', 'annco.formats.antx', '.antx', 'AnnotationSystemDataSet',
+         writable=True)
@@ -0,0 +1,503 @@
+"""Annotation Pro .antx format."""
+
+import re
+import xml.etree.ElementTree as ET
+
+from random import choices
+from types import SimpleNamespace
+
+from annco import formats
+from annco.model import Annotation, Interval, LabelTable, Tier
+
+
+def load(stream, encoding):
+    """Returns .antx file parsed into an Element Tree."""
+
+    return ET.parse(stream)
+
+
+def from_contents(cls, contents, tiers=None, window=None):
+    """Creates Annotation instance from .antx file contents."""
+
+    ann = contents.getroot()
+    namespace = {'ns': 'http://tempuri.org/AnnotationSystemDataSet.xsd'}
+    samplerate = _get_samplerate(ann, namespace)
+    labels = LabelTable()
+    layers, max_end = _get_layers(ann, namespace, samplerate, labels, tiers, window)
+    duration = _get_duration(max_end)
+
+    return cls(layers, cls._clip_duration(duration, window), labels)
+
+
+def _get_samplerate(root, namespace: dict) -> int:
+    """Extracts sample rate from .antx file root"""
+
+    value = root.find(".//*[ns:Key='Samplerate']/ns:Value", namespace)
+    samplerate = int(value.text)
+
+    return samplerate
+
+
+def _get_layers(root, namespace: dict, samplerate: int, labels, tiers=None,
+                window=None) -> list:
+    """Return list of Tier objects and their Intervals from .antx root.
+
+    Segments of layers not selected by tiers are not looked up, labels of
+    segments are interned in LabelTable labels.
+    """
+
+    max_end = 0  # used to determine duration of annotation
+
+    layers = []
+    for layer in root.findall('ns:Layer', namespace):
+        layer_id = layer.find('ns:Id', namespace).text
+        name = layer.find('ns:Name', namespace).text
+        if not Annotation._selected(name, tiers):
+            continue
+        segments = []
+
+        for seg in root.findall(f".//*[ns:IdLayer='{layer_id}']", namespace):
+            samp_start = float(seg.find('ns:Start', namespace).text)
+            samp_duration = float(seg.find('ns:Duration', namespace).text)
+            text = seg.find('ns:Label', namespace).text
+
+            samp_end = samp_start + samp_duration
+            start = samp_start / samplerate
+            end = samp_end / samplerate
+
+            if not max_end or end > max_end:
+                max_end = end
+
+            bounds = Annotation._clip(start, end, window)
+            if bounds:
+                segments.append(Interval(*bounds, labels.intern(text)))
+
+        layers.append(Tier(name, segments))
+
+    return layers, max_end
+
+
+def _get_duration(max_end: float) -> float:
+    """Gets annotation duration from .antx file root."""
+
+    if max_end > 15.0:
+        return max_end
+    else:
+        return 15.0
+
+
+def scan(data, encoding) -> dict:
+    """Returns byte ranges of segments of every layer of .antx file contents
+    data for lazy reading, or None if there are no segments.
+
+    Every layer is read from the file without its Segment elements, which
+    keeps layers and configuration, with runs of its own segments put
+    back, see annco.lazy.
+    """
+
+    RE_SEGMENT = re.compile(rb'<Segment>.*?</Segment>', re.S)
+    RE_LAYER = re.compile(rb'<IdLayer>([^<]*)</IdLayer>')
+    RE_START = re.compile(rb'<Start>([^<]*)</Start>')
+    RE_DURATION = re.compile(rb'<Duration>([^<]*)</Duration>')
+
+    segments = []  # (layer ID, start, end, end sample)
+    for match in RE_SEGMENT.finditer(data):
+        start, end = match.span()
+        layer_id = RE_LAYER.search(data, start, end)
+        samp_start = RE_START.search(data, start, end)
+        samp_duration = RE_DURATION.search(data, start, end)
+        samp_end = (float(samp_start.group(1)) + float(samp_duration.group(1))
+                    if samp_start and samp_duration else 0)
+        segments.append((layer_id and layer_id.group(1).decode(encoding),
+                         start, end, samp_end))
+
+    if not segments:
+        return None
+
+    head, tail = [0, segments[0][1]], [segments[-1][2], len(data)]
+    skeleton = ET.fromstring(data[head[0]:head[1]] + data[tail[0]:tail[1]])
+    namespace = {'ns': 'http://tempuri.org/AnnotationSystemDataSet.xsd'}
+    samplerate = _get_samplerate(skeleton, namespace)
+
+    tiers, by_id, seen = [], {}, {}
+    for layer in skeleton.findall('ns:Layer', namespace):
+        name = layer.find('ns:Name', namespace).text
+        # position among layers of the same name, which are all read
+        tiers.append({'name': name, 'is_point': False, 'ranges': [],
+                      'nth': seen.get(name, 0)})
+        seen[name] = seen.get(name, 0) + 1
+        by_id.setdefault(layer.find('ns:Id', namespace).text, tiers[-1])
+
+    max_end, previous = 0, None
+    for layer_id, start, end, samp_end in segments:
+        tier = by_id.get(layer_id)
+        if tier is None:
+            continue
+        max_end = max(max_end, samp_end / samplerate)
+        if tier is previous:
+            tier['ranges'][-1][1] = end
+        else:
+            tier['ranges'].append([start, end])
+        previous = tier
+
+    return {'duration': _get_duration(max_end), 'head': head, 'tail': tail,
+            'tiers': tiers}
+
+
+def _interval(interval, root, segment_id: str, layer_id: str) -> None:
+    """Creates Segment element representing interval in .antx file."""
+
+    segment = ET.SubElement(root, 'Segment')
+
+    id_el = ET.SubElement(segment, 'Id')
+    id_el.text = segment_id
+
+    layer_id_el = ET.SubElement(segment, 'IdLayer')
+    layer_id_el.text = layer_id
+
+    label = ET.SubElement(segment, 'Label')
+    label.text = interval.text
+
+    fore_color = ET.SubElement(segment, 'ForeColor')
+    fore_color.text = '-16777216'
+
+    back_color = ET.SubElement(segment, 'BackColor')
+    back_color.text = '-1'
+
+    border_color = ET.SubElement(segment, 'BorderColor')
+    border_color.text = '-16777216'
+
+    start = ET.SubElement(segment, 'Start')
+    start.text = interval.antx_start
+
+    duration = ET.SubElement(segment, 'Duration')
+    duration.text = interval.antx_dur
+
+    is_sel = ET.SubElement(segment, 'IsSelected')
+    is_sel.text = 'false'
+
+    feat = ET.SubElement(segment, 'Feature')
+    lang = ET.SubElement(segment, 'Language')
+    group = ET.SubElement(segment, 'Group')
+    name = ET.SubElement(segment, 'Name')
+    param_1 = ET.SubElement(segment, 'Parameter1')
+    param_2 = ET.SubElement(segment, 'Parameter2')
+    param_3 = ET.SubElement(segment, 'Parameter3')
+
+    is_marker = ET.SubElement(segment, 'IsMarker')
+    is_marker.text = 'false'
+
+    marker = ET.SubElement(segment, 'Marker')
+    r_script = ET.SubElement(segment, 'RScript')
+
+    vid_off = ET.SubElement(segment, 'VideoOffset')
+    vid_off.text = '0'
+
+
+def _tier(tier, root, layer_id: str) -> None:
+    """Creates Layer element representing tier in .antx file."""
+
+    layer = ET.SubElement(root, 'Layer')
+
+    id_el = ET.SubElement(layer, 'Id')
+    id_el.text = layer_id
+
+    name = ET.SubElement(layer, 'Name')
+    name.text = tier.name
+
+    forecolor = ET.SubElement(layer, 'ForeColor')
+    forecolor.text = '-16777216'
+
+    backcolor = ET.SubElement(layer, 'BackColor')
+    backcolor.text = '-1'
+
+    is_sel = ET.SubElement(layer, 'IsSelected')
+    is_sel.text = 'false'
+
+    height = ET.SubElement(layer, 'Height')
+    height.text = '70'
+
+    ccs = ET.SubElement(layer, 'CoordinateControlStyle')
+    ccs.text = '0'
+
+    is_locked = ET.SubElement(layer, 'IsLocked')
+    is_locked.text = 'false'
+
+    is_closed = ET.SubElement(layer, 'IsClosed')
+    is_closed.text = 'false'
+
+    sos = ET.SubElement(layer, 'ShowOnSpectrogram')
+    sos.text = 'false'
+
+    sac = ET.SubElement(layer, 'ShowAsChart')
+    sac.text = 'false'
+
+    chart_min = ET.SubElement(layer, 'ChartMinimum')
+    chart_min.text = '-50'
+
+    chart_max = ET.SubElement(layer, 'ChartMaximum')
+    chart_max.text = '50'
+
+    show_bounds = ET.SubElement(layer, 'ShowBoundaries')
+    show_bounds.text = 'true'
+
+    iif = ET.SubElement(layer, 'IncludeInFrequency')
+    iif.text = 'true'
+
+    param_1 = ET.SubElement(layer, 'Parameter1Name')
+    param_1.text = 'Parameter 1'
+
+    param_2 = ET.SubElement(layer, 'Parameter2Name')
+    param_2.text = 'Parameter 2'
+
+    param_3 = ET.SubElement(layer, 'Parameter3Name')
+    param_3.text = 'Parameter 3'
+
+    is_vis = ET.SubElement(layer, 'IsVisible')
+    is_vis.text = 'true'
+
+    font_size = ET.SubElement(layer, 'FontSize')
+    font_size.text = '10'
+
+    vpi = ET.SubElement(layer, 'VideoPlayerIndex')
+    vpi.text = '0'
+
+
+def to_antx(ann, incl_empty=False, incl_point=False) -> ET.ElementTree:
+    """Returns an Element Tree representing Annotation to be written into .antx"""
+
+    ann = ann._with_points(incl_point)
+
+    root = _root()
+    ann_tree = ET.ElementTree(root)
+
+    layer_ids = []
+    for tier in ann:
+        layer_ids.append(_generate_id())
+        _tier(tier, root, layer_ids[-1])
+
+    for tier, layer_id in zip(ann, layer_ids):
+        for interval in tier:
+            if not incl_empty and not interval.text:
+                continue
+            _interval(interval, root, _generate_id(), layer_id)
+
+    _configs(root)
+
+    return ann_tree
+
+
+def _root() -> ET.Element:
+    """Returns root AnnotationSystemDataSet element for .antx tree"""
+
+    root = ET.Element(
+        'AnnotationSystemDataSet',
+        {'xmlns': 'http://tempuri.org/AnnotationSystemDataSet.xsd'}
+    )
+
+    return root
+
+
+def _generate_id() -> str:
+    """Generates a unique id for .antx layer/segment."""
+
+    CHARS = '0123456789abcdef'
+
+    generated = (
+        ''.join(choices(CHARS, k=8)) + '-'
+        + ''.join(choices(CHARS, k=4)) + '-'
+        + ''.join(choices(CHARS, k=4)) + '-'
+        + ''.join(choices(CHARS, k=4)) + '-'
+        + ''.join(choices(CHARS, k=12))
+    )
+
+    return generated
+
+
+def _configs(root) -> None:
+    """Creates Configuration elements in .antx file tree."""
+
+    version = ET.SubElement(root, 'Configuration')
+    key = ET.SubElement(version, 'Key'); key.text = 'Version'
+    value = ET.SubElement(version, 'Value'); value.text = '5'
+
+    created = ET.SubElement(root, 'Configuration')
+    key = ET.SubElement(created, 'Key'); key.text = 'Created'
+    value = ET.SubElement(created, 'Value')
+
+    modified = ET.SubElement(root, 'Configuration')
+    key = ET.SubElement(modified, 'Key'); key.text = 'Modified'
+    value = ET.SubElement(modified, 'Value')
+
+    samplerate = ET.SubElement(root, 'Configuration')
+    key = ET.SubElement(samplerate, 'Key'); key.text = 'Samplerate'
+    value = ET.SubElement(samplerate, 'Value'); value.text = '44100'
+
+    file_vers = ET.SubElement(root, 'Configuration')
+    key = ET.SubElement(file_vers, 'Key'); key.text = 'FileVersion'
+    value = ET.SubElement(file_vers, 'Value'); value.text = '5'
+
+    author = ET.SubElement(root, 'Configuration')
+    key = ET.SubElement(author, 'Key'); key.text = 'Author'
+    value = ET.SubElement(author, 'Value')
+
+    title = ET.SubElement(root, 'Configuration')
+    key = ET.SubElement(title, 'Key'); key.text = 'ProjectTitle'
+    value = ET.SubElement(title, 'Value')
+
+    environ = ET.SubElement(root, 'Configuration')
+    key = ET.SubElement(environ, 'Key'); key.text = 'ProjectEnvironment'
+    value = ET.SubElement(environ, 'Value')
+
+    noises = ET.SubElement(root, 'Configuration')
+    key = ET.SubElement(noises, 'Key'); key.text = 'ProjectNoises'
+    value = ET.SubElement(noises, 'Value')
+
+    collect = ET.SubElement(root, 'Configuration')
+    key = ET.SubElement(collect, 'Key'); key.text = 'ProjectCollection'
+    value = ET.SubElement(collect, 'Value')
+
+    corpus_type = ET.SubElement(root, 'Configuration')
+    key = ET.SubElement(corpus_type, 'Key'); key.text = 'ProjectCorpusType'
+    value = ET.SubElement(corpus_type, 'Value')
+
+    corpus_own = ET.SubElement(root, 'Configuration')
+    key = ET.SubElement(corpus_own, 'Key'); key.text = 'ProjectCorpusOwner'
+    value = ET.SubElement(corpus_own, 'Value')
+
+    lic = ET.SubElement(root, 'Configuration')
+    key = ET.SubElement(lic, 'Key'); key.text = 'ProjectLicense'
+    value = ET.SubElement(lic, 'Value')
+
+    desc = ET.SubElement(root, 'Configuration')
+    key = ET.SubElement(desc, 'Key'); key.text = 'ProjectDescription'
+    value = ET.SubElement(desc, 'Value')
+
+
+def _chunk(intervals, layer_id: str, incl_empty=False) -> bytes:
+    """Returns bytes representing Segment elements of intervals in layer."""
+
+    parent = ET.Element('AnnotationSystemDataSet')
+    for interval in intervals:
+        if incl_empty or interval.text:
+            _interval(interval, parent, _generate_id(), layer_id)
+
+    return ''.join(ET.tostring(el, 'unicode') for el in parent).encode('UTF-8')
+
+
+def _write_chunked(ann, f, incl_empty: bool, incl_point: bool, workers: int) -> None:
+    """Writes Annotation into binary stream f serializing chunks of intervals
+    on a process pool. Layer IDs are generated beforehand, segment IDs are
+    random, so the chunks are independent.
+    """
+
+    ann = ann._with_points(incl_point)
+
+    root = _root()
+    ann_tree = ET.ElementTree(root)
+
+    layer_ids = []
+    for tier in ann:
+        layer_ids.append(_generate_id())
+        _tier(tier, root, layer_ids[-1])
+
+    jobs = []
+    for tier, layer_id in zip(ann, layer_ids):
+        for _, intervals in formats.chunks(tier.intervals):
+            root.append(ET.Comment(formats.CHUNK_MARKER))
+            jobs.append((intervals, layer_id, incl_empty))
+
+    _configs(root)
+
+    formats.write_chunks(f, formats.xml_layout(ann_tree), _chunk, jobs, workers)
+
+
+def _segment_parts(text: str, layer_id: str) -> tuple:
+    """Returns Segment element of an interval with text in layer as strings
+    cut where its ID, start and duration go."""
+
+    root = _root()
+    marker = formats.FIELD_MARKER
+    _interval(SimpleNamespace(text=text, antx_start=marker, antx_dur=marker),
+              root, marker, layer_id)
+
+    # the ID comes before the label, start and duration after it, and the
+    # label may contain the marker itself
+    head, rest = ET.tostring(root[0], 'unicode').split(marker, 1)
+    return (head, *rest.rsplit(marker, 2))
+
+
+def _segments(intervals, layer_id: str, incl_empty: bool, texts: dict) -> tuple:
+    """Returns bytes representing Segment elements of intervals in layer, as
+    _chunk() does, and the elements cut by _segment_parts() by text.
+
+    Elements are serialized once per distinct text, texts holds those of
+    the previous serialization of the tier.
+    """
+
+    segments, cut = [], {}
+    for interval in intervals:
+        if not incl_empty and not interval.text:
+            continue
+        pieces = cut.get(interval.text)
+        if pieces is None:
+            pieces = texts.get(interval.text) or _segment_parts(interval.text, layer_id)
+            cut[interval.text] = pieces
+        head, labelled, middle, tail = pieces
+        segments.append(f'{head}{_generate_id()}{labelled}{interval.antx_start}'
+                        f'{middle}{interval.antx_dur}{tail}')
+
+    return ''.join(segments).encode('UTF-8'), cut
+
+
+def _write_cached(ann, f, incl_empty: bool, incl_point: bool, cache) -> None:
+    """Writes Annotation into binary stream f taking Segment elements of
+    tiers from TierCache cache, serializing only tiers missing from it.
+
+    A tier keeps its layer ID between writes, so its cached segments stay
+    valid; Layer elements are small and are created anew. Changed tiers are
+    put together from elements cut by text, so only intervals with new
+    texts are serialized by ElementTree.
+    """
+
+    root = _root()
+    ann_tree = ET.ElementTree(root)
+
+    chunks = []
+    for tier in ann:
+        if tier.is_point and not incl_point:
+            continue
+        key = ('antx', incl_empty, ann.duration if tier.is_point else None)
+        entry = cache.get(tier, key)
+        if entry is None:
+            previous = cache.get(tier, key, stale=True)
+            layer_id, _, texts = previous or (_generate_id(), None, {})
+            intervals = tier.extended(ann.duration) if tier.is_point else tier.intervals
+            entry = (layer_id, *_segments(intervals, layer_id, incl_empty, texts))
+            cache.put(tier, key, entry)
+        _tier(tier, root, entry[0])
+        chunks.append(entry[1])
+
+    for _ in chunks:
+        root.append(ET.Comment(formats.CHUNK_MARKER))
+    _configs(root)
+
+    for piece in formats.xml_layout(ann_tree):
+        f.write(piece if isinstance(piece, bytes) else chunks[piece])
+
+
+def write(ann, f, incl_empty=False, incl_point=False, write_workers=None,
+          tier_cache=None, **_) -> None:
+    """Writes Annotation into binary stream f as .antx.
+
+    With more than one write_workers, chunks of intervals are serialized
+    in parallel. With tier_cache, only tiers changed since the previous
+    write with the same cache are serialized, in this process.
+    """
+
+    if tier_cache is not None:
+        _write_cached(ann, f, incl_empty, incl_point, tier_cache)
+    elif write_workers and write_workers > 1:
+        _write_chunked(ann, f, incl_empty, incl_point, write_workers)
+    else:
+        to_antx(ann, incl_empty, incl_point).write(f, 'UTF-8', xml_declaration=True)
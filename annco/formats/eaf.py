@@ -0,0 +1,608 @@
+"""ELAN .eaf format."""
+
+import heapq
+import re
+import wave
+import xml.etree.ElementTree as ET
+
+from itertools import chain, count
+
+from annco import formats
+from annco.model import Annotation, Interval, LabelTable, Tier
+
+
+def load(stream, encoding):
+    """Returns .eaf file parsed into an Element Tree."""
+
+    return ET.parse(stream)
+
+
+def from_contents(cls, contents, tiers=None, window=None):
+    """Creates Annotation instance from .eaf file contents.
+
+    Only selected tiers and tiers they refer to are resolved, alignable
+    annotations outside the window are dropped before their referring
+    annotations are resolved.
+    """
+
+    ann_doc = contents.getroot()
+    duration = _get_duration(ann_doc)
+    selected, needed = _select_tiers(ann_doc, tiers)
+
+    align_anns = [ann for t in needed
+                  for ann in t.iterfind('ANNOTATION/ALIGNABLE_ANNOTATION')]
+    _insert_align_ann_times(ann_doc, align_anns)
+    if window is not None:
+        align_anns = [
+            ann for ann in align_anns
+            if cls._clip(ann.get('TIME_SLOT_REF1'), ann.get('TIME_SLOT_REF2'), window)
+        ]
+    _insert_ref_ann_times(ann_doc, align_anns, needed)
+
+    labels = LabelTable()
+    ann_tiers = _get_tiers(ann_doc, labels, selected, window)
+
+    return cls(ann_tiers, cls._clip_duration(duration, window), labels)
+
+
+def _get_duration(root) -> float:
+    """Gets annotation duration from .eaf file root.
+
+    Extracts duration from a media file. If media file is absent,
+    sets value of the last time slot as duration.
+    """
+
+    try:
+        wav_path = root.find('HEADER/MEDIA_DESCRIPTOR').get('MEDIA_URL')
+        with wave.open(wav_path[8:], 'rb') as wav:
+            duration = wav.getnframes() / wav.getframerate()
+    except Exception:
+        try:
+            last_time = int(root.find('TIME_ORDER')[-1].get('TIME_VALUE')) / 1000
+            duration = last_time if last_time > 300.0 else 300.0
+        except IndexError:
+            duration = 300.0
+
+    return duration
+
+
+def _insert_align_ann_times(root, annotations) -> None:
+    """Replaces .eaf alignable annotations' time references with times."""
+
+    for ann in annotations:
+        for slot in root.find('TIME_ORDER'):
+
+            if ann.get('TIME_SLOT_REF1') == slot.get('TIME_SLOT_ID'):
+                ann.set('TIME_SLOT_REF1', int(slot.get('TIME_VALUE')) / 1000)
+
+            if ann.get('TIME_SLOT_REF2') == slot.get('TIME_SLOT_ID'):
+                ann.set('TIME_SLOT_REF2', int(slot.get('TIME_VALUE')) / 1000)
+
+
+def _insert_ref_ann_times(root, annotations, tier_els=None) -> None:
+    """Assigns time boundaries to referring annotations in tier_els
+    (all tiers by default).
+    """
+
+    if tier_els is None:
+        tier_els = root.findall('TIER')
+
+    for ann in annotations:
+        for t in tier_els:
+            ref_anns = t.findall(
+                f".//*[@ANNOTATION_REF='{ann.get('ANNOTATION_ID')}']"
+            )
+            if ref_anns:
+                ref_dur = (
+                    (ann.get('TIME_SLOT_REF2') - ann.get('TIME_SLOT_REF1'))
+                    / len(ref_anns)
+                )
+                ref_time = ann.get('TIME_SLOT_REF1')
+
+                for ref in ref_anns:
+                    ref.set('TIME_SLOT_REF1', ref_time)
+                    ref_time += ref_dur
+                    ref.set("TIME_SLOT_REF2", ref_time)
+
+                _insert_ref_ann_times(root, ref_anns, tier_els)
+
+
+def _select_tiers(root, tiers) -> tuple:
+    """Returns TIER elements of .eaf file root selected by tiers and
+    TIER elements needed to resolve their times, i.e. selected ones
+    with all their parents.
+    """
+
+    tier_els = root.findall('TIER')
+    if tiers is None:
+        return tier_els, tier_els
+
+    by_id = {t.get('TIER_ID'): t for t in tier_els}
+    selected = [t for t in tier_els if Annotation._selected(t.get('TIER_ID'), tiers)]
+
+    needed_ids = set()
+    for t in selected:
+        while t is not None and t.get('TIER_ID') not in needed_ids:
+            needed_ids.add(t.get('TIER_ID'))
+            t = by_id.get(t.get('PARENT_REF'))
+
+    return selected, [t for t in tier_els if t.get('TIER_ID') in needed_ids]
+
+
+def _get_tiers(root, labels, tier_els=None, window=None) -> list:
+    """Returns tiers and their intervals from .eaf file root, interning
+    annotation values in LabelTable labels.
+
+    Annotations left without times because they are outside the window
+    are skipped.
+    """
+
+    if tier_els is None:
+        tier_els = root.findall('TIER')
+
+    tiers = []
+    for t in tier_els:
+        name = t.get('TIER_ID')
+        intervals = []
+
+        for ann in t.findall('ANNOTATION/*'):
+            start = ann.get('TIME_SLOT_REF1')
+            end = ann.get('TIME_SLOT_REF2')
+            text = ann.find("*").text
+
+            if window is not None:
+                if not isinstance(start, float):
+                    continue
+                bounds = Annotation._clip(start, end, window)
+                if not bounds:
+                    continue
+                start, end = bounds
+
+            intervals.append(Interval(start, end, labels.intern(text)))
+
+        tiers.append(Tier(name, intervals))
+
+    return tiers
+
+
+def scan(data, encoding) -> dict:
+    """Returns byte ranges of TIER elements of .eaf file contents data for
+    lazy reading, or None if there are none.
+
+    Every tier is read from the file without its TIER elements, which keeps
+    the header and time slots, with its own TIER element and those of its
+    parent tiers put back, see annco.lazy.
+    """
+
+    RE_TIER = re.compile(rb'<TIER\b[^>]*?(/?)>')
+    # start tags are parsed on their own in the encoding of the file
+    if encoding == 'utf-8-sig':
+        encoding = 'utf-8'
+    declaration = f'<?xml version="1.0" encoding="{encoding}"?>'.encode('ascii')
+
+    tier_els, ranges = [], []
+    pos = 0
+    while (match := RE_TIER.search(data, pos)) is not None:
+        tag = match.group(0)
+        if match.group(1):
+            pos = match.end()
+        else:
+            pos = data.find(b'</TIER>', match.end())
+            if pos < 0:
+                return None
+            pos += len(b'</TIER>')
+            tag += b'</TIER>'
+        tier_els.append(ET.fromstring(declaration + tag))
+        ranges.append([match.start(), pos])
+
+    if not ranges:
+        return None
+
+    head, tail = [0, ranges[0][0]], [ranges[-1][1], len(data)]
+    by_id = {t.get('TIER_ID'): i for i, t in enumerate(tier_els)}
+
+    tiers = []
+    for i, tier_el in enumerate(tier_els):
+        needed, j = set(), i
+        while j is not None and j not in needed:
+            needed.add(j)
+            j = by_id.get(tier_els[j].get('PARENT_REF'))
+        tiers.append({'name': tier_el.get('TIER_ID'), 'is_point': False,
+                      'ranges': [ranges[j] for j in sorted(needed)]})
+
+    skeleton = ET.fromstring(data[head[0]:head[1]] + data[tail[0]:tail[1]])
+
+    return {'duration': _get_duration(skeleton), 'head': head, 'tail': tail,
+            'tiers': tiers}
+
+
+def _interval(interval, i, tier_el) -> None:
+    "Creates ANNOTATION element representing interval in .eaf file"
+
+    ann_el = ET.SubElement(tier_el, 'ANNOTATION')
+
+    align_ann = ET.SubElement(ann_el, 'ALIGNABLE_ANNOTATION',
+                              {'ANNOTATION_ID': 'a' + str(i),
+                               'TIME_SLOT_REF1': str(interval.eaf_start),
+                               'TIME_SLOT_REF2': str(interval.eaf_end)})
+
+    ET.SubElement(align_ann, 'ANNOTATION_VALUE').text = interval.text
+
+
+def _tier_el(tier, root) -> ET.Element:
+    "Creates empty TIER element for tier in .eaf file"
+
+    return ET.SubElement(root, 'TIER', {'LINGUISTIC_TYPE_REF': 'default-lt',
+                                        'TIER_ID': tier.name})
+
+
+def _tier(tier, root, incl_empty=False) -> None:
+    "Creates TIER element representing tier in .eaf file"
+
+    tier_el = _tier_el(tier, root)
+
+    if incl_empty:
+        for i, interval in enumerate(tier, start=1):
+            _interval(interval, i, tier_el)
+    else:
+        for i, interval in enumerate(tier, start=1):
+            if not interval.text:
+                continue
+            _interval(interval, i, tier_el)
+
+
+def to_eaf(ann, incl_empty=False, incl_point=False) -> ET.ElementTree:
+    "Returns an Element Tree representing Annotation to be written into .eaf"
+
+    ann = ann._with_points(incl_point)
+
+    ann_doc = _root()
+    ann_tree = ET.ElementTree(ann_doc)
+
+    _header(ann_doc)
+    _time_slots(ann_doc, _time_values(ann, incl_empty))
+    for tier in ann: _tier(tier, ann_doc, incl_empty)
+    _time_slot_refs(ann_doc)
+
+    _default_lt(ann_doc)
+    _time_sub(ann_doc)
+    _symb_sub(ann_doc)
+    _symb_assoc(ann_doc)
+    _incl_in(ann_doc)
+
+    return ann_tree
+
+
+def _root() -> ET.Element:
+    "Returns root ANNOTATION_DOCUMENT element for .eaf tree"
+
+    root = ET.Element(
+        'ANNOTATION_DOCUMENT',
+        {'AUTHOR': '', 'FORMAT': '3.0', 'VERSION': '3.0',
+        'xmlns:xsi': 'http://www.w3.org/2001/XMLSchema-instance',
+        'xsi:noNamespaceSchemaLocation': 'http://www.mpi.nl/tools/elan/EAFv3.0.xsd'}
+    )
+
+    return root
+
+
+def _header(root) -> None:
+    "Creates HEADER element in .eaf tree"
+
+    header = ET.SubElement(root, 'HEADER', {'MEDIA_FILE': '',
+                                            'TIME_UNITS': 'milliseconds'}
+    )
+
+    urn = ET.SubElement(header, 'PROPERTY', {'NAME': 'URN'})
+    last_ann = ET.SubElement(header, 'PROPERTY', {'NAME': 'lastUsedAnnotationId'})
+
+    urn.text = 'urn:nl-mpi-tools-elan-eaf:187f732a-340c-4c9e-a8c3-307ba38799fb'
+    last_ann.text = '0'
+
+
+def _time_values(ann, incl_empty=False) -> list:
+    "Returns a list of time values of all annotation intervals."
+
+    time_values = []
+
+    if incl_empty:
+        for tier in ann:
+            for interval in tier:
+                time_values.append(interval.eaf_start)
+                time_values.append(interval.eaf_end)
+    else:
+        for tier in ann:
+            for interval in tier:
+                if not interval.text:
+                    continue
+                time_values.append(interval.eaf_start)
+                time_values.append(interval.eaf_end)
+
+    time_values.sort()
+
+    return time_values
+
+
+def _time_slots(root, time_values) -> None:
+    "Creates TIME_ORDER and TIME_SLOT elements in .eaf tree from time values"
+
+    time_order = ET.SubElement(root, 'TIME_ORDER')
+
+    for i, tv in enumerate(time_values, start=1):
+        ET.SubElement(time_order, 'TIME_SLOT', {'TIME_SLOT_ID' : 'ts' + str(i),
+                                                'TIME_VALUE': str(tv)}
+        )
+
+
+def _time_slot_refs(root) -> None:
+    "Replaces TIME_SLOT_REF1/2 attribute values with references"
+
+    for ann in root.iter('ALIGNABLE_ANNOTATION'):
+        for ts in root.find('TIME_ORDER'):
+
+            if ann.get('TIME_SLOT_REF1') == ts.get('TIME_VALUE'):
+                ann.set('TIME_SLOT_REF1', ts.get('TIME_SLOT_ID'))
+
+            if ann.get('TIME_SLOT_REF2') == ts.get('TIME_VALUE'):
+                ann.set('TIME_SLOT_REF2', ts.get('TIME_SLOT_ID'))
+
+
+def _default_lt(root) -> None:
+    "Creates LINGUISTIC_TYPE element for default-lt type in .eaf tree"
+
+    ET.SubElement(root, 'LINGUISTIC_TYPE', {'GRAPHIC_REFERENCES': 'false',
+                                            'LINGUISTIC_TYPE_ID': 'default-lt',
+                                            'TIME_ALIGNABLE': 'true'}
+    )
+
+
+def _time_sub(root) -> None:
+    "Creates CONSTRAINT element for Time_Subdivision in .eaf tree"
+
+    DESC = (
+        "Time subdivision of parent annotation's time interval, no time "
+        "gaps allowed within this interval"
+    )
+
+    ET.SubElement(root, 'CONSTRAINT', {'DESCRIPTION': DESC,
+                                       'STEREOTYPE': 'Time_Subdivision'}
+    )
+
+
+def _symb_sub(root) -> None:
+    "Creates CONSTRAINT element for Symbolic_Subdivision in .eaf tree"
+
+    DESC = (
+        "Symbolic subdivision of a parent annotation. "
+        "Annotations refering to the same parent are ordered"
+    )
+
+    ET.SubElement(root, 'CONSTRAINT', {'DESCRIPTION': DESC,
+                                       'STEREOTYPE': 'Symbolic_Subdivision'}
+    )
+
+
+def _symb_assoc(root) -> None:
+    "Creates CONSTRAINT element for Symbolic_Association in .eaf tree"
+
+    DESC = "1-1 association with a parent annotation"
+
+    ET.SubElement(root, 'CONSTRAINT', {'DESCRIPTION': DESC,
+                                       'STEREOTYPE': 'Symbolic_Association'}
+    )
+
+
+def _incl_in(root) -> None:
+    "Creates CONSTRAINT element for Included_In in .eaf tree"
+
+    DESC = (
+        "Time alignable annotations within the parent annotation's "
+        "time interval, gaps are allowed"
+    )
+
+    ET.SubElement(root, 'CONSTRAINT', {'DESCRIPTION': DESC,
+                                       'STEREOTYPE': 'Included_In'}
+    )
+
+
+def _chunk(first: int, intervals, refs, incl_empty=False) -> bytes:
+    """Returns bytes representing ANNOTATION elements of intervals numbered
+    from first, refs are their (TIME_SLOT_REF1, TIME_SLOT_REF2) pairs.
+    """
+
+    tier_el = ET.Element('TIER')
+    for i, interval, (ref1, ref2) in zip(count(first), intervals, refs):
+        if not incl_empty and not interval.text:
+            continue
+        _interval(interval, i, tier_el)
+        tier_el[-1][0].set('TIME_SLOT_REF1', ref1)
+        tier_el[-1][0].set('TIME_SLOT_REF2', ref2)
+
+    return ''.join(ET.tostring(el, 'unicode') for el in tier_el).encode('UTF-8')
+
+
+def _write_chunked(ann, f, incl_empty: bool, incl_point: bool, workers: int) -> None:
+    """Writes Annotation into binary stream f serializing chunks of intervals
+    on a process pool.
+
+    Time slots are numbered beforehand and every interval gets its slot
+    references with the chunk, so the chunks are independent.
+    """
+
+    ann = ann._with_points(incl_point)
+
+    ann_doc = _root()
+    ann_tree = ET.ElementTree(ann_doc)
+
+    _header(ann_doc)
+    time_values = _time_values(ann, incl_empty)
+    _time_slots(ann_doc, time_values)
+
+    # references point to the first slot with the value, as in _time_slot_refs
+    slot_ids = {}
+    for i, tv in enumerate(time_values, start=1):
+        slot_ids.setdefault(tv, 'ts' + str(i))
+
+    jobs = []
+    for tier in ann:
+        tier_el = _tier_el(tier, ann_doc)
+        for first, intervals in formats.chunks(tier.intervals):
+            if not incl_empty and not any(interval.text for interval in intervals):
+                continue
+            refs = [(slot_ids.get(interval.eaf_start), slot_ids.get(interval.eaf_end))
+                    for interval in intervals]
+            tier_el.append(ET.Comment(formats.CHUNK_MARKER))
+            jobs.append((first, intervals, refs, incl_empty))
+
+    _default_lt(ann_doc)
+    _time_sub(ann_doc)
+    _symb_sub(ann_doc)
+    _symb_assoc(ann_doc)
+    _incl_in(ann_doc)
+
+    formats.write_chunks(f, formats.xml_layout(ann_tree), _chunk, jobs, workers)
+
+
+def _annotation_parts(text: str) -> tuple:
+    """Returns ANNOTATION element of an interval with text as strings cut
+    where its number and time slot references go."""
+
+    tier_el = ET.Element('TIER')
+    _interval(Interval(0, 0, text), formats.FIELD_MARKER, tier_el)
+    tier_el[0][0].set('TIME_SLOT_REF1', formats.FIELD_MARKER)
+    tier_el[0][0].set('TIME_SLOT_REF2', formats.FIELD_MARKER)
+
+    # the text comes after the fields and may contain the marker itself
+    return tuple(ET.tostring(tier_el[0], 'unicode').split(formats.FIELD_MARKER, 3))
+
+
+def _template(intervals, incl_empty: bool, texts: dict) -> tuple:
+    """Returns ANNOTATION elements of intervals as a list of strings cut
+    where time slot references go, time values of the references and
+    the elements cut by _annotation_parts() by text.
+
+    Elements are serialized once per distinct text, texts holds those of
+    the previous template of the tier.
+    """
+
+    parts, values, cut = [''], [], {}
+    for i, interval in enumerate(intervals, start=1):
+        if not incl_empty and not interval.text:
+            continue
+        pieces = cut.get(interval.text)
+        if pieces is None:
+            pieces = texts.get(interval.text) or _annotation_parts(interval.text)
+            cut[interval.text] = pieces
+        parts[-1] += pieces[0] + str(i) + pieces[1]
+        parts.extend(pieces[2:])
+        values.extend((interval.eaf_start, interval.eaf_end))
+
+    return parts, values, cut
+
+
+def _time_order(time_values) -> dict:
+    """Returns TIME_SLOT elements of time values as bytes together with the
+    slot referenced by every value."""
+
+    slot_ids = {}
+    for i, tv in enumerate(time_values, start=1):
+        slot_ids.setdefault(tv, 'ts' + str(i))
+
+    data = ''.join(f'<TIME_SLOT TIME_SLOT_ID="ts{i}" TIME_VALUE="{tv}" />'
+                   for i, tv in enumerate(time_values, start=1))
+
+    return {'values': time_values, 'slot_ids': slot_ids, 'data': data.encode('UTF-8')}
+
+
+def _resolved(entry: dict, order: dict) -> bytes:
+    """Returns ANNOTATION elements of a cached tier with references to
+    slots of order, reusing them if order did not change."""
+
+    resolved = entry['resolved']
+    if resolved is None or resolved[0] is not order:
+        refs = [order['slot_ids'][tv] for tv in entry['values']]
+        data = ''.join(chain.from_iterable(zip(entry['parts'], refs))) + entry['parts'][-1]
+        entry['resolved'] = resolved = (order, data.encode('UTF-8'))
+
+    return resolved[1]
+
+
+def _write_cached(ann, f, incl_empty: bool, incl_point: bool, cache) -> None:
+    """Writes Annotation into binary stream f taking serialized tiers from
+    TierCache cache, serializing only tiers missing from it.
+
+    Time slots are shared by all tiers, so tiers are cached with slot
+    references left out and the time values they point to. Time slots are
+    numbered again only if the time values of the annotation changed, and
+    references are then filled into cached tiers without serializing them.
+    Changed tiers are put together from elements cut by text, so only
+    intervals with new texts are serialized by ElementTree.
+    """
+
+    entries = []
+    for tier in ann:
+        if tier.is_point and not incl_point:
+            continue
+        key = ('eaf', incl_empty, ann.duration if tier.is_point else None)
+        entry = cache.get(tier, key)
+        if entry is None:
+            previous = cache.get(tier, key, stale=True)
+            intervals = tier.extended(ann.duration) if tier.is_point else tier.intervals
+            parts, values, texts = _template(intervals, incl_empty,
+                                             previous['texts'] if previous else {})
+            entry = {'parts': parts, 'values': values, 'sorted': sorted(values),
+                     'texts': texts, 'resolved': None}
+            cache.put(tier, key, entry)
+        entries.append((tier, entry))
+
+    # time values are merged again only if some tier was serialized again
+    sources = [entry['sorted'] for _, entry in entries]
+    order = cache.get(ann, ('eaf', incl_empty, incl_point), stale=True)
+    if (order is None or len(order['sources']) != len(sources)
+            or any(a is not b for a, b in zip(order['sources'], sources))):
+        time_values = list(heapq.merge(*sources))
+        if order is None or order['values'] != time_values:
+            order = _time_order(time_values)
+        order['sources'] = sources
+        cache.put(ann, ('eaf', incl_empty, incl_point), order)
+
+    ann_doc = _root()
+    ann_tree = ET.ElementTree(ann_doc)
+
+    _header(ann_doc)
+    chunks = []
+    time_order = ET.SubElement(ann_doc, 'TIME_ORDER')
+    if order['values']:
+        time_order.append(ET.Comment(formats.CHUNK_MARKER))
+        chunks.append(order['data'])
+    for tier, entry in entries:
+        tier_el = _tier_el(tier, ann_doc)
+        if entry['values']:
+            tier_el.append(ET.Comment(formats.CHUNK_MARKER))
+            chunks.append(_resolved(entry, order))
+
+    _default_lt(ann_doc)
+    _time_sub(ann_doc)
+    _symb_sub(ann_doc)
+    _symb_assoc(ann_doc)
+    _incl_in(ann_doc)
+
+    for piece in formats.xml_layout(ann_tree):
+        f.write(piece if isinstance(piece, bytes) else chunks[piece])
+
+
+def write(ann, f, incl_empty=False, incl_point=False, write_workers=None,
+          tier_cache=None, **_) -> None:
+    """Writes Annotation into binary stream f as .eaf.
+
+    With more than one write_workers, chunks of intervals are serialized
+    in parallel. With tier_cache, only tiers changed since the previous
+    write with the same cache are serialized, in this process.
+    """
+
+    if tier_cache is not None:
+        _write_cached(ann, f, incl_empty, incl_point, tier_cache)
+    elif write_workers and write_workers > 1:
+        _write_chunked(ann, f, incl_empty, incl_point, write_workers)
+    else:
+        to_eaf(ann, incl_empty, incl_point).write(f, 'UTF-8', xml_declaration=True)
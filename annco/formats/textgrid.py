@@ -0,0 +1,508 @@
+"""Praat .TextGrid format: long and short text files and binary files."""
+
+import re
+import struct
+
+from annco import formats
+from annco.formats import TG_BINARY_HEADER, TG_MODES
+from annco.model import Interval, LabelTable, Tier
+
+
+def _short_str(text: str) -> str:
+    """Returns text quoted for short .TextGrid file."""
+
+    return '"' + text.replace('"', '""') + '"'
+
+
+def _binary_str(text: str) -> bytes:
+    """Returns text encoded as a string of binary .TextGrid file.
+
+    ASCII strings are prefixed with their length, other strings are written
+    in UTF-16 after 0xFFFF marker, as Praat does.
+    """
+
+    if text.isascii():
+        data = text.encode('ascii')
+        return struct.pack('>H', len(data)) + data
+
+    data = text.encode('utf-16-be')
+    return struct.pack('>HH', 0xFFFF, len(data) // 2) + data
+
+
+def _binary_read_str(data: bytes, pos: int) -> tuple:
+    """Returns string of binary .TextGrid file at pos and position after it."""
+
+    length, = struct.unpack_from('>H', data, pos)
+    pos += 2
+    if length != 0xFFFF:
+        return data[pos:pos+length].decode('ascii'), pos + length
+
+    length, = struct.unpack_from('>H', data, pos)
+    pos += 2
+    return data[pos:pos+2*length].decode('utf-16-be'), pos + 2*length
+
+
+def load(stream, encoding):
+    """Returns contents of .TextGrid file decoded into a string,
+    or bytes if the file is binary (encoding is None).
+    """
+
+    if encoding is None:
+        return stream.read()
+
+    return stream.read().decode(encoding)
+
+
+def from_contents(cls, contents, tiers=None, window=None):
+    """Creates Annotation instance from .TextGrid file contents.
+
+    Contents of short .TextGrid files are recognised by absence of
+    'xmin = ' lines, contents of binary .TextGrid files are bytes.
+    For tiers and window, see read_annotation.
+    """
+
+    if isinstance(contents, bytes):
+        return _from_binary(cls, contents, tiers, window)
+    if not re.search(r'^xmin = ', contents, re.M):
+        return _from_short(cls, contents, tiers, window)
+
+    RE_NAME = re.compile(r'name = "(.*?)"\s+')
+    RE_XMIN = re.compile(r'xmin = ([\d.]+)')
+    RE_XMAX = re.compile(r'xmax = ([\d.]+)')
+    RE_NUMB = re.compile(r'number = ([\d.]+)')
+    RE_TEXT = re.compile(r'text = "(.*?)"\s+', re.S)
+    RE_MARK = re.compile(r'mark = "(.*?)"\s+', re.S)
+
+    # from the first tier on, which need not be 'item [1]' in lazily read parts
+    textgrid = contents[re.search(r'item \[\d+\]:', contents).start():]
+    tg_tiers = re.split(r'item \[\d+\]:', textgrid)[1:]
+
+    duration = float(RE_XMAX.search(textgrid).group(1))
+
+    labels = LabelTable()
+    ann_tiers = []
+    for t in tg_tiers:
+        name = RE_NAME.search(t).group(1)
+        if not cls._selected(name, tiers):
+            continue
+
+        if re.search(r"IntervalTier", t):
+            starts = [float(start) for start in RE_XMIN.findall(t)][1:]
+            ends = [float(end) for end in RE_XMAX.findall(t)][1:]
+            texts = [labels.intern(text.strip()) for text in RE_TEXT.findall(t)]
+            tups = zip(starts, ends, texts)
+
+            intervals = [Interval(*bounds, text) for (start, end, text) in tups
+                         if (bounds := cls._clip(start, end, window))]
+            ann_tiers.append(Tier(name, intervals))
+
+        elif re.search(r"TextTier", t):
+            times = [float(time) for time in RE_NUMB.findall(t)]
+            texts = [labels.intern(text.strip()) for text in RE_MARK.findall(t)]
+            tups = zip(times, texts)
+
+            intervals = [Interval(time, time, text) for time, text in tups
+                         if cls._clip(time, time, window)]
+            ann_tiers.append(Tier(name, intervals, is_point=True))
+
+    return cls(ann_tiers, cls._clip_duration(duration, window), labels)
+
+
+def _from_short(cls, contents, tiers=None, window=None):
+    """Creates Annotation instance from short .TextGrid file contents."""
+
+    RE_TOKEN = re.compile(r'"((?:[^"]|"")*)"|(\S+)')
+
+    body = contents.split('"TextGrid"', 1)[1]
+    tokens = iter([
+        m.group(2) if m.group(1) is None else m.group(1).replace('""', '"')
+        for m in RE_TOKEN.finditer(body)
+    ])
+
+    next(tokens)  # xmin
+    duration = cls._clip_duration(float(next(tokens)), window)
+    if next(tokens) != '<exists>':
+        return cls([], duration)
+
+    labels = LabelTable()
+    ann_tiers = []
+    for _ in range(int(next(tokens))):
+        tg_class, name = next(tokens), next(tokens)
+        next(tokens), next(tokens)  # tier xmin and xmax
+        size = int(next(tokens))
+        selected = cls._selected(name, tiers)
+
+        intervals = []
+        if tg_class == 'TextTier':
+            for _ in range(size):
+                time, text = float(next(tokens)), next(tokens)
+                if selected and cls._clip(time, time, window):
+                    intervals.append(Interval(time, time, labels.intern(text.strip())))
+        else:
+            for _ in range(size):
+                start, end = float(next(tokens)), float(next(tokens))
+                text = next(tokens)
+                if selected and (bounds := cls._clip(start, end, window)):
+                    intervals.append(Interval(*bounds, labels.intern(text.strip())))
+
+        if selected:
+            ann_tiers.append(Tier(name, intervals, tg_class == 'TextTier'))
+
+    return cls(ann_tiers, duration, labels)
+
+
+def _from_binary(cls, data, tiers=None, window=None):
+    """Creates Annotation instance from binary .TextGrid file contents."""
+
+    pos = len(TG_BINARY_HEADER)
+    _, duration, exists = struct.unpack_from('>2d?', data, pos)
+    duration = cls._clip_duration(duration, window)
+    pos += 17
+    if not exists:
+        return cls([], duration)
+
+    size, = struct.unpack_from('>i', data, pos)
+    pos += 4
+
+    labels = LabelTable()
+    ann_tiers = []
+    for _ in range(size):
+        tg_class = data[pos+1:pos+1+data[pos]]
+        pos += 1 + data[pos]
+        name, pos = _binary_read_str(data, pos)
+        count, = struct.unpack_from('>i', data, pos + 16)
+        pos += 20
+        selected = cls._selected(name, tiers)
+
+        intervals = []
+        if tg_class == b'TextTier':
+            for _ in range(count):
+                time, = struct.unpack_from('>d', data, pos)
+                text, pos = _binary_read_str(data, pos + 8)
+                if selected and cls._clip(time, time, window):
+                    intervals.append(Interval(time, time, labels.intern(text)))
+        else:
+            for _ in range(count):
+                start, end = struct.unpack_from('>2d', data, pos)
+                text, pos = _binary_read_str(data, pos + 16)
+                if selected and (bounds := cls._clip(start, end, window)):
+                    intervals.append(Interval(*bounds, labels.intern(text)))
+
+        if selected:
+            ann_tiers.append(Tier(name, intervals, tg_class == b'TextTier'))
+
+    return cls(ann_tiers, duration, labels)
+
+
+def scan(data, encoding) -> dict:
+    """Returns byte ranges of tiers of long .TextGrid file contents data
+    for lazy reading, or None for short and binary files.
+
+    Every tier is read from the part of the file before the first tier
+    followed by its own 'item [n]:' section, see annco.lazy.
+    """
+
+    if encoding is None or not re.search(rb'^xmin = ', data, re.M):
+        return None
+
+    RE_NAME = re.compile(rb'name = "(.*?)"\s+')
+    RE_ITEM = re.compile(rb'item \[\d+\]:')
+    RE_INTERVAL = re.compile(rb'IntervalTier')
+    RE_POINT = re.compile(rb'TextTier')
+
+    first = RE_ITEM.search(data)
+    if first is None:
+        return None
+    first = first.start()
+    bounds = [m.start() for m in RE_ITEM.finditer(data, first)]
+
+    tiers = []
+    for start, end in zip(bounds, bounds[1:] + [len(data)]):
+        name = RE_NAME.search(data, start, end)
+        if name is None:
+            continue
+        # classes are told apart as from_contents does
+        if RE_INTERVAL.search(data, start, end):
+            is_point = False
+        elif RE_POINT.search(data, start, end):
+            is_point = True
+        else:
+            continue
+        tiers.append({'name': name.group(1).decode(encoding), 'is_point': is_point,
+                      'ranges': [[start, end]]})
+
+    duration = float(re.compile(rb'xmax = ([\d.]+)').search(data, first).group(1))
+
+    return {'duration': duration, 'head': [0, first], 'tail': [len(data), len(data)],
+            'tiers': tiers}
+
+
+def _interval(interval, i) -> str:
+    "Returns a string representing interval in .TextGrid file"
+
+    if interval.start != interval.end:
+        tg_interval = (
+            f"        intervals [{i}]:\n"
+            f"            xmin = {interval.start}\n"
+            f"            xmax = {interval.end}\n"
+            f"            text = \"{interval.text}\"\n"
+        )
+    else:
+        tg_interval = (
+            f"        points [{i}]:\n"
+            f"            number = {interval.start}\n"
+            f"            mark = \"{interval.text}\"\n"
+        )
+
+    return tg_interval
+
+
+def _interval_short(interval, is_point: bool) -> str:
+    "Returns a string representing interval in short .TextGrid file"
+
+    if is_point:
+        return f"{interval.start}\n{_short_str(interval.text)}\n"
+
+    return f"{interval.start}\n{interval.end}\n{_short_str(interval.text)}\n"
+
+
+def _interval_binary(interval, is_point: bool) -> bytes:
+    "Returns bytes representing interval in binary .TextGrid file"
+
+    if is_point:
+        return struct.pack('>d', interval.start) + _binary_str(interval.text)
+
+    return struct.pack('>2d', interval.start, interval.end) + _binary_str(interval.text)
+
+
+def _tier_head(tier, t, end) -> str:
+    "Returns a string representing tier header in a .TextGrid file"
+
+    if not tier.is_point:
+        tg_tier = (
+            f"    item [{t}]:\n"
+            "        class = \"IntervalTier\"\n"
+            f"        name = \"{tier.name}\"\n"
+            f"        xmin = 0\n"
+            f"        xmax = {end}\n"
+            f"        intervals: size = {len(tier)}\n"
+        )
+    else:
+        tg_tier = (
+            f"    item [{t}]:\n"
+            "        class = \"TextTier\"\n"
+            f"        name = \"{tier.name}\"\n"
+            f"        xmin = 0\n"
+            f"        xmax = {end}\n"
+            f"        points: size = {len(tier)}\n"
+        )
+
+    return tg_tier
+
+
+def _tier(tier, t, end) -> str:
+    "Returns a string representing tier in a .TextGrid file"
+
+    tg_tier = _tier_head(tier, t, end)
+    for i, interval in enumerate(tier, start=1):
+        tg_tier += _interval(interval, i)
+
+    return tg_tier
+
+
+def _tier_head_short(tier, end) -> str:
+    "Returns a string representing tier header in a short .TextGrid file"
+
+    tg_class = "TextTier" if tier.is_point else "IntervalTier"
+    return f"\"{tg_class}\"\n{_short_str(tier.name)}\n0\n{end}\n{len(tier)}\n"
+
+
+def _tier_short(tier, end) -> str:
+    "Returns a string representing tier in a short .TextGrid file"
+
+    tg_tier = [_tier_head_short(tier, end)]
+    tg_tier.extend(_interval_short(interval, tier.is_point) for interval in tier)
+
+    return ''.join(tg_tier)
+
+
+def _tier_head_binary(tier, end) -> bytes:
+    "Returns bytes representing tier header in a binary .TextGrid file"
+
+    tg_class = b"TextTier" if tier.is_point else b"IntervalTier"
+    return b''.join([
+        bytes([len(tg_class)]) + tg_class,
+        _binary_str(tier.name),
+        struct.pack('>2di', 0, end, len(tier))
+    ])
+
+
+def _tier_binary(tier, end) -> bytes:
+    "Returns bytes representing tier in a binary .TextGrid file"
+
+    tg_tier = [_tier_head_binary(tier, end)]
+    tg_tier.extend(_interval_binary(interval, tier.is_point) for interval in tier)
+
+    return b''.join(tg_tier)
+
+
+def _head(ann) -> str:
+    "Returns a string representing header of .TextGrid file"
+
+    return (
+        "File type = \"ooTextFile\"\n"
+        "Object class = \"TextGrid\"\n\n"
+        f"xmin = {0}\n"
+        f"xmax = {ann.duration}\n"
+        "tiers? <exists>\n"
+        f"size = {len(ann)}\n"
+        "item []:\n"
+    )
+
+
+def _head_short(ann) -> str:
+    "Returns a string representing header of short .TextGrid file"
+
+    return (
+        "File type = \"ooTextFile\"\n"
+        "Object class = \"TextGrid\"\n\n"
+        f"0\n{ann.duration}\n<exists>\n{len(ann)}\n"
+    )
+
+
+def _head_binary(ann) -> bytes:
+    "Returns bytes representing header of binary .TextGrid file"
+
+    return TG_BINARY_HEADER + struct.pack('>2d?i', 0, ann.duration, True, len(ann))
+
+
+def to_tg(ann) -> str:
+    "Returns a string representing Annotation to be written into .TextGrid"
+
+    ann = ann._filled()
+
+    tg_ann = _head(ann)
+    for t, tier in enumerate(ann, start=1):
+        tg_ann += _tier(tier, t, ann.duration)
+
+    return tg_ann
+
+
+def to_tg_short(ann) -> str:
+    "Returns a string representing Annotation to be written into short .TextGrid"
+
+    ann = ann._filled()
+
+    tg_ann = [_head_short(ann)]
+    tg_ann.extend(_tier_short(tier, ann.duration) for tier in ann)
+
+    return ''.join(tg_ann)
+
+
+def to_tg_binary(ann) -> bytes:
+    "Returns bytes representing Annotation to be written into binary .TextGrid"
+
+    ann = ann._filled()
+
+    tg_ann = [_head_binary(ann)]
+    tg_ann.extend(_tier_binary(tier, ann.duration) for tier in ann)
+
+    return b''.join(tg_ann)
+
+
+def _chunk(tg_mode: str, is_point: bool, first: int, intervals) -> bytes:
+    "Returns bytes representing intervals numbered from first in .TextGrid"
+
+    if tg_mode == 'long':
+        return ''.join(_interval(interval, i) for i, interval
+                       in enumerate(intervals, start=first)).encode('UTF-8')
+    if tg_mode == 'short':
+        return ''.join(_interval_short(interval, is_point)
+                       for interval in intervals).encode('UTF-8')
+
+    return b''.join(_interval_binary(interval, is_point) for interval in intervals)
+
+
+def _write_chunked(ann, f, tg_mode: str, workers: int) -> None:
+    """Writes Annotation into binary stream f serializing chunks of intervals
+    on a process pool. Headers and interval numbers do not depend on other
+    chunks, so every chunk is serialized on its own.
+    """
+
+    ann = ann._filled()
+
+    if tg_mode == 'long':
+        layout = [_head(ann).encode('UTF-8')]
+    elif tg_mode == 'short':
+        layout = [_head_short(ann).encode('UTF-8')]
+    else:
+        layout = [_head_binary(ann)]
+
+    jobs = []
+    for t, tier in enumerate(ann, start=1):
+        if tg_mode == 'long':
+            layout.append(_tier_head(tier, t, ann.duration).encode('UTF-8'))
+        elif tg_mode == 'short':
+            layout.append(_tier_head_short(tier, ann.duration).encode('UTF-8'))
+        else:
+            layout.append(_tier_head_binary(tier, ann.duration))
+
+        for first, intervals in formats.chunks(tier.intervals):
+            layout.append(len(jobs))
+            jobs.append((tg_mode, tier.is_point, first, intervals))
+
+    formats.write_chunks(f, layout, _chunk, jobs, workers)
+
+
+def _write_cached(ann, f, tg_mode: str, cache) -> None:
+    """Writes Annotation into binary stream f taking serialized tiers from
+    TierCache cache, serializing only tiers missing from it.
+
+    A serialized tier depends on its position, name, type and the duration
+    of the annotation only, the header is written anew.
+    """
+
+    if tg_mode == 'long':
+        f.write(_head(ann).encode('UTF-8'))
+    elif tg_mode == 'short':
+        f.write(_head_short(ann).encode('UTF-8'))
+    else:
+        f.write(_head_binary(ann))
+
+    for t, tier in enumerate(ann, start=1):
+        key = ('textgrid', tg_mode, t, tier.name, tier.is_point, ann.duration)
+        data = cache.get(tier, key)
+        if data is None:
+            filled = (tier if tier.is_point
+                      else Tier(tier.name, tier.filled(ann.duration), tier.is_point))
+            if tg_mode == 'long':
+                data = _tier(filled, t, ann.duration).encode('UTF-8')
+            elif tg_mode == 'short':
+                data = _tier_short(filled, ann.duration).encode('UTF-8')
+            else:
+                data = _tier_binary(filled, ann.duration)
+            cache.put(tier, key, data)
+        f.write(data)
+
+
+def write(ann, f, tg_mode='long', write_workers=None, tier_cache=None, **_) -> None:
+    """Writes Annotation into binary stream f as long, short or binary .TextGrid.
+
+    With more than one write_workers, chunks of intervals are serialized
+    in parallel. With tier_cache, only tiers changed since the previous
+    write with the same cache are serialized, in this process.
+    """
+
+    if tg_mode not in TG_MODES:
+        raise ValueError(f"Unsupported .TextGrid mode: {tg_mode}")
+
+    if tier_cache is not None:
+        _write_cached(ann, f, tg_mode, tier_cache)
+    elif write_workers and write_workers > 1:
+        _write_chunked(ann, f, tg_mode, write_workers)
+    elif tg_mode == 'long':
+        f.write(to_tg(ann).encode('UTF-8'))
+    elif tg_mode == 'short':
+        f.write(to_tg_short(ann).encode('UTF-8'))
+    else:
+        f.write(to_tg_binary(ann))
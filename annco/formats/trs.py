@@ -0,0 +1,176 @@
+"""Transcriber .trs format, read only."""
+
+import xml.etree.ElementTree as ET
+
+from annco.model import Interval, LabelTable, Tier
+
+
+def load(stream, encoding):
+    """Returns .trs file parsed into an Element Tree."""
+
+    return ET.parse(stream)
+
+
+def from_contents(cls, contents, tiers=None, window=None):
+    """Creates Annotation instance from .trs file contents."""
+
+    trans = contents.getroot()
+    selected = {name for name in ('Теми', 'Мовці', 'Транскрипція', 'Фон')
+                if cls._selected(name, tiers)}
+
+    if 'Теми' in selected:
+        _insert_topics(trans)
+    if 'Мовці' in selected:
+        _insert_speakers(trans)
+
+    labels = LabelTable()
+    sections = _get_sections(trans, labels) if 'Теми' in selected else []
+    turns = _get_turns(trans, labels) if 'Мовці' in selected else []
+    if selected & {'Транскрипція', 'Фон'}:
+        transcription, background = _get_transcription(trans, labels)
+    else:
+        transcription, background = [], []
+
+    duration = sections[-1].end if sections else _duration(trans)
+
+    _set_ends(transcription, duration)
+    _set_ends(background, duration)
+
+    ann_tiers = []
+    for name, intervals in (('Теми', sections), ('Мовці', turns),
+                            ('Транскрипція', transcription),
+                            ('Фон', background)):
+        if name not in selected or (name == 'Фон' and not background):
+            continue
+        if window is not None:
+            intervals = cls._clip_intervals(intervals, window)
+        ann_tiers.append(Tier(name, intervals))
+
+    return cls(ann_tiers, cls._clip_duration(duration, window), labels)
+
+
+def _insert_topics(root) -> None:
+    """Sets sections' topics to descriptions in .trs file root."""
+
+    if root.find('Topics'):
+        for sect in root.iter('Section'):
+            for topic in root.find('Topics'):
+                if sect.get('topic') == topic.get('id'):
+                    sect.set('topic', topic.get('desc'))
+
+
+def _insert_speakers(root) -> None:
+    """Sets turns' speakers to names in .trs file root."""
+
+    if root.find('Speakers'):
+        for turn in root.iter('Turn'):
+            if not turn.get('speaker'):
+                continue
+            turn.set('speaker', turn.get('speaker').replace(' ', ' + '))
+            for spk in root.find('Speakers'):
+                if spk.get('id') in turn.get('speaker'):
+                    turn.set(
+                        'speaker',
+                        turn.get('speaker').replace(spk.get('id'),
+                                                    spk.get('name'))
+                    )
+
+
+def _get_sections(root, labels) -> list:
+    """Returns list of Interval instances for sections from .trs file root."""
+
+    sections = []
+    for sect in root.iter('Section'):
+        start = float(sect.get('startTime'))
+        end = float(sect.get('endTime'))
+        text = sect.get('topic') if sect.get('topic') else sect.get('type')
+
+        sections.append(Interval(start, end, labels.intern(text)))
+
+    return sections
+
+
+def _duration(root) -> float:
+    """Returns end time of the last section of .trs file root."""
+
+    for sect in root.iter('Section'):
+        last = sect
+
+    return float(last.get('endTime'))
+
+
+def _get_turns(root, labels) -> list:
+    """Returns list of Interval instances for turns from .trs file root."""
+
+    turns = []
+    for turn in root.iter('Turn'):
+        start = float(turn.get('startTime'))
+        end = float(turn.get('endTime'))
+        text = turn.get('speaker') if turn.get('speaker') else '(без мовця)'
+
+        turns.append(Interval(start, end, labels.intern(text)))
+
+    return turns
+
+
+def _get_transcription(root, labels) -> list:
+    """Returns list of Interval instances for transcription and background
+    from .trs file root.
+    """
+
+    transcription = []
+    background = []
+
+    for el in root.findall('.//Turn/*'):
+        if el.tag == 'Sync':
+            start = float(el.get('time'))
+            end = 0.0
+            text = el.tail.strip()
+            transcription.append(Interval(start, end, text))
+
+        elif el.tag == 'Who':
+            nb = el.get('nb')
+            text = el.tail.strip()
+            transcription[-1].text += f" {nb}: {text}"
+
+        elif el.tag == 'Comment':
+            desc = el.get('desc')
+            text = el.tail.strip()
+            transcription[-1].text += f" {{{desc}}} {text}"
+
+        elif el.tag == 'Background':
+            text = el.tail.strip()
+            transcription[-1].text += f" {text}"
+            start = float(el.get('time'))
+            end = 0.0
+            text = '' if el.get('level') == 'off' else el.get('type')
+            background.append(Interval(start, end, labels.intern(text)))
+
+        elif el.tag == 'Event':
+            desc, text = el.get('desc'), el.tail.strip()
+            if el.get('extent') == 'instantaneous':
+                transcription[-1].text += f" [{desc}] {text}"
+            if el.get('extent') == 'begin':
+                transcription[-1].text += f" [{desc}-] {text}"
+            if el.get('extent') == 'end':
+                transcription[-1].text += f" [-{desc}] {text}"
+            if el.get('extent') == 'next':
+                transcription[-1].text += f" [{desc}]+ {text}"
+            if el.get('extent') == 'previous':
+                transcription[-1].text += f" +[{desc}] {text}"
+
+    # if the initial interval text was empty and a formatted string
+    # with leading space was appended
+    for interval in transcription:
+        interval.text = labels.intern(interval.text.strip())
+
+    return transcription, background
+
+
+def _set_ends(intervals, duration) -> None:
+    """Sets ends for intervals."""
+
+    for i in range(len(intervals)-1):
+        intervals[i].end = intervals[i+1].start
+
+    if intervals: intervals[-1].end = duration
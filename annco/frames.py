@@ -0,0 +1,337 @@
+"""Frame-level label arrays of annotation tiers for training acoustic models.
+
+Every tier of a file is rasterized into label IDs of consecutive frames of
+hop seconds: a frame gets the label of the interval its centre falls in,
+or 0 (the empty label) if there is none. Frames are filled interval by
+interval with slice assignment on compact arrays, never frame by frame in
+Python. Workers of a process pool find the spans of frames of every file
+with label IDs local to the file; as results arrive, arrays are filled
+span by span with IDs of a vocabulary shared by the corpus and written as
+.npy files (or raw binary) with the vocabulary and the shapes in a JSON
+index next to them.
+"""
+
+import argparse
+import io
+import json
+import math
+import os
+import re
+import sys
+
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from annco.fileio import atomic_output, read_annotation, sniff, strip_compression
+from annco.model import LabelTable
+from annco.batch import iter_inputs
+
+
+HOP = 0.01
+OVERLAP_POLICIES = ('last', 'first', 'longest', 'shortest')
+POINT_POLICIES = ('frame', 'extend', 'skip')
+INDEX_NAME = 'frames.json'
+
+# typecodes of arrays by the largest label ID they hold, with .npy descr
+DTYPES = ((0xff, 'B', '|u1'), (0x7fff, 'h', '<i2'), (0x7fffffff, 'i', '<i4'))
+
+
+def frame_count(duration: float, hop=HOP) -> int:
+    """Returns number of frames of hop seconds covering duration, the last
+    one possibly partial."""
+
+    return max(math.ceil(round(duration / hop, 9)), 0)
+
+
+def _first_frame(time: float, hop: float) -> int:
+    "Returns index of the first frame whose centre is not before time"
+
+    return math.ceil(round(time / hop - 0.5, 9))
+
+
+def spans(tier, duration: float, hop=HOP, labels=None, overlap='last',
+          points='frame') -> list:
+    """Returns (first, last, label ID) spans of frames of tier in the order
+    they are filled, later spans overwriting earlier ones, or None if it is
+    a point tier left out.
+
+    IDs come from LabelTable labels, whose first text must be the empty
+    one (ID 0, also given to frames outside intervals); a new table is used
+    if labels is None. Where intervals overlap, a frame gets the label of
+    the interval starting 'last' or 'first', or of the 'longest' or
+    'shortest' one. Points mark the 'frame' they fall in, are 'extend'ed to
+    the next point or are left out ('skip').
+    """
+
+    if overlap not in OVERLAP_POLICIES:
+        raise ValueError(f"Unsupported overlap policy: {overlap}")
+    if points not in POINT_POLICIES:
+        raise ValueError(f"Unsupported point policy: {points}")
+    if labels is None:
+        labels = LabelTable([''])
+    elif not labels.texts or labels.texts[0] != '':
+        raise ValueError("Label ID 0 must be the empty label")
+
+    if tier.is_point and points == 'skip':
+        return None
+
+    count = frame_count(duration, hop)
+    intervals = tier.intervals
+    if tier.is_point and points == 'extend':
+        intervals = tier.extended(duration)
+    as_points = tier.is_point and points == 'frame'
+
+    found = []
+    for interval in intervals:
+        if as_points:
+            first = math.floor(round(interval.start / hop, 9))
+            last = first + 1
+        else:
+            first = _first_frame(interval.start, hop)
+            last = _first_frame(interval.end, hop)
+        first, last = max(first, 0), min(last, count)
+        if first < last and interval.text:
+            found.append((interval.start, interval.end - interval.start, first, last,
+                          labels.id(interval.text)))
+
+    if overlap == 'last':
+        found.sort(key=lambda span: span[0])
+    elif overlap == 'first':
+        found.sort(key=lambda span: span[0], reverse=True)
+    elif overlap == 'longest':
+        found.sort(key=lambda span: span[1])
+    else:
+        found.sort(key=lambda span: span[1], reverse=True)
+
+    return [span[2:] for span in found]
+
+
+def fill(tier_spans: list, count: int, typecode='i', ids=None) -> array:
+    """Returns array of count frames of typecode filled with spans (see
+    spans()), their label IDs mapped through sequence ids if given."""
+
+    frames = array(typecode, [0]) * count
+    for first, last, label_id in tier_spans:
+        if ids is not None:
+            label_id = ids[label_id]
+        frames[first:last] = array(typecode, [label_id]) * (last - first)
+
+    return frames
+
+
+def rasterize(tier, duration: float, hop=HOP, labels=None, overlap='last',
+              points='frame') -> array:
+    """Returns array of label IDs of frames of tier, or None if it is a
+    point tier left out. Arguments are those of spans()."""
+
+    tier_spans = spans(tier, duration, hop, labels, overlap, points)
+    if tier_spans is None:
+        return None
+
+    return fill(tier_spans, frame_count(duration, hop))
+
+
+def rasterize_annotation(ann, hop=HOP, labels=None, overlap='last',
+                         points='frame') -> tuple:
+    """Returns names of rasterized tiers of Annotation and their arrays of
+    label IDs (see rasterize), all of the same number of frames."""
+
+    if labels is None:
+        labels = LabelTable([''])
+
+    names, rows = [], []
+    for tier in ann:
+        frames = rasterize(tier, ann.duration, hop, labels, overlap, points)
+        if frames is not None:
+            names.append(tier.name)
+            rows.append(frames)
+
+    return names, rows
+
+
+def _dtype(max_id: int) -> tuple:
+    "Returns typecode and .npy descr of the smallest array type for max_id"
+
+    for limit, typecode, descr in DTYPES:
+        if max_id <= limit:
+            return typecode, descr
+
+    raise ValueError(f"Too many labels: {max_id + 1}")
+
+
+def write_npy(f, rows, typecode: str, count: int) -> None:
+    """Writes rows (arrays of count items of typecode) into binary stream
+    f as a two-dimensional .npy array."""
+
+    descr = next(descr for _, code, descr in DTYPES if code == typecode)
+    header = (f"{{'descr': '{descr}', 'fortran_order': False, "
+              f"'shape': ({len(rows)}, {count}), }}")
+    # magic, version 1.0 and header length take 10 bytes, the whole header
+    # is padded with spaces to a multiple of 64 bytes
+    header += ' ' * (-(10 + len(header) + 1) % 64) + '\n'
+
+    f.write(b'\x93NUMPY\x01\x00' + len(header).to_bytes(2, 'little')
+            + header.encode('latin-1'))
+    write_raw(f, rows)
+
+
+def write_raw(f, rows) -> None:
+    """Writes rows (arrays) into binary stream f one after another as
+    little-endian integers."""
+
+    for row in rows:
+        if sys.byteorder == 'big' and row.itemsize > 1:
+            row = array(row.typecode, row)
+            row.byteswap()
+        f.write(row.tobytes())
+
+
+def _frames_job(src, hop: float, tiers, overlap: str, points: str) -> tuple:
+    """Finds spans of frames of every tier of src in a worker, returns
+    (status, src, result) where result is (tier names, frame count, labels,
+    spans of every tier with local label IDs) or an error message."""
+
+    if sniff(src)[0] is None:
+        return 'ignored', src, None
+    try:
+        ann = read_annotation(src, tiers)
+        labels = LabelTable([''])
+        names, found = [], []
+        for tier in ann:
+            tier_spans = spans(tier, ann.duration, hop, labels, overlap, points)
+            if tier_spans is not None:
+                names.append(tier.name)
+                found.append(tier_spans)
+    except Exception as e:
+        return 'failed', src, f"{type(e).__name__}: {e}"
+
+    return 'ok', src, (names, frame_count(ann.duration, hop), labels.texts, found)
+
+
+def _output_name(src, src_root, raw: bool) -> str:
+    "Returns path of the array of src relative to the output directory"
+
+    rel = (os.path.relpath(src, src_root) if os.path.isdir(src_root)
+           else os.path.basename(src))
+    return os.path.splitext(strip_compression(rel))[0] + ('.bin' if raw else '.npy')
+
+
+def export_frames(src_root, out_root, hop=HOP, tiers=None, overlap='last',
+                  points='frame', raw=False, workers=None, vocabulary=None) -> dict:
+    """Writes label arrays of every annotation file under src_root (or of a
+    single file) into out_root, mirroring the directory layout.
+
+    Files are rasterized on a process pool of workers, one at a time per
+    worker. Label IDs are those of a vocabulary shared by all files, which
+    starts from the list of texts vocabulary if given (e.g. labels of a
+    previous export, keeping their IDs) and grows as new labels are found.
+    Arrays are .npy files of shape (tiers, frames), or raw little-endian
+    integers if raw is True; the INDEX_NAME file in out_root lists hop,
+    the vocabulary and tier names, shape and dtype of every array.
+    Returns a summary of the run.
+    """
+
+    labels = LabelTable(vocabulary or [''])
+    if labels.texts[0] != '':
+        raise ValueError("Label ID 0 must be the empty label")
+
+    summary = {'written': 0, 'frames': 0, 'ignored': 0, 'failed': {}}
+    files = {}
+    workers = workers or os.cpu_count() or 1
+    srcs = iter_inputs(src_root) if os.path.isdir(src_root) else [src_root]
+
+    def store(src, names, count, local, found):
+        ids = [labels.id(text) for text in local]
+        typecode, descr = _dtype(max(ids))
+        rows = [fill(tier_spans, count, typecode, ids) for tier_spans in found]
+
+        name = _output_name(src, src_root, raw)
+        path = os.path.join(out_root, name)
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with atomic_output(path) as f:
+            if raw:
+                write_raw(f, rows)
+            else:
+                write_npy(f, rows, typecode, count)
+
+        files[name.replace(os.sep, '/')] = {'source': src, 'tiers': names,
+                                            'shape': [len(rows), count],
+                                            'dtype': descr}
+        summary['written'] += 1
+        summary['frames'] += count * len(rows)
+
+    with ProcessPoolExecutor(workers) as pool:
+        pending = deque()
+
+        def collect(limit):
+            while len(pending) > limit:
+                status, src, result = pending.popleft().result()
+                if status == 'ignored':
+                    summary['ignored'] += 1
+                elif status == 'failed':
+                    summary['failed'][src] = result
+                else:
+                    store(src, *result)
+
+        for src in srcs:
+            pending.append(pool.submit(_frames_job, src, hop, tiers, overlap, points))
+            collect(2 * workers)
+        collect(0)
+
+    os.makedirs(out_root, exist_ok=True)
+    index = {'hop': hop, 'overlap': overlap, 'points': points,
+             'labels': labels.texts, 'files': files}
+    with atomic_output(os.path.join(out_root, INDEX_NAME)) as raw_f, \
+            io.TextIOWrapper(raw_f, 'UTF-8') as f:
+        json.dump(index, f, ensure_ascii=False, indent=1)
+
+    return summary
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='python -m annco.frames',
+        description="Write frame-level label arrays of annotation tiers."
+    )
+    parser.add_argument('src', help="annotation file or directory")
+    parser.add_argument('out_root', help="output directory")
+    parser.add_argument('--hop', type=float, default=HOP, metavar='SECONDS',
+                        help=f"frame length (default: {HOP})")
+    parser.add_argument('-t', '--tiers', type=re.compile,
+                        help="regular expression matching whole names of tiers")
+    parser.add_argument('--overlap', choices=OVERLAP_POLICIES, default='last',
+                        help="which of overlapping intervals labels a frame")
+    parser.add_argument('--points', choices=POINT_POLICIES, default='frame',
+                        help="how point tiers are rasterized")
+    parser.add_argument('--raw', action='store_true',
+                        help="write raw binary arrays instead of .npy files")
+    parser.add_argument('--vocab', help="JSON index of a previous export whose "
+                                        "label IDs are kept")
+    parser.add_argument('-w', '--workers', type=int)
+    args = parser.parse_args(argv)
+    if args.hop <= 0:
+        parser.error("--hop must be positive")
+
+    vocabulary = None
+    if args.vocab:
+        with open(args.vocab, encoding='UTF-8') as f:
+            vocabulary = json.load(f)['labels']
+
+    try:
+        summary = export_frames(args.src, args.out_root, args.hop, args.tiers,
+                                args.overlap, args.points, args.raw, args.workers,
+                                vocabulary)
+    except ValueError as e:
+        parser.error(str(e))
+
+    print(f"written: {summary['written']}, frames: {summary['frames']}, "
+          f"ignored: {summary['ignored']}, failed: {len(summary['failed'])}")
+    for src, error in summary['failed'].items():
+        print(f"{src}: {error}")
+
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
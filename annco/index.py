@@ -0,0 +1,304 @@
+"""SQLite index of annotation corpora with full-text search.
+
+Parsed files are stored as files, tiers and intervals tables, with an FTS5
+index over interval texts and a (tier, start, end) index for time queries.
+Files are parsed by worker processes and inserted in bulk, several files
+per transaction. Ingestion is incremental: files are re-ingested only when
+their content hash changes, and files which disappeared are removed. Files
+are hashed only when their size or mtime differ from the indexed ones.
+"""
+
+import argparse
+import os
+import sqlite3
+
+from math import isfinite
+
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from annco.fileio import read_annotation, sniff
+from annco.model import Interval
+from annco.batch import file_hash, iter_inputs
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    hash TEXT NOT NULL,
+    duration REAL NOT NULL,
+    size INTEGER,
+    mtime INTEGER
+);
+CREATE TABLE IF NOT EXISTS tiers (
+    id INTEGER PRIMARY KEY,
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    is_point INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS intervals (
+    id INTEGER PRIMARY KEY,
+    tier_id INTEGER NOT NULL REFERENCES tiers(id) ON DELETE CASCADE,
+    start REAL NOT NULL,
+    "end" REAL NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tiers_file ON tiers(file_id);
+CREATE INDEX IF NOT EXISTS intervals_time ON intervals(tier_id, start, "end");
+CREATE VIRTUAL TABLE IF NOT EXISTS intervals_fts USING fts5(
+    text, content='intervals', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS intervals_ai AFTER INSERT ON intervals BEGIN
+    INSERT INTO intervals_fts(rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS intervals_ad AFTER DELETE ON intervals BEGIN
+    INSERT INTO intervals_fts(intervals_fts, rowid, text)
+    VALUES ('delete', old.id, old.text);
+END;
+"""
+
+FILES_PER_TRANSACTION = 100
+
+Hit = namedtuple('Hit', 'file tier interval')
+
+
+def _finite(value) -> bool:
+    "Returns True if value is a finite number, which can be stored as a time"
+
+    return isinstance(value, (int, float)) and isfinite(value)
+
+
+def _parse(path, known_hash) -> tuple:
+    """Parses path in a worker and returns (status, path, result).
+
+    status is 'ignored' if path is not an annotation, 'failed' with an error
+    message as result, 'unchanged' with (size, mtime) if its content hash
+    is still known_hash, or 'ok' with (hash, size, mtime, duration, tiers,
+    dropped): tiers as (name, is_point, [(start, end, text), ...]) and
+    the number of intervals dropped for times which are not finite numbers.
+    """
+
+    try:
+        if sniff(path)[0] is None:
+            return 'ignored', path, None
+        stat = os.stat(path)
+        digest = file_hash(path)
+        if digest == known_hash:
+            return 'unchanged', path, (stat.st_size, stat.st_mtime_ns)
+        ann = read_annotation(path)
+    except Exception as e:
+        return 'failed', path, f"{type(e).__name__}: {e}"
+
+    tiers, dropped = [], 0
+    for tier in ann:
+        intervals = [(i.start, i.end, i.text or '') for i in tier.intervals
+                     if _finite(i.start) and _finite(i.end)]
+        dropped += len(tier.intervals) - len(intervals)
+        tiers.append((tier.name, tier.is_point, intervals))
+
+    return 'ok', path, (digest, stat.st_size, stat.st_mtime_ns, ann.duration,
+                        tiers, dropped)
+
+
+class CorpusIndex:
+    """SQLite database of annotation files with full-text search."""
+
+    def __init__(self, path):
+        self.db = sqlite3.connect(path)
+        self.db.execute('PRAGMA foreign_keys = ON')
+        self.db.execute('PRAGMA journal_mode = WAL')
+        self.db.executescript(SCHEMA)
+        columns = {row[1] for row in self.db.execute('PRAGMA table_info(files)')}
+        for column in ('size', 'mtime'):
+            if column not in columns:  # index created by an older version
+                self.db.execute(f'ALTER TABLE files ADD COLUMN {column} INTEGER')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self) -> None:
+        self.db.close()
+
+    def ingest(self, src_root, workers=None) -> dict:
+        """Adds annotation files under src_root to the index.
+
+        Files whose size and mtime, or else content hash, are unchanged
+        since they were indexed are skipped, indexed files under src_root
+        which no longer exist are removed. Files which can not be read are
+        reported, files which are not annotations are ignored, intervals
+        without valid times are left out and counted per file under
+        'dropped'. Returns a summary of the run.
+        """
+
+        summary = {'ingested': 0, 'skipped': 0, 'ignored': 0, 'removed': 0,
+                   'dropped': {}, 'failed': {}}
+        src_root = os.path.abspath(src_root)
+        known = {path: (digest, size, mtime) for path, digest, size, mtime
+                 in self.db.execute(
+                     "SELECT path, hash, size, mtime FROM files "
+                     "WHERE substr(path, 1, length(?1)) = ?1",
+                     (src_root.rstrip(os.sep) + os.sep,)
+                 )}
+
+        paths = list(iter_inputs(src_root))
+        stale = set(known) - set(paths)
+        changed = []
+        for path in paths:
+            if path in known:
+                stat = os.stat(path)
+                if known[path][1:] == (stat.st_size, stat.st_mtime_ns):
+                    summary['skipped'] += 1
+                    continue
+            changed.append(path)
+
+        with self.db:
+            for path in stale:
+                self._delete(path)
+            summary['removed'] = len(stale)
+
+        hashes = [known[path][0] if path in known else None for path in changed]
+        with ProcessPoolExecutor(workers) as pool:
+            batch, touched = [], []
+            for status, path, result in pool.map(_parse, changed, hashes, chunksize=8):
+                if status == 'failed':
+                    summary['failed'][path] = result
+                    continue
+                if status == 'ignored':
+                    summary['ignored'] += 1
+                    continue
+                if status == 'unchanged':
+                    summary['skipped'] += 1
+                    touched.append((*result, path))
+                    continue
+                if result[-1]:
+                    summary['dropped'][path] = result[-1]
+                batch.append((path, *result[:-1]))
+                if len(batch) >= FILES_PER_TRANSACTION:
+                    self._insert(batch)
+                    summary['ingested'] += len(batch)
+                    batch = []
+            self._insert(batch)
+            summary['ingested'] += len(batch)
+
+        with self.db:
+            self.db.executemany("UPDATE files SET size = ?, mtime = ? WHERE path = ?",
+                                touched)
+
+        return summary
+
+    def _delete(self, path) -> None:
+        self.db.execute("DELETE FROM intervals WHERE tier_id IN ("
+                        "SELECT tiers.id FROM tiers JOIN files ON files.id = file_id "
+                        "WHERE path = ?)", (path,))
+        self.db.execute("DELETE FROM files WHERE path = ?", (path,))
+
+    def _insert(self, batch) -> None:
+        """Inserts parsed files in one transaction."""
+
+        with self.db:
+            for path, digest, size, mtime, duration, tiers in batch:
+                self._delete(path)
+                file_id = self.db.execute(
+                    "INSERT INTO files (path, hash, duration, size, mtime) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (path, digest, duration, size, mtime)
+                ).lastrowid
+                for name, is_point, intervals in tiers:
+                    tier_id = self.db.execute(
+                        "INSERT INTO tiers (file_id, name, is_point) VALUES (?, ?, ?)",
+                        (file_id, name, is_point)
+                    ).lastrowid
+                    self.db.executemany(
+                        'INSERT INTO intervals (tier_id, start, "end", text) '
+                        'VALUES (?, ?, ?, ?)',
+                        [(tier_id, *interval) for interval in intervals]
+                    )
+
+    def search(self, query: str, tier=None, start=None, end=None,
+               limit=None) -> list:
+        """Returns Hits of intervals whose text matches FTS5 query.
+
+        Hits can be limited to a tier name and to intervals overlapping the
+        time range from start to end.
+        """
+
+        sql = ('SELECT files.path, tiers.name, intervals.start, intervals."end", '
+               'intervals.text FROM intervals_fts '
+               'JOIN intervals ON intervals.id = intervals_fts.rowid '
+               'JOIN tiers ON tiers.id = intervals.tier_id '
+               'JOIN files ON files.id = tiers.file_id '
+               'WHERE intervals_fts MATCH ?')
+        params = [query]
+        sql, params = self._filters(sql, params, tier, start, end)
+        sql += ' ORDER BY files.path, tiers.id, intervals.start'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(limit)
+
+        return [Hit(path, name, Interval(s, e, text))
+                for path, name, s, e, text in self.db.execute(sql, params)]
+
+    def intervals(self, path, tier: str, start=None, end=None) -> list:
+        """Returns Intervals of tier in file path overlapping the time range."""
+
+        sql = ('SELECT intervals.start, intervals."end", intervals.text '
+               'FROM intervals JOIN tiers ON tiers.id = intervals.tier_id '
+               'JOIN files ON files.id = tiers.file_id WHERE files.path = ?')
+        sql, params = self._filters(sql, [os.path.abspath(path)], tier, start, end)
+        sql += ' ORDER BY intervals.start'
+
+        return [Interval(s, e, text) for s, e, text in self.db.execute(sql, params)]
+
+    @staticmethod
+    def _filters(sql: str, params: list, tier, start, end) -> tuple:
+        if tier is not None:
+            sql += ' AND tiers.name = ?'
+            params.append(tier)
+        if end is not None:
+            sql += ' AND intervals.start <= ?'
+            params.append(end)
+        if start is not None:
+            sql += ' AND intervals."end" >= ?'
+            params.append(start)
+
+        return sql, params
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='python -m annco.index',
+        description="Index annotation files in SQLite and search their texts."
+    )
+    parser.add_argument('db')
+    commands = parser.add_subparsers(dest='command', required=True)
+    ingest = commands.add_parser('ingest', help="add files under a directory")
+    ingest.add_argument('src_root')
+    ingest.add_argument('-w', '--workers', type=int)
+    search = commands.add_parser('search', help="search interval texts")
+    search.add_argument('query', help="FTS5 query")
+    search.add_argument('-t', '--tier')
+    search.add_argument('-n', '--limit', type=int)
+    args = parser.parse_args(argv)
+
+    with CorpusIndex(args.db) as index:
+        if args.command == 'ingest':
+            summary = index.ingest(args.src_root, args.workers)
+            print(f"ingested: {summary['ingested']}, skipped: {summary['skipped']}, "
+                  f"ignored: {summary['ignored']}, removed: {summary['removed']}, "
+                  f"dropped: {sum(summary['dropped'].values())}, "
+                  f"failed: {len(summary['failed'])}")
+            return 1 if summary['failed'] else 0
+
+        for hit in index.search(args.query, args.tier, limit=args.limit):
+            print(f"{hit.file}\t{hit.tier}\t{hit.interval.start}\t"
+                  f"{hit.interval.end}\t{hit.interval.text}")
+
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
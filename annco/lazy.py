@@ -0,0 +1,162 @@
+"""Lazy reading of large annotation files.
+
+A file is scanned once for byte ranges of its tiers, which is much faster
+than parsing it, and its tiers are parsed one by one when their intervals
+are first accessed. Listing tiers of a huge file, or reading just one of
+them, never builds intervals of the others. The index of byte ranges can
+be kept in a sidecar file next to the annotation, so that opening the file
+again skips the scan as well.
+"""
+
+import io
+import json
+import mmap
+import os
+
+from annco import formats
+from annco.fileio import (SNIFF_SIZE, atomic_output, decompressed, read_annotation,
+                          sniff_bytes)
+from annco.model import Annotation, Tier
+
+
+INDEX_SUFFIX = '.annco-index'
+INDEX_VERSION = 1
+
+
+class LazyTier(Tier):
+    """Tier whose intervals are parsed from its file on first access.
+
+    The tier is read from the byte ranges of its file given by index; it
+    keeps only the path and ranges, so it can be sent to other processes
+    before it is read.
+    """
+
+    def __init__(self, name, is_point, path, index: dict, entry: dict):
+        super().__init__(name, None, is_point)
+        self._intervals = None
+        self._path = path
+        self._source = {key: index[key] for key in
+                       ('format', 'encoding', 'size', 'mtime', 'head', 'tail')}
+        self._entry = entry
+
+    @property
+    def intervals(self) -> list:
+        if self._intervals is None:
+            self._intervals = self._read()
+
+        return self._intervals
+
+    @intervals.setter
+    def intervals(self, intervals) -> None:
+        self._intervals = intervals
+
+    def _read(self) -> list:
+        "Parses intervals of the tier from its byte ranges"
+
+        index = self._source
+        ranges = [index['head'], *self._entry['ranges'], index['tail']]
+
+        with open(self._path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            if (stat.st_size, stat.st_mtime_ns) != (index['size'], index['mtime']):
+                raise ValueError(f"File changed since it was indexed: {self._path}")
+            parts = []
+            for start, end in ranges:
+                f.seek(start)
+                parts.append(f.read(end - start))
+
+        module = formats.load(index['format'])
+        contents = module.load(io.BytesIO(b''.join(parts)), index['encoding'])
+        ann = module.from_contents(Annotation, contents, [self.name])
+
+        tiers = [tier for tier in ann if tier.name == self.name]
+        return tiers[self._entry.get('nth', 0)].intervals
+
+
+def index_path(path) -> str:
+    """Returns path of the sidecar index file of annotation file path."""
+
+    return os.fspath(path) + INDEX_SUFFIX
+
+
+def scan(path) -> dict:
+    """Returns index of byte ranges of tiers of annotation file path, or
+    None if the file can not be read lazily.
+
+    Compressed files, files in encodings which are not ASCII-compatible and
+    formats without a scan() function (short and binary .TextGrid, .trs)
+    can not be read lazily.
+    """
+
+    with open(path, 'rb') as f:
+        stat = os.fstat(f.fileno())
+        if not stat.st_size or decompressed(f) is not f:
+            return None
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            fmt, encoding = sniff_bytes(data[:SNIFF_SIZE])
+            module_scan = getattr(formats.load(fmt), 'scan', None) if fmt else None
+            # byte ranges are found by matching ASCII markup
+            if (module_scan is None or encoding is None
+                    or b'xmin'.decode(encoding, 'replace') != 'xmin'):
+                return None
+            index = module_scan(data, encoding)
+
+    if index is None:
+        return None
+
+    index.update(version=INDEX_VERSION, format=fmt, encoding=encoding,
+                 size=stat.st_size, mtime=stat.st_mtime_ns)
+    return index
+
+
+def load_index(path, sidecar=None) -> dict:
+    """Returns index of annotation file path read from sidecar file, or
+    None if there is none or it does not match the file.
+    """
+
+    sidecar = sidecar or index_path(path)
+    try:
+        with open(sidecar, encoding='UTF-8') as f:
+            index = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+    stat = os.stat(path)
+    if (index.get('version') != INDEX_VERSION or index.get('size') != stat.st_size
+            or index.get('mtime') != stat.st_mtime_ns):
+        return None
+
+    return index
+
+
+def save_index(index: dict, path, sidecar=None) -> None:
+    """Writes index of annotation file path into sidecar file."""
+
+    with atomic_output(sidecar or index_path(path)) as f:
+        f.write(json.dumps(index, ensure_ascii=False).encode('UTF-8'))
+
+
+def read_lazy(path, sidecar=False) -> Annotation:
+    """Creates Annotation instance whose tiers are parsed on first access.
+
+    With sidecar True (or a path of the sidecar file), the index is read
+    from the sidecar file if it matches the file, otherwise the file is
+    scanned and the index is saved there. Files which can not be read
+    lazily (see scan) are read by read_annotation.
+    """
+
+    if sidecar is True:
+        sidecar = index_path(path)
+
+    index = load_index(path, sidecar) if sidecar else None
+    if index is None:
+        index = scan(path)
+        if index is None:
+            return read_annotation(path)
+        if sidecar:
+            save_index(index, path, sidecar)
+
+    tiers = [LazyTier(entry['name'], entry['is_point'], path, index, entry)
+             for entry in index['tiers']]
+
+    return Annotation(tiers, index['duration'])
@@ -0,0 +1,89 @@
+"""Merging of several annotation files into one.
+
+Files are parsed in parallel by worker processes, handed over to the
+parent in shared memory (see annco.shared) and then either placed one
+after another on a single timeline ('concat') or combined into one
+multi-tier annotation on a common timeline ('tiers').
+"""
+
+import argparse
+import os
+
+from concurrent.futures import ProcessPoolExecutor
+
+from annco.fileio import OUTPUT_FORMATS, TG_MODES, strip_compression, write_annotation
+from annco.model import Annotation
+from annco.shared import read_shared, track_blocks
+
+
+def merge_files(paths, dst, fmt: str, mode='tiers', collision='rename',
+                gap=0.0, workers=None, **options) -> Annotation:
+    """Merges annotation files and writes the result into dst.
+
+    In 'concat' mode annotations follow each other separated by gap
+    seconds, see Annotation.concatenate. In 'tiers' mode their tiers are
+    combined, tiers with colliding names are renamed after file names or
+    merged depending on collision, see Annotation.merge. Returns the merged
+    Annotation.
+    """
+
+    if mode not in ('tiers', 'concat'):
+        raise ValueError(f"Unsupported merge mode: {mode}")
+
+    track_blocks()
+    with ProcessPoolExecutor(workers) as pool:
+        futures = [pool.submit(read_shared, path) for path in paths]
+    shared = [future.result() for future in futures if future.exception() is None]
+
+    try:
+        for future in futures:
+            future.result()  # raises error of a file which could not be read
+
+        anns = [handle.attach() for handle in shared]
+        if mode == 'concat':
+            merged = Annotation.concatenate(anns, gap)
+        else:
+            labels = [os.path.splitext(os.path.basename(strip_compression(p)))[0]
+                      for p in paths]
+            merged = Annotation.merge(anns, labels, collision)
+
+        # intervals not built yet are built before the blocks are freed
+        for tier in merged:
+            tier.intervals
+        write_annotation(merged, dst, fmt, **options)
+    finally:
+        for handle in shared:
+            handle.unlink()
+
+    return merged
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(
+        prog='python -m annco.merge',
+        description="Merge annotation files into one."
+    )
+    parser.add_argument('dst')
+    parser.add_argument('srcs', nargs='+')
+    parser.add_argument('-f', '--format', choices=OUTPUT_FORMATS, required=True)
+    parser.add_argument('--mode', choices=('tiers', 'concat'), default='tiers')
+    parser.add_argument('--collision', choices=('rename', 'merge'), default='rename',
+                        help="what to do with tiers of the same name in 'tiers' mode")
+    parser.add_argument('--gap', type=float, default=0.0,
+                        help="seconds between annotations in 'concat' mode")
+    parser.add_argument('-w', '--workers', type=int)
+    parser.add_argument('--tg-mode', choices=TG_MODES, default='long')
+    parser.add_argument('--incl-empty', action='store_true')
+    parser.add_argument('--incl-point', action='store_true')
+    parser.add_argument('--write-workers', type=int,
+                        help="processes serializing chunks of each output file")
+    args = parser.parse_args(argv)
+
+    merge_files(args.srcs, args.dst, args.format, args.mode, args.collision,
+                args.gap, args.workers, tg_mode=args.tg_mode,
+                incl_empty=args.incl_empty, incl_point=args.incl_point,
+                write_workers=args.write_workers)
+
+
+if __name__ == '__main__':
+    main()
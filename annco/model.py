@@ -0,0 +1,620 @@
+"""Annotation model: intervals, tiers and annotations.
+
+Reading and writing particular formats is delegated to format modules
+looked up in the registry of annco.formats and imported on first use.
+"""
+
+import heapq
+import re
+
+from bisect import bisect_left, bisect_right
+from itertools import chain
+from operator import attrgetter
+
+from annco import formats
+
+
+SILENCE_LABELS = frozenset({'', 'sil', 'sp', '<p:>', '#', '<sil>'})
+
+
+class LabelTable:
+    """Shared table of interval texts of one annotation.
+
+    Every distinct text is kept once and numbered in order of its first
+    occurrence. Readers store the shared instance returned by intern() in
+    their intervals, so a label repeated in millions of intervals costs a
+    single string, and label IDs let intervals be grouped without comparing
+    strings.
+    """
+
+    def __init__(self, texts=()):
+        self.texts = []
+        self._ids = {}
+        for text in texts:
+            self.intern(text)
+
+    def __len__(self):
+        return len(self.texts)
+
+    def __contains__(self, text):
+        return text in self._ids
+
+    def intern(self, text) -> str:
+        "Returns the shared instance of text (None is taken as empty text)"
+
+        if text is None:
+            text = ''
+        label_id = self._ids.get(text)
+        if label_id is None:
+            self._ids[text] = len(self.texts)
+            self.texts.append(text)
+            return text
+
+        return self.texts[label_id]
+
+    def id(self, text) -> int:
+        "Returns ID of text, adding it to the table if it is new"
+
+        label_id = self._ids.get(text)
+        if label_id is None:
+            self.intern(text)
+            return len(self.texts) - 1
+
+        return label_id
+
+    def text(self, label_id: int) -> str:
+        "Returns text of label ID"
+
+        return self.texts[label_id]
+
+
+class Interval:
+    """Represents annotation interval."""
+
+    __slots__ = ('start', 'end', 'text')
+
+    def __init__(self, start: float, end: float, text=None):
+        self.start = start
+        self.end = end
+        if text is None:
+            self.text = ''
+        else:
+            self.text = text
+
+    def __repr__(self):
+        return f'Interval({self.start}, {self.end}, {self.text})'
+
+    def __str__(self):
+        return self.text
+
+    def __len__(self):
+        return self.end - self.start
+
+    @property
+    def eaf_start(self) -> int:
+        "Returns interval start value formatted for .eaf"
+
+        return int(round(self.start, 3) * 1000)
+
+    @property
+    def eaf_end(self) -> int:
+        "Returns interval end value formatted for .eaf"
+
+        return int(round(self.end, 3) * 1000)
+
+    @property
+    def antx_start(self) -> str:
+        """Returns interval start value formatted for .antx"""
+
+        return str(self.start * 44100)
+    
+    @property
+    def antx_dur(self) -> str:
+        """Returns interval duration value formatted for .antx"""
+
+        return str(44100 * (self.end - self.start))
+
+
+class Tier:
+    """Represents annotation tier containing its intervals."""
+
+    def __init__(self, name, intervals=None, is_point=False):
+        self.name = name
+        if intervals is None:
+            self.intervals = []
+        else:
+            self.intervals = intervals
+        self.is_point = is_point
+        self._index = 0
+        self._version = 0
+
+    def __repr__(self):
+        return f'Tier({self.name}, intervals)'
+
+    def __str__(self):
+        return self.name
+
+    def __len__(self):
+        return len(self.intervals)
+
+    def __iter__(self):
+        self._index = 0
+        return self
+
+    def __next__(self):
+        if self._index >= len(self.intervals):
+            raise StopIteration
+        i = self._index
+        self._index += 1
+        return self.intervals[i]
+
+    def __getitem__(self, index):
+        return self.intervals[index]
+
+    def touch(self) -> None:
+        """Marks intervals of the tier as changed.
+
+        Writers given a TierCache serialize again only tiers changed since
+        their previous write. The methods below call touch() themselves,
+        code changing intervals in place has to call it.
+        """
+
+        self._version += 1
+
+    def insert(self, interval) -> int:
+        "Inserts interval after intervals starting before it, returns its index"
+
+        lo, hi = 0, len(self.intervals)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.intervals[mid].start <= interval.start:
+                lo = mid + 1
+            else:
+                hi = mid
+        self.intervals.insert(lo, interval)
+        self.touch()
+
+        return lo
+
+    def remove(self, index: int) -> Interval:
+        "Removes interval at index and returns it"
+
+        self.touch()
+        return self.intervals.pop(index)
+
+    def relabel(self, index: int, text: str) -> None:
+        "Sets text of interval at index"
+
+        self.intervals[index].text = '' if text is None else text
+        self.touch()
+
+    def retime(self, index: int, start: float, end: float) -> None:
+        "Sets boundaries of interval at index"
+
+        interval = self.intervals[index]
+        interval.start, interval.end = start, end
+        self.touch()
+
+    def extend_points(self, duration) -> None:
+        """If the tier is not empty, extends intervals ends
+        to starts of intervals following them or to duration"""
+
+        if self.intervals:
+            for i in range(len(self) - 1):
+                self[i].end = self[i+1].start
+            self[-1].end = duration
+            self.touch()
+
+    def _sorted(self) -> list:
+        "Returns intervals sorted by start, sorting them only if needed"
+
+        starts = [interval.start for interval in self.intervals]
+        if all(a <= b for a, b in zip(starts, starts[1:])):
+            return self.intervals
+
+        return sorted(self.intervals, key=attrgetter('start'))
+
+    def _silences(self, labels, duration) -> list:
+        """Returns sorted middles of gaps (including those at tier boundaries)
+        and of intervals with text in labels"""
+
+        silences = []
+        bounds = [Interval(0, 0)] + sorted(self.intervals, key=lambda i: i.start)
+        for prev, interval in zip(bounds, bounds[1:] + [Interval(duration, duration)]):
+            if prev.end < interval.start:
+                silences.append((prev.end + interval.start) / 2)
+            if interval.text in labels and interval.start != interval.end:
+                silences.append((interval.start + interval.end) / 2)
+
+        return sorted(silences)
+
+    def fill_gaps(self, duration) -> None:
+        "Fills gaps between intervals and tier boundaries with empty text intervals"
+
+        self.intervals = self.filled(duration)
+        self.touch()
+
+    def filled(self, duration) -> list:
+        """Returns intervals with gaps between them and tier boundaries
+        filled with empty text intervals, leaving the tier unchanged"""
+
+        if not self.intervals:
+            return [Interval(0, duration)]
+
+        filled = []
+        if self[0].start > 0:
+            filled.append(Interval(0, self[0].start))
+        for interval, following in zip(self.intervals, self.intervals[1:]):
+            filled.append(interval)
+            if interval.end < following.start:
+                filled.append(Interval(interval.end, following.start))
+        filled.append(self[-1])
+        if self[-1].end < duration:
+            filled.append(Interval(self[-1].end, duration))
+
+        return filled
+
+    def extended(self, duration) -> list:
+        """Returns copies of intervals with ends extended to starts of
+        intervals following them or to duration, leaving the tier unchanged"""
+
+        ends = [interval.start for interval in self.intervals[1:]] + [duration]
+        return [Interval(interval.start, end, interval.text)
+                for interval, end in zip(self.intervals, ends)]
+
+
+class Annotation:
+    """Represents entire annotation."""
+
+    def __init__(self, tiers, duration: float, labels=None):
+        self.tiers = tiers
+        self.duration = duration
+        self._labels = labels
+        self._index = 0
+
+    def __str__(self):
+        return f"Annotation contains {len(self.tiers)} tiers."
+
+    def __len__(self):
+        return len(self.tiers)
+
+    def __iter__(self):
+        self._index = 0
+        return self
+
+    def __next__(self):
+        if self._index >= len(self.tiers):
+            raise StopIteration
+        i = self._index
+        self._index += 1
+        return self.tiers[i]
+
+    def __getitem__(self, index):
+        return self.tiers[index]
+
+    @property
+    def labels(self) -> LabelTable:
+        """Label table shared by interval texts.
+
+        Readers fill it while parsing. For annotations built otherwise it is
+        created on first access, interning texts of all intervals.
+        """
+
+        if self._labels is None:
+            self._labels = LabelTable()
+            for tier in self:
+                for interval in tier.intervals:
+                    interval.text = self._labels.intern(interval.text)
+
+        return self._labels
+
+    def label_ids(self) -> list:
+        """Returns a list of label IDs of intervals for every tier."""
+
+        label_id = self.labels.id
+        return [[label_id(interval.text) for interval in tier.intervals]
+                for tier in self]
+
+    @classmethod
+    def from_tg(cls, contents, tiers=None, window=None):
+        """Creates Annotation instance from .TextGrid file contents.
+
+        Contents of short .TextGrid files are recognised by absence of
+        'xmin = ' lines, contents of binary .TextGrid files are bytes.
+        For tiers and window, see read_annotation.
+        """
+
+        return cls.from_format('textgrid', contents, tiers, window)
+
+    @classmethod
+    def from_eaf(cls, contents, tiers=None, window=None):
+        """Creates Annotation instance from .eaf file contents."""
+
+        return cls.from_format('eaf', contents, tiers, window)
+
+    @classmethod
+    def from_trs(cls, contents, tiers=None, window=None):
+        """Creates Annotation instance from .trs file contents."""
+
+        return cls.from_format('trs', contents, tiers, window)
+
+    @classmethod
+    def from_antx(cls, contents, tiers=None, window=None):
+        """Creates Annotation instance from .antx file contents."""
+
+        return cls.from_format('antx', contents, tiers, window)
+
+    @classmethod
+    def from_format(cls, fmt: str, contents, tiers=None, window=None):
+        """Creates Annotation instance from contents of a file in given format.
+
+        Raises ValueError if the format is not registered.
+        """
+
+        return formats.load(fmt).from_contents(cls, contents, tiers, window)
+
+    @staticmethod
+    def _selected(name: str, tiers) -> bool:
+        """Returns True if tier name is selected by tiers, which is None
+        (all tiers), a collection of names or a compiled regular expression.
+        """
+
+        if tiers is None:
+            return True
+        if isinstance(tiers, re.Pattern):
+            return tiers.fullmatch(name) is not None
+
+        return name in tiers
+
+    @staticmethod
+    def _clip(start, end, window):
+        """Returns (start, end) clipped to window or None if they are outside it.
+
+        Points (start equal to end) are kept if they fall within the window.
+        """
+
+        if window is None:
+            return start, end
+
+        w_start, w_end = window
+        if start == end:
+            return (start, end) if w_start <= start <= w_end else None
+        if end <= w_start or start >= w_end:
+            return None
+
+        return max(start, w_start), min(end, w_end)
+
+    @staticmethod
+    def _clip_intervals(intervals, window) -> list:
+        """Returns intervals within window with their boundaries clipped."""
+
+        clipped = []
+        for interval in intervals:
+            bounds = Annotation._clip(interval.start, interval.end, window)
+            if bounds:
+                interval.start, interval.end = bounds
+                clipped.append(interval)
+
+        return clipped
+
+    @staticmethod
+    def _clip_duration(duration: float, window) -> float:
+        """Returns duration limited by the end of window."""
+
+        return duration if window is None else min(duration, window[1])
+
+    def rows(self):
+        """Yields (tier, is_point, start, end, text) for every interval."""
+
+        for tier in self:
+            for interval in tier.intervals:
+                yield tier.name, tier.is_point, interval.start, interval.end, interval.text
+
+    @classmethod
+    def concatenate(cls, anns, gap=0.0):
+        """Creates Annotation placing anns one after another on one timeline.
+
+        Times of each annotation are offset by durations of the preceding
+        ones plus gap. Tiers with the same name continue each other, tiers
+        appear in order of their first occurrence. Intervals of anns are
+        moved into the result, not copied.
+        """
+
+        names, points, parts = [], {}, {}
+        offset = 0.0
+        for ann in anns:
+            for tier in ann:
+                if tier.name not in parts:
+                    names.append(tier.name)
+                    points[tier.name] = tier.is_point
+                    parts[tier.name] = []
+                for interval in tier.intervals:
+                    interval.start += offset
+                    interval.end += offset
+                parts[tier.name].append(tier.intervals)
+            offset += ann.duration + gap
+
+        tiers = [Tier(name, list(chain.from_iterable(parts[name])), points[name])
+                 for name in names]
+
+        return cls(tiers, max(offset - gap, 0.0))
+
+    @classmethod
+    def merge(cls, anns, labels=None, collision='rename'):
+        """Creates Annotation containing tiers of all anns on a common timeline.
+
+        Tiers with the same name in several annotations are either renamed
+        to 'name (label)' ('rename') or combined into a single tier
+        ('merge') by a k-way merge of their intervals sorted by start.
+        labels default to ordinal numbers of anns.
+        """
+
+        if collision not in ('rename', 'merge'):
+            raise ValueError(f"Unsupported tier name collision policy: {collision}")
+
+        anns = list(anns)
+        if labels is None:
+            labels = [str(n) for n in range(1, len(anns) + 1)]
+
+        groups = {}
+        for label, ann in zip(labels, anns):
+            for tier in ann:
+                groups.setdefault(tier.name, []).append((label, tier))
+
+        tiers = []
+        for name, group in groups.items():
+            if len(group) == 1:
+                tiers.append(group[0][1])
+            elif collision == 'rename':
+                tiers.extend(Tier(f"{name} ({label})", tier.intervals, tier.is_point)
+                             for label, tier in group)
+            else:
+                if len({tier.is_point for _, tier in group}) > 1:
+                    raise ValueError(f"Cannot merge point and interval tiers '{name}'")
+                merged = heapq.merge(*(tier._sorted() for _, tier in group),
+                                     key=attrgetter('start'))
+                tiers.append(Tier(name, list(merged), group[0][1].is_point))
+
+        return cls(tiers, max((ann.duration for ann in anns), default=0.0))
+
+    def shard_bounds(self, shards=None, length=None, align_tier=None,
+                     silence=SILENCE_LABELS) -> list:
+        """Returns (start, end) bounds of time shards covering the annotation.
+
+        The annotation is cut into a number of shards of equal length or
+        into shards of given length in seconds (the last one may be
+        shorter). If align_tier is the name of a tier, every cut is moved to
+        the middle of the nearest silence in that tier, i.e. a gap between
+        intervals or an interval whose text is in silence, if there is one
+        within half a shard length.
+        """
+
+        if shards:
+            length = self.duration / shards
+        if not length or length <= 0:
+            raise ValueError("Either shards or a positive length is required")
+
+        cuts = []
+        cut = length
+        while cut < self.duration - 1e-9:
+            cuts.append(cut)
+            cut += length
+
+        if align_tier is not None:
+            tier = next(t for t in self if t.name == align_tier)
+            cuts = self._align_cuts(cuts, tier._silences(silence, self.duration),
+                                     length / 2)
+
+        edges = [0, *cuts, self.duration]
+        return list(zip(edges, edges[1:]))
+
+    @staticmethod
+    def _align_cuts(cuts, silences, reach) -> list:
+        """Moves cuts to the nearest silences within reach, keeping them in order."""
+
+        aligned = []
+        for cut in cuts:
+            i = bisect_left(silences, cut)
+            near = [s for s in silences[max(i - 1, 0):i + 1] if abs(s - cut) <= reach]
+            if near:
+                cut = min(near, key=lambda s: abs(s - cut))
+            if not aligned or cut > aligned[-1]:
+                aligned.append(cut)
+
+        return aligned
+
+    def iter_shards(self, bounds, mode='clip'):
+        """Yields an Annotation for every (start, end) pair of bounds with
+        times rebased to the start of the shard.
+
+        In 'clip' mode intervals crossing a shard boundary are cut into
+        parts belonging to both shards. In 'assign' mode every interval goes
+        whole to the shard it starts in and the shard is extended to fit it.
+        Points belong to the shard they fall in.
+        """
+
+        if mode not in ('clip', 'assign'):
+            raise ValueError(f"Unsupported shard mode: {mode}")
+
+        # intervals sorted by start, their starts and running maximum of ends
+        indexed = []
+        for tier in self:
+            intervals = sorted(tier.intervals, key=lambda i: i.start)
+            reach, running = [], float('-inf')
+            for interval in intervals:
+                running = max(running, interval.end)
+                reach.append(running)
+            indexed.append((tier, intervals, [i.start for i in intervals], reach))
+
+        for n, (start, end) in enumerate(bounds):
+            last = n == len(bounds) - 1
+            duration = end - start
+            tiers = []
+
+            for tier, intervals, starts, reach in indexed:
+                stop = bisect_right(starts, end) if last else bisect_left(starts, end)
+                if tier.is_point or mode == 'assign':
+                    first = bisect_left(starts, start)
+                else:
+                    first = bisect_right(reach, start)
+
+                shard = []
+                for interval in intervals[first:stop]:
+                    if tier.is_point or mode == 'assign':
+                        shard.append(Interval(interval.start - start,
+                                              interval.end - start, interval.text))
+                        duration = max(duration, interval.end - start)
+                    elif interval.end > start and interval.start < end:
+                        shard.append(Interval(max(interval.start, start) - start,
+                                              min(interval.end, end) - start,
+                                              interval.text))
+
+                tiers.append(Tier(tier.name, shard, tier.is_point))
+
+            yield Annotation(tiers, duration)
+
+    def _filled(self):
+        """Returns a copy of Annotation with gaps in interval tiers filled
+        as required by .TextGrid, leaving Annotation unchanged"""
+
+        tiers = [tier if tier.is_point
+                 else Tier(tier.name, tier.filled(self.duration), tier.is_point)
+                 for tier in self]
+        return Annotation(tiers, self.duration, self._labels)
+
+    def _with_points(self, incl_point=False):
+        """Returns a copy of Annotation with points of point tiers extended
+        into intervals or with point tiers dropped, leaving Annotation unchanged"""
+
+        if incl_point:
+            tiers = [Tier(tier.name, tier.extended(self.duration), tier.is_point)
+                     if tier.is_point else tier for tier in self]
+        else:
+            tiers = [tier for tier in self if not tier.is_point]
+
+        return Annotation(tiers, self.duration, self._labels)
+
+    def to_tg(self) -> str:
+        "Returns a string representing Annotation to be written into .TextGrid"
+
+        return formats.load('textgrid').to_tg(self)
+
+    def to_tg_short(self) -> str:
+        "Returns a string representing Annotation to be written into short .TextGrid"
+
+        return formats.load('textgrid').to_tg_short(self)
+
+    def to_tg_binary(self) -> bytes:
+        "Returns bytes representing Annotation to be written into binary .TextGrid"
+
+        return formats.load('textgrid').to_tg_binary(self)
+
+    def to_eaf(self, incl_empty=False, incl_point=False):
+        "Returns an Element Tree representing Annotation to be written into .eaf"
+
+        return formats.load('eaf').to_eaf(self, incl_empty, incl_point)
+
+    def to_antx(self, incl_empty=False, incl_point=False):
+        """Returns an Element Tree representing Annotation to be written into .antx"""
+
+        return formats.load('antx').to_antx(self, incl_empty, incl_point)
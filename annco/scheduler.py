@@ -0,0 +1,149 @@
+"""Size-aware scheduling of conversion jobs on worker processes.
+
+Jobs are started largest first. The total size of inputs being processed
+at the same time is kept within a memory budget, so a few huge files do
+not run side by side, while small files fill the remaining room. A job
+running longer than the timeout has its worker killed and replaced, so
+one pathological file cannot stall the whole run.
+"""
+
+import multiprocessing
+import os
+import time
+
+from multiprocessing.connection import wait
+
+
+def _worker(conn) -> None:
+    """Runs (func, args) tasks received from conn until it is closed."""
+
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+
+        func, args = task
+        try:
+            conn.send(('ok', func(*args)))
+        except Exception as e:
+            conn.send(('failed', f"{type(e).__name__}: {e}"))
+
+
+class Scheduler:
+    """Runs jobs on a pool of worker processes, largest first.
+
+    memory_budget caps the sum of sizes of running jobs (a job larger than
+    the budget runs alone), timeout is the limit in seconds for a single
+    job. Both are unlimited if None.
+    """
+
+    def __init__(self, workers=None, memory_budget=None, timeout=None):
+        self.workers = workers or os.cpu_count()
+        self.memory_budget = memory_budget
+        self.timeout = timeout
+        self._context = multiprocessing.get_context()
+
+    def _spawn(self) -> tuple:
+        """Starts a worker process and returns it with its connection."""
+
+        conn, child_conn = self._context.Pipe()
+        process = self._context.Process(target=_worker, args=(child_conn,))
+        process.start()
+        child_conn.close()
+
+        return process, conn
+
+    @staticmethod
+    def _stop(worker, kill=False) -> None:
+        """Stops worker, killing it if kill is True or it does not exit."""
+
+        process, conn = worker
+        if not kill:
+            try:
+                conn.send(None)
+            except OSError:
+                pass
+            process.join(1)
+        if process.is_alive():
+            process.kill()
+            process.join()
+        conn.close()
+
+    def _take(self, pending: list, in_flight: int):
+        """Removes and returns the largest pending job fitting into the
+        budget left, or None if none fits.
+        """
+
+        if self.memory_budget is None or not in_flight:
+            return pending.pop(0)
+
+        for i, job in enumerate(pending):
+            if in_flight + job[1] <= self.memory_budget:
+                return pending.pop(i)
+
+        return None
+
+    def run(self, jobs):
+        """Yields (key, status, result) for every (key, size, func, args) job
+        as it finishes.
+
+        status is 'ok' with the value returned by func(*args) as result, or
+        'failed' with the error message, including jobs which timed out or
+        whose worker died.
+        """
+
+        pending = sorted(jobs, key=lambda job: job[1], reverse=True)
+        idle = [self._spawn() for _ in range(min(self.workers, len(pending)))]
+        busy = {}  # connection -> (worker, key, size, deadline)
+        in_flight = 0
+
+        try:
+            while pending or busy:
+                while idle and pending:
+                    job = self._take(pending, in_flight)
+                    if job is None:
+                        break
+                    key, size, func, args = job
+                    worker = idle.pop()
+                    worker[1].send((func, args))
+                    deadline = (time.monotonic() + self.timeout
+                                if self.timeout is not None else None)
+                    busy[worker[1]] = (worker, key, size, deadline)
+                    in_flight += size
+
+                deadlines = [d for *_, d in busy.values() if d is not None]
+                wait_for = (max(min(deadlines) - time.monotonic(), 0)
+                            if deadlines else None)
+
+                for conn in wait(list(busy), wait_for):
+                    worker, key, size, _ = busy.pop(conn)
+                    in_flight -= size
+                    try:
+                        status, result = conn.recv()
+                    except EOFError:
+                        self._stop(worker, kill=True)
+                        if pending:
+                            idle.append(self._spawn())
+                        yield key, 'failed', "Worker process died"
+                        continue
+                    idle.append(worker)
+                    yield key, status, result
+
+                now = time.monotonic()
+                for conn in [c for c, (*_, d) in busy.items()
+                             if d is not None and d <= now]:
+                    worker, key, size, _ = busy.pop(conn)
+                    in_flight -= size
+                    self._stop(worker, kill=True)
+                    if pending:
+                        idle.append(self._spawn())
+                    yield key, 'failed', f"TimeoutError: no result after {self.timeout} s"
+
+        finally:
+            for worker in idle:
+                self._stop(worker)
+            for worker, *_ in busy.values():
+                self._stop(worker, kill=True)
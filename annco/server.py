@@ -0,0 +1,242 @@
+"""Local conversion server with a warm worker pool.
+
+Keeps a pool of worker processes with AnnCo already imported, so callers
+converting many small files avoid interpreter start-up and imports for
+every file. The server listens on localhost only and speaks JSON over HTTP:
+
+    POST /convert  {"jobs": [{"src": ..., "dst": ..., "format": ...,
+                              "options": {...}}]}
+    GET  /status
+
+Each job result holds its status, error message if any and timings in
+seconds.
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+import urllib.request
+
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from annco import formats
+from annco.fileio import read_annotation, write_annotation
+
+
+DEFAULT_PORT = 8765
+
+
+def _warm_up() -> int:
+    """Runs in a worker to start it and import modules of all registered
+    formats before the first job arrives."""
+
+    for name in formats.names():
+        formats.load(name)
+
+    return os.getpid()
+
+
+def run_job(src, dst, fmt: str, options=None) -> dict:
+    """Converts src into dst and returns status and timings of the job."""
+
+    started = time.perf_counter()
+    try:
+        ann = read_annotation(src)
+        parsed = time.perf_counter()
+        os.makedirs(os.path.dirname(dst) or '.', exist_ok=True)
+        write_annotation(ann, dst, fmt, **(options or {}))
+    except Exception as e:
+        return {'status': 'failed', 'error': f"{type(e).__name__}: {e}",
+                'timings': {'total': time.perf_counter() - started}}
+
+    written = time.perf_counter()
+    return {'status': 'ok', 'error': None,
+            'timings': {'read': parsed - started, 'write': written - parsed,
+                        'total': written - started}}
+
+
+def check_jobs(jobs) -> None:
+    """Raises ValueError if jobs is not a list of jobs with src, dst and
+    format strings and an optional options object."""
+
+    if not isinstance(jobs, list):
+        raise ValueError("jobs must be a list")
+    for i, job in enumerate(jobs):
+        if not isinstance(job, dict):
+            raise ValueError(f"job {i} must be an object")
+        for key in ('src', 'dst', 'format'):
+            if not isinstance(job.get(key), str):
+                raise ValueError(f"job {i}: {key} must be a string")
+        if not isinstance(job.get('options') or {}, dict):
+            raise ValueError(f"job {i}: options must be an object")
+
+
+class ConversionServer(ThreadingHTTPServer):
+    """HTTP server handing conversion jobs to a persistent process pool."""
+
+    daemon_threads = True
+
+    def __init__(self, address, workers=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.pool = ProcessPoolExecutor(self.workers, initializer=_warm_up)
+        self._pool_lock = threading.Lock()
+        super().__init__(address, _Handler)
+        self.started = time.time()
+        self.jobs_done = 0
+        for future in [self.pool.submit(_warm_up) for _ in range(self.workers)]:
+            future.result()
+
+    def convert(self, jobs: list) -> list:
+        """Runs jobs (see check_jobs) on the pool and returns their results
+        in order. A job whose worker fails gets the error as its result; if
+        the pool is broken, it is replaced by a new one."""
+
+        submitted = time.perf_counter()
+        futures = [self._submit(job) for job in jobs]
+
+        results = []
+        for job, (pool, future) in zip(jobs, futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                if isinstance(e, BrokenProcessPool):
+                    self._replace_pool(pool)
+                result = {'status': 'failed', 'error': f"{type(e).__name__}: {e}",
+                          'timings': {}}
+            result['src'] = job['src']
+            result['timings']['wall'] = time.perf_counter() - submitted
+            results.append(result)
+        self.jobs_done += len(jobs)
+
+        return results
+
+    def _submit(self, job: dict) -> tuple:
+        """Submits job to the pool, replacing the pool if it is broken, and
+        returns the pool and the future of the job."""
+
+        pool = self.pool
+        try:
+            return pool, pool.submit(run_job, job['src'], job['dst'], job['format'],
+                                     job.get('options'))
+        except BrokenProcessPool:
+            self._replace_pool(pool)
+            pool = self.pool
+            return pool, pool.submit(run_job, job['src'], job['dst'], job['format'],
+                                     job.get('options'))
+
+    def _replace_pool(self, broken) -> None:
+        """Replaces broken pool by a new one unless another request did."""
+
+        with self._pool_lock:
+            if self.pool is broken:
+                self.pool = ProcessPoolExecutor(self.workers, initializer=_warm_up)
+                broken.shutdown(wait=False, cancel_futures=True)
+
+    def status(self) -> dict:
+        """Returns state of the server."""
+
+        return {'workers': self.workers, 'jobs_done': self.jobs_done,
+                'uptime': time.time() - self.started}
+
+    def server_close(self) -> None:
+        super().server_close()
+        self.pool.shutdown()
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path == '/status':
+            self._reply(200, self.server.status())
+        else:
+            self._reply(404, {'error': 'not found'})
+
+    def do_POST(self):
+        if self.path != '/convert':
+            self._reply(404, {'error': 'not found'})
+            return
+
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            jobs = json.loads(self.rfile.read(length))['jobs']
+            check_jobs(jobs)
+        except (ValueError, KeyError, TypeError) as e:
+            self._reply(400, {'error': f"bad request: {e}"})
+            return
+
+        self._reply(200, {'results': self.server.convert(jobs)})
+
+    def _reply(self, code: int, body: dict) -> None:
+        data = json.dumps(body, ensure_ascii=False).encode('UTF-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Client:
+    """Submits conversion jobs to a running ConversionServer."""
+
+    def __init__(self, host='127.0.0.1', port=DEFAULT_PORT, timeout=None):
+        self.url = f'http://{host}:{port}'
+        self.timeout = timeout
+
+    def convert(self, src, dst, fmt: str, **options) -> dict:
+        """Converts a single file and returns result of the job."""
+
+        return self.convert_many([(src, dst, fmt, options)])[0]
+
+    def convert_many(self, jobs) -> list:
+        """Converts (src, dst, format, options) jobs and returns their results."""
+
+        body = {'jobs': [
+            {'src': os.path.abspath(src), 'dst': os.path.abspath(dst),
+             'format': fmt, 'options': options}
+            for src, dst, fmt, options in jobs
+        ]}
+
+        return self._request('/convert', body)['results']
+
+    def status(self) -> dict:
+        """Returns state of the server."""
+
+        return self._request('/status')
+
+    def _request(self, path: str, body=None) -> dict:
+        data = None if body is None else json.dumps(body).encode('UTF-8')
+        request = urllib.request.Request(
+            self.url + path, data=data,
+            headers={'Content-Type': 'application/json'}
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read())
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(
+        prog='python -m annco.server',
+        description="Serve annotation conversion jobs on localhost."
+    )
+    parser.add_argument('-p', '--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('-w', '--workers', type=int)
+    args = parser.parse_args(argv)
+
+    with ConversionServer(('127.0.0.1', args.port), args.workers) as server:
+        print(f"AnnCo server on 127.0.0.1:{args.port}, "
+              f"{server.workers} workers")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Splitting of long annotations into time shards.
+
+Shards are produced one by one from the parsed annotation and written into
+separate files by worker processes, so the whole set of shards is never
+held in memory at once.
+"""
+
+import argparse
+import os
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from annco.fileio import (COMPRESSIONS, OUTPUT_FORMATS, TG_MODES, read_annotation,
+                          strip_compression, write_annotation)
+
+
+def _write_shard(shard, path, fmt: str, options: dict) -> str:
+    """Writes a single shard in a worker and returns its path."""
+
+    write_annotation(shard, path, fmt, **options)
+    return path
+
+
+def write_shards(ann, out_dir, name: str, fmt: str, shards=None, length=None,
+                 align_tier=None, mode='clip', workers=None, compress=None,
+                 **options) -> list:
+    """Splits Annotation into time shards written into out_dir.
+
+    Shards are named name_0000, name_0001, ... with the extension of the
+    output format. For shards, length, align_tier and mode, see
+    Annotation.shard_bounds and Annotation.iter_shards. Returns list of
+    (path, start, end) with shard bounds in the original time.
+    """
+
+    bounds = ann.shard_bounds(shards, length, align_tier)
+    os.makedirs(out_dir, exist_ok=True)
+    ext = OUTPUT_FORMATS[fmt] + (compress or '')
+    workers = workers or os.cpu_count() or 1
+
+    written = []
+    with ProcessPoolExecutor(workers) as pool:
+        pending = deque()
+        for n, shard in enumerate(ann.iter_shards(bounds, mode)):
+            path = os.path.join(out_dir, f"{name}_{n:04d}{ext}")
+            pending.append(pool.submit(_write_shard, shard, path, fmt, options))
+            if len(pending) > 2 * workers:
+                written.append(pending.popleft().result())
+        written.extend(future.result() for future in pending)
+
+    return [(path, start, end) for path, (start, end) in zip(written, bounds)]
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(
+        prog='python -m annco.shard',
+        description="Split an annotation file into time shards."
+    )
+    parser.add_argument('src')
+    parser.add_argument('out_dir')
+    parser.add_argument('-f', '--format', choices=OUTPUT_FORMATS, required=True)
+    size = parser.add_mutually_exclusive_group(required=True)
+    size.add_argument('-n', '--shards', type=int, help="number of shards")
+    size.add_argument('-l', '--length', type=float, help="shard length in seconds")
+    parser.add_argument('-a', '--align-tier',
+                        help="move cuts to the nearest silence in this tier")
+    parser.add_argument('--mode', choices=('clip', 'assign'), default='clip')
+    parser.add_argument('-w', '--workers', type=int)
+    parser.add_argument('-c', '--compress', choices=COMPRESSIONS)
+    parser.add_argument('--tg-mode', choices=TG_MODES, default='long')
+    parser.add_argument('--incl-empty', action='store_true')
+    parser.add_argument('--incl-point', action='store_true')
+    args = parser.parse_args(argv)
+
+    name = os.path.splitext(os.path.basename(strip_compression(args.src)))[0]
+    shards = write_shards(read_annotation(args.src), args.out_dir, name,
+                          args.format, args.shards, args.length,
+                          args.align_tier, args.mode, args.workers,
+                          args.compress, tg_mode=args.tg_mode,
+                          incl_empty=args.incl_empty, incl_point=args.incl_point)
+
+    for path, start, end in shards:
+        print(f"{path}\t{start}\t{end}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,213 @@
+"""Hand-off of parsed annotations between processes in shared memory.
+
+Returning an Annotation from a worker process pickles every Interval,
+which can cost more than parsing the file. share() instead writes the
+annotation into a shared memory block as columns: float64 starts and
+ends, int32 label IDs and the label table as offsets into a UTF-8 blob.
+Only a small SharedAnnotation handle is pickled; the receiving process
+attaches to the block without copying it and builds intervals of a tier
+only when they are first accessed.
+"""
+
+from array import array
+from multiprocessing import resource_tracker, shared_memory
+
+from annco.fileio import read_annotation
+from annco.model import Annotation, Interval, LabelTable, Tier
+
+
+class SharedTier(Tier):
+    """Tier whose intervals are built from columns of a shared memory block
+    on first access."""
+
+    def __init__(self, name, is_point, shared, index: int):
+        super().__init__(name, None, is_point)
+        self._intervals = None
+        self._shared = shared
+        self._tier_index = index
+
+    @property
+    def intervals(self) -> list:
+        if self._intervals is None:
+            self._intervals = self._shared._intervals(self._tier_index)
+
+        return self._intervals
+
+    @intervals.setter
+    def intervals(self, intervals) -> None:
+        self._intervals = intervals
+
+
+class SharedAnnotation:
+    """Handle of an Annotation stored in a shared memory block.
+
+    The handle is small and can be pickled, the block it names lives until
+    unlink() is called by one of the processes using it.
+    """
+
+    def __init__(self, name: str, duration: float, tiers: list, offsets: list,
+                 label_count: int):
+        self.name = name
+        self.duration = duration
+        self.tiers = tiers  # (name, is_point) of every tier
+        self.offsets = offsets  # index of the first interval of every tier and the end
+        self.label_count = label_count
+        self._shm = None
+        self._labels = None
+
+    def __getstate__(self):
+        return {key: value for key, value in self.__dict__.items()
+                if key not in ('_shm', '_labels')}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state, _shm=None, _labels=None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def _sections(self) -> tuple:
+        "Returns byte offsets of starts, ends, label IDs, text offsets and texts"
+
+        count = self.offsets[-1]
+        starts, ends, ids = 0, 8 * count, 16 * count
+        text_offsets = -(-(ids + 4 * count) // 8) * 8  # aligned to 8 bytes
+        texts = text_offsets + 8 * (self.label_count + 1)
+
+        return starts, ends, ids, text_offsets, texts
+
+    def _buffer(self) -> memoryview:
+        "Returns buffer of the block, attaching to it if needed"
+
+        if self._shm is None:
+            self._shm = shared_memory.SharedMemory(self.name)
+
+        return self._shm.buf
+
+    def columns(self, index: int) -> tuple:
+        """Returns starts, ends and label IDs of intervals of tier index as
+        memoryviews of the block, without copying them.
+
+        The views must be released before the handle is closed.
+        """
+
+        buf = self._buffer()
+        first, last = self.offsets[index], self.offsets[index + 1]
+        starts, ends, ids, _, _ = self._sections
+
+        return (buf[starts + 8*first:starts + 8*last].cast('d'),
+                buf[ends + 8*first:ends + 8*last].cast('d'),
+                buf[ids + 4*first:ids + 4*last].cast('i'))
+
+    def labels(self) -> LabelTable:
+        """Returns label table of the annotation, decoding it on first use."""
+
+        if self._labels is None:
+            buf = self._buffer()
+            _, _, _, text_offsets, texts = self._sections
+            with buf[text_offsets:texts].cast('q') as view:
+                bounds = view.tolist()
+            blob = bytes(buf[texts:texts + bounds[-1]])
+            self._labels = LabelTable(blob[start:end].decode('UTF-8')
+                                      for start, end in zip(bounds, bounds[1:]))
+
+        return self._labels
+
+    def _intervals(self, index: int) -> list:
+        "Builds intervals of tier index from the block"
+
+        texts = self.labels().texts
+        starts, ends, ids = self.columns(index)
+        with starts, ends, ids:
+            return [Interval(start, end, texts[label_id]) for start, end, label_id
+                    in zip(starts.tolist(), ends.tolist(), ids.tolist())]
+
+    def attach(self) -> Annotation:
+        """Returns Annotation whose tiers are built from the block on first
+        access."""
+
+        tiers = [SharedTier(name, is_point, self, i)
+                 for i, (name, is_point) in enumerate(self.tiers)]
+
+        return Annotation(tiers, self.duration, self.labels())
+
+    def close(self) -> None:
+        """Detaches from the block, which stays available to other processes."""
+
+        if self._shm is not None:
+            self._shm.close()
+            self._shm = None
+
+    def unlink(self) -> None:
+        """Detaches from the block and frees it."""
+
+        shm = self._shm or shared_memory.SharedMemory(self.name)
+        self._shm = None
+        shm.close()
+        shm.unlink()
+
+
+def track_blocks() -> None:
+    """Starts resource tracker of this process before worker processes
+    sharing annotations are started.
+
+    Workers then register their blocks with the same tracker, so a block
+    freed by unlink() in this process is not reported as leaked by them,
+    and blocks are freed if this process dies before unlinking them.
+    """
+
+    resource_tracker.ensure_running()
+
+
+def share(ann: Annotation) -> SharedAnnotation:
+    """Writes Annotation into a new shared memory block and returns its
+    handle. The block is freed by SharedAnnotation.unlink().
+    """
+
+    labels = ann.labels
+    starts, ends, ids = array('d'), array('d'), array('i')
+    offsets = [0]
+    label_id = labels.id
+    for tier in ann:
+        for interval in tier.intervals:
+            starts.append(interval.start)
+            ends.append(interval.end)
+            ids.append(label_id(interval.text))
+        offsets.append(len(starts))
+
+    encoded = [text.encode('UTF-8') for text in labels.texts]
+    text_offsets = array('q', [0])
+    for data in encoded:
+        text_offsets.append(text_offsets[-1] + len(data))
+
+    handle = SharedAnnotation(None, ann.duration,
+                              [(tier.name, tier.is_point) for tier in ann],
+                              offsets, len(labels))
+    sections = handle._sections
+    size = sections[-1] + text_offsets[-1]
+
+    shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    try:
+        for pos, column in zip(sections, (starts, ends, ids, text_offsets)):
+            data = column.tobytes()
+            shm.buf[pos:pos + len(data)] = data
+        shm.buf[sections[-1]:size] = b''.join(encoded)
+    except BaseException:
+        shm.close()
+        shm.unlink()
+        raise
+
+    handle.name = shm.name
+    shm.close()
+
+    return handle
+
+
+def read_shared(source, tiers=None, window=None) -> SharedAnnotation:
+    """Reads annotation file like read_annotation and returns it shared,
+    for use as a task of a process pool."""
+
+    return share(read_annotation(source, tiers, window))
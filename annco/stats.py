@@ -0,0 +1,290 @@
+"""Corpus statistics computed by map-reduce over annotation files.
+
+Every file is reduced to a small partial aggregate by a worker process:
+interval counts, speech, silence and gap time per tier, label frequencies
+and speaking time per speaker. Partials are summed in the parent into
+corpus figures reported as JSON or CSV. With a cache, partials of files
+unchanged since the previous run are reused, so only new and changed files
+are parsed again.
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+
+from annco.fileio import atomic_output, read_annotation, sniff
+from annco.model import SILENCE_LABELS, Annotation
+from annco.batch import iter_inputs
+
+
+SPEAKER_TIER = 'Мовці'
+REPORT_FORMATS = ('json', 'csv')
+TIER_FIGURES = ('files', 'time', 'intervals', 'points', 'speech', 'silence', 'gaps')
+
+
+def file_stats(ann: Annotation, speaker_tier=SPEAKER_TIER) -> dict:
+    """Returns partial statistics of one annotation.
+
+    For every tier: number of files it occurs in, their duration ('time'),
+    numbers of intervals and points, and time covered by intervals with
+    text ('speech'), by intervals with silence labels or empty text
+    ('silence') and by no interval at all ('gaps'). Labels are counted over
+    all tiers, speaking time is summed per text of intervals of
+    speaker_tier (speakers of turns in .trs files).
+    """
+
+    tiers, labels, speakers = {}, Counter(), Counter()
+
+    for tier in ann:
+        figures = tiers.setdefault(tier.name, dict.fromkeys(TIER_FIGURES, 0))
+        figures['files'] = 1
+        figures['time'] += ann.duration
+        labels.update(interval.text for interval in tier.intervals if interval.text)
+
+        if tier.is_point:
+            figures['points'] += len(tier.intervals)
+            continue
+
+        figures['intervals'] += len(tier.intervals)
+        covered = 0.0
+        for interval in sorted(tier.intervals, key=lambda i: i.start):
+            length = max(interval.end - interval.start, 0.0)
+            if interval.text in SILENCE_LABELS:
+                figures['silence'] += length
+            else:
+                figures['speech'] += length
+            if interval.start > covered:
+                figures['gaps'] += interval.start - covered
+            covered = max(covered, interval.end)
+        figures['gaps'] += max(ann.duration - covered, 0.0)
+
+        if tier.name == speaker_tier:
+            for interval in tier.intervals:
+                speakers[interval.text] += max(interval.end - interval.start, 0.0)
+
+    return {'files': 1, 'duration': ann.duration, 'tiers': tiers,
+            'labels': dict(labels), 'speakers': dict(speakers)}
+
+
+def combine_into(total: dict, partial: dict) -> None:
+    """Adds partial statistics to total in place; labels and speakers of
+    total are Counters."""
+
+    total['files'] += partial['files']
+    total['duration'] += partial['duration']
+    total['labels'].update(partial['labels'])
+    total['speakers'].update(partial['speakers'])
+    for name, figures in partial['tiers'].items():
+        summed = total['tiers'].setdefault(name, dict.fromkeys(TIER_FIGURES, 0))
+        for key, value in figures.items():
+            summed[key] += value
+
+
+def combine(partials) -> dict:
+    """Returns sum of partial statistics, which is a partial itself."""
+
+    total = {'files': 0, 'duration': 0.0, 'tiers': {}, 'labels': Counter(),
+             'speakers': Counter()}
+    for partial in partials:
+        combine_into(total, partial)
+
+    total['labels'] = dict(total['labels'])
+    total['speakers'] = dict(total['speakers'])
+
+    return total
+
+
+def report(total: dict, top=None) -> dict:
+    """Returns corpus statistics from combined partials: tier figures with
+    ratios of silence and gaps to tier time, labels by frequency (the top
+    most frequent ones only if top is given) and speakers by speaking time.
+    """
+
+    tiers = {}
+    for name, figures in total['tiers'].items():
+        tiers[name] = dict(figures)
+        time = figures['time']
+        tiers[name]['silence_ratio'] = figures['silence'] / time if time else 0.0
+        tiers[name]['gap_ratio'] = figures['gaps'] / time if time else 0.0
+
+    return {
+        'files': total['files'],
+        'duration': total['duration'],
+        'tiers': tiers,
+        'labels': dict(Counter(total['labels']).most_common(top)),
+        'speakers': dict(sorted(total['speakers'].items(),
+                                key=lambda item: item[1], reverse=True)),
+    }
+
+
+def write_report(stats: dict, target, fmt='json') -> None:
+    """Writes statistics into target path as JSON or as CSV rows of
+    section, name, figure and value."""
+
+    if fmt not in REPORT_FORMATS:
+        raise ValueError(f"Unsupported report format: {fmt}")
+
+    with atomic_output(target) as raw, io.TextIOWrapper(raw, 'UTF-8', newline='') as f:
+        if fmt == 'json':
+            json.dump(stats, f, ensure_ascii=False, indent=1)
+            return
+
+        writer = csv.writer(f, lineterminator='\n')
+        writer.writerow(('section', 'name', 'figure', 'value'))
+        writer.writerow(('corpus', '', 'files', stats['files']))
+        writer.writerow(('corpus', '', 'duration', stats['duration']))
+        for name, figures in stats['tiers'].items():
+            writer.writerows(('tier', name, key, value) for key, value in figures.items())
+        writer.writerows(('speaker', name, 'time', value)
+                         for name, value in stats['speakers'].items())
+        writer.writerows(('label', text, 'count', value)
+                         for text, value in stats['labels'].items())
+
+
+class StatsCache:
+    """Partial statistics of files from previous runs, keyed by path and
+    valid while size and mtime of the file are unchanged."""
+
+    def __init__(self, path, speaker_tier=SPEAKER_TIER):
+        self.path = path
+        self.speaker_tier = speaker_tier
+        try:
+            with open(path, encoding='UTF-8') as f:
+                cached = json.load(f)
+        except FileNotFoundError:
+            cached = {}
+        self.entries = (cached.get('files', {})
+                        if cached.get('speaker_tier') == speaker_tier else {})
+
+    def get(self, src, stat) -> dict:
+        """Returns cached partial of src or None if src changed."""
+
+        entry = self.entries.get(src)
+        if entry is None or (entry['size'], entry['mtime']) != (stat.st_size,
+                                                               stat.st_mtime_ns):
+            return None
+
+        return entry['stats']
+
+    def put(self, src, stat, partial: dict) -> None:
+        self.entries[src] = {'size': stat.st_size, 'mtime': stat.st_mtime_ns,
+                             'stats': partial}
+
+    def save(self, keep) -> None:
+        """Writes cache of files in keep, dropping the others."""
+
+        files = {src: entry for src, entry in self.entries.items() if src in keep}
+        with atomic_output(self.path) as f:
+            f.write(json.dumps({'speaker_tier': self.speaker_tier, 'files': files},
+                               ensure_ascii=False).encode('UTF-8'))
+
+
+def _stats_job(src, speaker_tier: str) -> tuple:
+    """Computes partial statistics of src in a worker, returns
+    (status, src, partial or error message)."""
+
+    if sniff(src)[0] is None:
+        return 'ignored', src, None
+    try:
+        return 'ok', src, file_stats(read_annotation(src), speaker_tier)
+    except Exception as e:
+        return 'failed', src, f"{type(e).__name__}: {e}"
+
+
+def corpus_stats(src_root, workers=None, cache_path=None, speaker_tier=SPEAKER_TIER,
+                 top=None) -> tuple:
+    """Computes statistics of every annotation file under src_root (or of a
+    single file) on a process pool.
+
+    Workers keep one file at a time and return its partial statistics,
+    which are combined in order of completion. If cache_path is given,
+    partials of unchanged files are taken from the cache, which is updated.
+    Returns the report (see report()) and a summary of the run.
+    """
+
+    summary = {'computed': 0, 'cached': 0, 'ignored': 0, 'failed': {}}
+    workers = workers or os.cpu_count() or 1
+    cache = StatsCache(cache_path, speaker_tier) if cache_path else None
+    total = {'files': 0, 'duration': 0.0, 'tiers': {}, 'labels': Counter(),
+             'speakers': Counter()}
+    seen, stats = set(), {}
+
+    srcs = iter_inputs(src_root) if os.path.isdir(src_root) else [src_root]
+
+    with ProcessPoolExecutor(workers) as pool:
+        pending = deque()
+
+        def collect(limit):
+            while len(pending) > limit:
+                status, src, result = pending.popleft().result()
+                # stat taken before parsing, so a file changed meanwhile is
+                # parsed again by the next run
+                stat = stats.pop(src, None)
+                if status == 'ignored':
+                    summary['ignored'] += 1
+                elif status == 'failed':
+                    summary['failed'][src] = result
+                else:
+                    summary['computed'] += 1
+                    combine_into(total, result)
+                    if cache is not None:
+                        cache.put(src, stat, result)
+
+        for src in srcs:
+            if cache_path and os.path.abspath(src) == os.path.abspath(cache_path):
+                continue
+            seen.add(src)
+            partial = None
+            if cache is not None:
+                stats[src] = os.stat(src)
+                partial = cache.get(src, stats[src])
+            if partial is not None:
+                del stats[src]
+                summary['cached'] += 1
+                combine_into(total, partial)
+                continue
+            pending.append(pool.submit(_stats_job, src, speaker_tier))
+            collect(2 * workers)
+        collect(0)
+
+    if cache is not None:
+        cache.save(seen)
+
+    return report(total, top), summary
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='python -m annco.stats',
+        description="Compute statistics of annotation files."
+    )
+    parser.add_argument('src', help="annotation file or directory")
+    parser.add_argument('target', help="report file")
+    parser.add_argument('-f', '--format', choices=REPORT_FORMATS, default='json')
+    parser.add_argument('-w', '--workers', type=int)
+    parser.add_argument('--cache', help="file keeping partial statistics of files "
+                                        "for incremental runs")
+    parser.add_argument('--speaker-tier', default=SPEAKER_TIER,
+                        help=f"tier whose texts are speakers (default: {SPEAKER_TIER})")
+    parser.add_argument('--top', type=int, help="report only the most frequent labels")
+    args = parser.parse_args(argv)
+
+    stats, summary = corpus_stats(args.src, args.workers, args.cache,
+                                  args.speaker_tier, args.top)
+    write_report(stats, args.target, args.format)
+
+    print(f"computed: {summary['computed']}, cached: {summary['cached']}, "
+          f"ignored: {summary['ignored']}, failed: {len(summary['failed'])}")
+    for src, error in summary['failed'].items():
+        print(f"{src}: {error}")
+
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
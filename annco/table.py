@@ -0,0 +1,154 @@
+"""Tabular export of annotations for analytics.
+
+Writes one row per interval with columns file, tier, is_point, start, end
+and text as CSV, TSV or JSON Lines. A whole corpus can be exported into a
+single table: files are parsed and serialised by worker processes and
+their rows are appended to the table in a stable order, so memory use
+does not grow with the size of the corpus.
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from annco.fileio import (is_archive, iter_archive, atomic_output, read_annotation,
+                          read_contents, sniff_stream)
+from annco.model import Annotation
+from annco.batch import iter_inputs
+
+
+TABLE_FORMATS = ('csv', 'tsv', 'jsonl')
+COLUMNS = ('file', 'tier', 'is_point', 'start', 'end', 'text')
+
+
+class TableWriter:
+    """Writes interval rows into a text stream in one of TABLE_FORMATS."""
+
+    def __init__(self, f, fmt: str):
+        if fmt not in TABLE_FORMATS:
+            raise ValueError(f"Unsupported table format: {fmt}")
+        self.f = f
+        self.fmt = fmt
+        if fmt != 'jsonl':
+            self._csv = csv.writer(f, delimiter=',' if fmt == 'csv' else '\t',
+                                   lineterminator='\n')
+
+    def write_header(self) -> None:
+        """Writes column names, JSON Lines have none."""
+
+        if self.fmt != 'jsonl':
+            self._csv.writerow(COLUMNS)
+
+    def write_annotation(self, file: str, ann: Annotation) -> None:
+        """Writes rows of all intervals of ann."""
+
+        if self.fmt == 'jsonl':
+            for row in ann.rows():
+                self.f.write(json.dumps(dict(zip(COLUMNS, (file, *row))),
+                                        ensure_ascii=False) + '\n')
+        else:
+            self._csv.writerows((file, *row) for row in ann.rows())
+
+
+def export_table(ann: Annotation, target, fmt: str, file='') -> None:
+    """Writes rows of ann into target path, compressed if it ends with
+    .gz, .bz2 or .xz.
+    """
+
+    with atomic_output(target) as raw, io.TextIOWrapper(raw, 'UTF-8', newline='') as f:
+        writer = TableWriter(f, fmt)
+        writer.write_header()
+        writer.write_annotation(file, ann)
+
+
+def _rows_chunk(file: str, source, fmt: str) -> tuple:
+    """Parses source path or contents in a worker and returns
+    (status, file, rows text or error message).
+    """
+
+    try:
+        with (io.BytesIO(source) if isinstance(source, bytes)
+              else open(source, 'rb')) as f:
+            in_fmt, encoding, stream = sniff_stream(f)
+            if in_fmt is None:
+                return 'ignored', file, None
+            ann = Annotation.from_format(in_fmt, read_contents(stream, in_fmt, encoding))
+    except Exception as e:
+        return 'failed', file, f"{type(e).__name__}: {e}"
+
+    chunk = io.StringIO()
+    TableWriter(chunk, fmt).write_annotation(file, ann)
+
+    return 'ok', file, chunk.getvalue()
+
+
+def export_corpus(src_root, target, fmt: str, workers=None) -> dict:
+    """Writes rows of every annotation under src_root into a single table.
+
+    src_root is a directory or a ZIP/TAR archive. Files which can not be
+    read are reported, files which are not annotations are ignored.
+    Returns a summary of the run.
+    """
+
+    summary = {'exported': 0, 'ignored': 0, 'failed': {}}
+    workers = workers or os.cpu_count() or 1
+
+    if is_archive(src_root):
+        sources = ((member, stream.read()) for member, stream in iter_archive(src_root))
+    else:
+        sources = ((os.path.relpath(path, src_root), path)
+                   for path in iter_inputs(src_root))
+
+    with ProcessPoolExecutor(workers) as pool, atomic_output(target) as raw, \
+            io.TextIOWrapper(raw, 'UTF-8', newline='') as f:
+        TableWriter(f, fmt).write_header()
+        pending = deque()
+
+        def collect(limit):
+            while len(pending) > limit:
+                status, file, result = pending.popleft().result()
+                if status == 'ok':
+                    f.write(result)
+                    summary['exported'] += 1
+                elif status == 'ignored':
+                    summary['ignored'] += 1
+                else:
+                    summary['failed'][file] = result
+
+        for file, source in sources:
+            pending.append(pool.submit(_rows_chunk, file, source, fmt))
+            collect(2 * workers)
+        collect(0)
+
+    return summary
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='python -m annco.table',
+        description="Export intervals of annotation files as a table."
+    )
+    parser.add_argument('src', help="annotation file, directory or ZIP/TAR archive")
+    parser.add_argument('target')
+    parser.add_argument('-f', '--format', choices=TABLE_FORMATS, default='csv')
+    parser.add_argument('-w', '--workers', type=int)
+    args = parser.parse_args(argv)
+
+    if os.path.isdir(args.src) or is_archive(args.src):
+        summary = export_corpus(args.src, args.target, args.format, args.workers)
+        for file, error in summary['failed'].items():
+            print(f"{file}: {error}")
+        return 1 if summary['failed'] else 0
+
+    export_table(read_annotation(args.src), args.target, args.format,
+                 os.path.basename(args.src))
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,285 @@
+"""Validation and repair of annotation tiers.
+
+Readers take times as they are in the file, while writers expect intervals
+of every tier sorted by start, not overlapping, not ending before they
+start and lying within the duration of the annotation. validate() checks
+these invariants for whole tiers at once on columns of starts and ends,
+with NumPy if it is installed, and returns the problems found; repair()
+fixes them in place by dropping, sorting, clipping or merging intervals.
+"""
+
+import argparse
+import json
+import os
+
+from collections import namedtuple
+from itertools import accumulate, compress, repeat
+from math import isfinite, nan
+from operator import and_, gt, lt, or_
+
+try:
+    import numpy as np
+except ImportError:  # columns are checked in plain Python
+    np = None
+
+from annco.fileio import read_annotation, sniff
+from annco.model import Annotation, Interval
+from annco.batch import iter_inputs
+
+
+ISSUES = ('invalid', 'inverted', 'unsorted', 'overlap', 'out of range')
+FIXES = ('drop', 'sort', 'clip', 'merge')
+
+Issue = namedtuple('Issue', 'tier kind count indices')
+Issue.__doc__ = """Problem of a tier found by validate().
+
+kind is one of ISSUES: 'invalid' (start or end is not a finite number),
+'inverted' (end before start), 'unsorted' (start before start of the
+preceding interval), 'overlap' (start before end of an interval starting
+earlier, interval tiers only) and 'out of range' (before 0 or after the
+duration). repair() also reports intervals 'left out' for invalid times.
+count is the number of intervals affected, indices are the first of their
+positions in the tier.
+"""
+
+
+def _finite(value) -> bool:
+    "Returns True if value is a finite number"
+
+    return isinstance(value, (int, float)) and isfinite(value)
+
+
+def _problems(starts: list, ends: list, duration: float, is_point: bool) -> dict:
+    """Returns positions of intervals with every kind of problem, found by
+    comparing whole columns of starts and ends. Intervals with invalid
+    times are left out of the other checks."""
+
+    n = len(starts)
+    if np is not None:
+        if not set(map(type, starts)) | set(map(type, ends)) <= {float, int}:
+            # NumPy would parse strings and fail on other objects
+            starts = [a if _finite(a) else nan for a in starts]
+            ends = [b if _finite(b) else nan for b in ends]
+        s, e = np.array(starts, dtype=float), np.array(ends, dtype=float)
+        finite = np.isfinite(s) & np.isfinite(e)
+        found = {
+            'invalid': np.flatnonzero(~finite),
+            'inverted': np.flatnonzero(finite & (e < s)),
+            'unsorted': np.flatnonzero(finite[1:] & finite[:-1] & (s[1:] < s[:-1])) + 1,
+            'out of range': np.flatnonzero(finite & ((s < 0) | (e > duration))),
+        }
+        if not is_point and n > 1:
+            # an interval overlaps if it starts before the furthest end so far
+            valid = np.flatnonzero(finite)
+            order = valid[np.argsort(s[valid], kind='stable')]
+            reach = np.maximum.accumulate(e[order])
+            found['overlap'] = np.sort(order[1:][s[order[1:]] < reach[:-1]])
+        return {kind: found[kind].tolist() for kind in ISSUES if kind in found}
+
+    finite = list(map(and_, map(_finite, starts), map(_finite, ends)))
+    invalid = [i for i, ok in enumerate(finite) if not ok]
+    positions = valid = range(n)
+    if invalid:
+        valid = list(compress(valid, finite))
+        # invalid times compare as NaN, which is never smaller or greater
+        starts = [a if ok else nan for a, ok in zip(starts, finite)]
+        ends = [b if ok else nan for b, ok in zip(ends, finite)]
+
+    found = {
+        'invalid': invalid,
+        'inverted': list(compress(positions, map(gt, starts, ends))),
+        'unsorted': list(compress(range(1, n), map(lt, starts[1:], starts))),
+        'out of range': list(compress(positions, map(or_,
+                                                     map(lt, starts, repeat(0)),
+                                                     map(gt, ends, repeat(duration))))),
+    }
+    if not is_point and n > 1:
+        order = sorted(valid, key=starts.__getitem__)
+        reach = list(accumulate(map(ends.__getitem__, order), max))
+        found['overlap'] = sorted(compress(order[1:], map(lt, map(starts.__getitem__,
+                                                                  order[1:]), reach)))
+
+    return {kind: found[kind] for kind in ISSUES if kind in found}
+
+
+def validate_tier(tier, duration: float, limit=10) -> list:
+    """Returns a list of Issues of tier, at most limit positions each."""
+
+    intervals = tier.intervals
+    starts = [interval.start for interval in intervals]
+    ends = [interval.end for interval in intervals]
+
+    return [Issue(tier.name, kind, len(positions), positions[:limit])
+            for kind, positions in _problems(starts, ends, duration,
+                                             tier.is_point).items() if positions]
+
+
+def validate(ann: Annotation, limit=10) -> list:
+    """Returns a list of Issues of all tiers of Annotation, empty if the
+    annotation is valid. See Issue for the problems checked."""
+
+    issues = []
+    for tier in ann:
+        issues.extend(validate_tier(tier, ann.duration, limit))
+
+    return issues
+
+
+def repair_tier(tier, duration: float, fixes=FIXES) -> list:
+    """Fixes problems of tier in place with given fixes, a collection of
+    FIXES, and returns positions of intervals left out for invalid times.
+
+    'drop' removes intervals with invalid times, ending before they start
+    or lying wholly outside the annotation; 'sort' sorts intervals by start
+    and end; 'clip' limits boundaries to the annotation and cuts overlapping
+    intervals short at the start of the next one; 'merge' joins overlapping
+    intervals into one with their texts. Overlaps are resolved on sorted
+    intervals, so 'clip' and 'merge' of interval tiers sort them as well.
+    Intervals whose times are not finite numbers can not be fixed and are
+    left out by every fix.
+    """
+
+    unknown = set(fixes) - set(FIXES)
+    if unknown:
+        raise ValueError(f"Unsupported fixes: {', '.join(sorted(unknown))}")
+    if not fixes:
+        return []
+
+    intervals, left_out = [], []
+    for i, interval in enumerate(tier.intervals):
+        if _finite(interval.start) and _finite(interval.end):
+            intervals.append(interval)
+        else:
+            left_out.append(i)
+
+    if 'drop' in fixes:
+        if tier.is_point:
+            intervals = [i for i in intervals
+                         if i.start <= i.end and 0 <= i.start <= duration]
+        else:
+            intervals = [i for i in intervals
+                         if i.start <= i.end and i.end > 0 and i.start < duration]
+
+    resolve = not tier.is_point and ('clip' in fixes or 'merge' in fixes)
+    if 'sort' in fixes or resolve:
+        intervals = sorted(intervals, key=lambda i: (i.start, i.end))
+
+    if 'clip' in fixes:
+        for interval in intervals:
+            interval.start = min(max(interval.start, 0), duration)
+            interval.end = min(max(interval.end, 0), duration)
+
+    if resolve:
+        intervals = _merged(intervals) if 'merge' in fixes else _cut(intervals)
+
+    tier.intervals = intervals
+    tier.touch()
+
+    return left_out
+
+
+def _cut(intervals: list) -> list:
+    """Returns sorted intervals with every interval ending at the latest at
+    the start of the next one; intervals left without length are dropped."""
+
+    kept = []
+    for interval, following in zip(intervals, intervals[1:] + [None]):
+        length = interval.end > interval.start
+        if following is not None and interval.end > following.start:
+            interval.end = following.start
+        if interval.end > interval.start or not length:
+            kept.append(interval)
+
+    return kept
+
+
+def _merged(intervals: list) -> list:
+    """Returns sorted intervals with overlapping ones joined into a single
+    interval whose text joins their texts."""
+
+    merged, texts = [], []
+    for interval in intervals:
+        if merged and interval.start < merged[-1].end:
+            merged[-1].end = max(merged[-1].end, interval.end)
+            if interval.text and interval.text not in texts[-1]:
+                texts[-1].append(interval.text)
+            continue
+        merged.append(Interval(interval.start, interval.end, interval.text))
+        texts.append([interval.text] if interval.text else [])
+
+    for interval, parts in zip(merged, texts):
+        if len(parts) > 1:
+            interval.text = ' '.join(parts)
+
+    return merged
+
+
+def repair(ann: Annotation, fixes=FIXES, limit=10) -> list:
+    """Fixes problems of all tiers of Annotation in place with given fixes
+    (see repair_tier) and returns the Issues found before the repair,
+    followed by a 'left out' Issue of every tier which lost intervals with
+    invalid times. Tiers without issues are left as they are."""
+
+    issues = []
+    for tier in ann:
+        found = validate_tier(tier, ann.duration, limit)
+        if found:
+            left_out = repair_tier(tier, ann.duration, fixes)
+            issues.extend(found)
+            if left_out:
+                issues.append(Issue(tier.name, 'left out', len(left_out),
+                                    left_out[:limit]))
+
+    return issues
+
+
+def report(issues: list) -> str:
+    """Returns a compact report of issues, one line per tier and kind."""
+
+    return '\n'.join(f"{issue.tier}: {issue.count} {issue.kind} "
+                     f"(at {', '.join(map(str, issue.indices))}"
+                     f"{', ...' if issue.count > len(issue.indices) else ''})"
+                     for issue in issues)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='python -m annco.validate',
+        description="Check annotation files for unsorted, overlapping, inverted "
+                    "and out of range intervals."
+    )
+    parser.add_argument('paths', nargs='+', help="annotation files or directories")
+    parser.add_argument('--limit', type=int, default=10,
+                        help="positions of each issue to report")
+    parser.add_argument('--json', action='store_true',
+                        help="print issues of every file as JSON")
+    args = parser.parse_args(argv)
+
+    results, failed = {}, {}
+    for path in args.paths:
+        srcs = iter_inputs(path) if os.path.isdir(path) else [path]
+        for src in srcs:
+            if sniff(src)[0] is None:
+                continue
+            try:
+                results[src] = validate(read_annotation(src), args.limit)
+            except Exception as e:
+                failed[src] = f"{type(e).__name__}: {e}"
+
+    if args.json:
+        print(json.dumps({'issues': {src: [issue._asdict() for issue in issues]
+                                     for src, issues in results.items() if issues},
+                          'failed': failed}, ensure_ascii=False, indent=1))
+    else:
+        for src, issues in results.items():
+            if issues:
+                print(f"{src}:")
+                print(report(issues))
+        for src, error in failed.items():
+            print(f"{src}: {error}")
+
+    return 1 if failed or any(results.values()) else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
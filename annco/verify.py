@@ -0,0 +1,289 @@
+"""Round-trip verification of converted annotations.
+
+A source file and its converted output are both parsed into Annotation
+objects and compared tier by tier. Intervals of a tier are compared by
+merging the two lists sorted by time, so a tier is checked in a single
+pass and the whole verification costs little more than parsing the files.
+"""
+
+import argparse
+import os
+
+from collections import Counter, deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from annco.fileio import COMPRESSIONS, OUTPUT_FORMATS, read_annotation, sniff
+from annco.model import Annotation
+from annco.batch import iter_inputs, output_path
+
+
+TOLERANCE = 0.001
+
+Difference = namedtuple('Difference', 'tier kind source output')
+Difference.__doc__ = """Difference of a tier between source and output.
+
+kind is one of 'missing tier', 'extra tier', 'tier type', 'missing',
+'extra', 'boundary', 'text' and 'duration'; source and output are the
+differing intervals (TierRefs of tiers, tier type flags or durations),
+None where absent.
+"""
+
+TierRef = namedtuple('TierRef', 'position count')
+TierRef.__doc__ = "Position of a tier in its annotation and number of its intervals."
+
+
+def compare(source: Annotation, output: Annotation, tolerance=TOLERANCE,
+            ignore_empty=True, ignore_points=False, check_duration=False) -> list:
+    """Returns a list of Differences of output from source.
+
+    Boundaries of intervals are equal if they differ by at most tolerance
+    seconds. Intervals with empty text are left out if ignore_empty is True,
+    as some formats fill gaps with them and others drop them. Point tiers
+    of source, and output tiers of the same names, are left out if
+    ignore_points is True, as they are written as interval tiers or not at
+    all by some formats. Durations are compared only if check_duration is
+    True, since formats which do not store them guess them.
+    """
+
+    diffs = []
+    if check_duration and abs(source.duration - output.duration) > tolerance:
+        diffs.append(Difference(None, 'duration', source.duration, output.duration))
+
+    skipped = ({tier.name for tier in source if tier.is_point}
+               if ignore_points else set())
+    out_tiers = {}
+    for position, tier in enumerate(output):
+        if tier.name not in skipped:
+            out_tiers.setdefault(tier.name, deque()).append((position, tier))
+
+    for position, tier in enumerate(source):
+        if tier.name in skipped:
+            continue
+        if not out_tiers.get(tier.name):
+            diffs.append(Difference(tier.name, 'missing tier',
+                                    TierRef(position, len(tier.intervals)), None))
+            continue
+
+        _, out_tier = out_tiers[tier.name].popleft()
+        if tier.is_point != out_tier.is_point:
+            diffs.append(Difference(tier.name, 'tier type',
+                                    tier.is_point, out_tier.is_point))
+        diffs.extend(_compare_intervals(tier.name, _prepared(tier, ignore_empty),
+                                        _prepared(out_tier, ignore_empty), tolerance))
+
+    for tiers in out_tiers.values():
+        for position, tier in tiers:
+            diffs.append(Difference(tier.name, 'extra tier', None,
+                                    TierRef(position, len(tier.intervals))))
+
+    return diffs
+
+
+def _prepared(tier, ignore_empty: bool) -> list:
+    """Returns intervals of tier sorted by start and end."""
+
+    intervals = sorted(tier.intervals, key=lambda i: (i.start, i.end))
+    if ignore_empty:
+        return [interval for interval in intervals if interval.text]
+
+    return intervals
+
+
+def _compare_intervals(name, source: list, output: list, tolerance: float) -> list:
+    """Returns Differences of sorted output intervals from sorted source
+    intervals, found in a single merging pass over both lists.
+    """
+
+    diffs = []
+    i = j = 0
+
+    while i < len(source) and j < len(output):
+        a, b = source[i], output[j]
+        if abs(a.start - b.start) <= tolerance:
+            if abs(a.end - b.end) > tolerance:
+                diffs.append(Difference(name, 'boundary', a, b))
+            elif a.text != b.text:
+                diffs.append(Difference(name, 'text', a, b))
+            i += 1
+            j += 1
+        elif a.start < b.start:
+            diffs.append(Difference(name, 'missing', a, None))
+            i += 1
+        else:
+            diffs.append(Difference(name, 'extra', None, b))
+            j += 1
+
+    diffs.extend(Difference(name, 'missing', a, None) for a in source[i:])
+    diffs.extend(Difference(name, 'extra', None, b) for b in output[j:])
+
+    return diffs
+
+
+def summarize(diffs: list, limit=3) -> dict:
+    """Returns counts of diffs per tier and kind with at most limit examples
+    of each, as {(tier, kind): (count, examples)}."""
+
+    counts = Counter((diff.tier, diff.kind) for diff in diffs)
+    examples = {key: [] for key in counts}
+    for diff in diffs:
+        shown = examples[diff.tier, diff.kind]
+        if len(shown) < limit:
+            shown.append(diff)
+
+    return {key: (count, examples[key]) for key, count in counts.items()}
+
+
+def report(diffs, limit=3) -> str:
+    """Returns a compact report of diffs, a list of Differences or their
+    summary (see summarize): counts of every kind per tier, followed by at
+    most limit examples of each.
+    """
+
+    summary = diffs if isinstance(diffs, dict) else summarize(diffs, limit)
+
+    lines = []
+    for (tier, kind), (count, examples) in summary.items():
+        lines.append(f"{tier or '*'}: {count} {kind}")
+        lines.extend(f"    {_describe(diff.source)} -> {_describe(diff.output)}"
+                     for diff in examples[:limit])
+
+    return '\n'.join(lines)
+
+
+def _describe(item) -> str:
+    """Returns short description of a difference side."""
+
+    if item is None:
+        return '-'
+    if isinstance(item, TierRef):
+        return f"tier {item.position + 1}, {item.count} intervals"
+    if hasattr(item, 'text'):
+        return f"[{item.start:.3f}, {item.end:.3f}] {item.text!r}"
+
+    return str(item)
+
+
+def verify_file(src, dst, tiers=None, window=None, **settings) -> list:
+    """Parses src and its converted output dst and returns their Differences.
+
+    tiers and window are the selection used for the conversion, applied to
+    src only; settings are passed to compare().
+    """
+
+    return compare(read_annotation(src, tiers, window), read_annotation(dst),
+                   **settings)
+
+
+def _verify_job(src, dst, tiers, window, limit: int, settings: dict) -> tuple:
+    """Verifies a file in a worker, returns (status, src, result) where
+    result is the summary of its Differences (see summarize)."""
+
+    if not os.path.exists(dst):
+        return 'missing', src, None
+    try:
+        return 'ok', src, summarize(verify_file(src, dst, tiers, window, **settings),
+                                    limit)
+    except Exception as e:
+        return 'failed', src, f"{type(e).__name__}: {e}"
+
+
+def verify_corpus(src_root, out_root, fmt: str, compress=None, workers=None,
+                  tiers=None, window=None, limit=3, **settings) -> dict:
+    """Verifies outputs of convert_corpus() for every annotation under
+    src_root.
+
+    Arguments are those the corpus was converted with, settings are passed
+    to compare(). Workers return counts of Differences with at most limit
+    examples of each (see summarize). Returns a summary with the number of
+    verified files, counts of differences of every kind in the corpus and
+    the summaries of differing files.
+    """
+
+    summary = {'verified': 0, 'differences': Counter(), 'differing': {},
+               'missing': [], 'failed': {}}
+    workers = workers or os.cpu_count() or 1
+
+    with ProcessPoolExecutor(workers) as pool:
+        pending = deque()
+
+        def collect(limit):
+            while len(pending) > limit:
+                status, src, result = pending.popleft().result()
+                if status == 'missing':
+                    summary['missing'].append(src)
+                elif status == 'failed':
+                    summary['failed'][src] = result
+                else:
+                    summary['verified'] += 1
+                    if result:
+                        summary['differing'][src] = result
+                        for (_, kind), (count, _) in result.items():
+                            summary['differences'][kind] += count
+
+        for src in iter_inputs(src_root):
+            if sniff(src)[0] is None:
+                continue
+            dst = output_path(src, src_root, out_root, fmt, compress)
+            pending.append(pool.submit(_verify_job, src, dst, tiers, window, limit,
+                                       settings))
+            collect(2 * workers)
+        collect(0)
+
+    return summary
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='python -m annco.verify',
+        description="Compare annotation files with their converted outputs."
+    )
+    parser.add_argument('src', help="annotation file or directory")
+    parser.add_argument('dst', help="converted file or output directory")
+    parser.add_argument('-f', '--format', choices=OUTPUT_FORMATS,
+                        help="output format of a converted directory")
+    parser.add_argument('-c', '--compress', choices=COMPRESSIONS,
+                        help="compression suffix of outputs")
+    parser.add_argument('-w', '--workers', type=int)
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE, metavar='SECONDS',
+                        help="maximum difference of equal boundaries (default: 0.001)")
+    parser.add_argument('--keep-empty', action='store_true',
+                        help="compare intervals with empty text as well")
+    parser.add_argument('--ignore-points', action='store_true',
+                        help="leave out point tiers")
+    parser.add_argument('--check-duration', action='store_true')
+    parser.add_argument('--limit', type=int, default=3,
+                        help="examples of each difference to report")
+    args = parser.parse_args(argv)
+    settings = dict(tolerance=args.tolerance, ignore_empty=not args.keep_empty,
+                    ignore_points=args.ignore_points,
+                    check_duration=args.check_duration)
+
+    if not os.path.isdir(args.src):
+        diffs = verify_file(args.src, args.dst, **settings)
+        if diffs:
+            print(report(diffs, args.limit))
+        return 1 if diffs else 0
+
+    if args.format is None:
+        parser.error("--format is required for directories")
+    summary = verify_corpus(args.src, args.dst, args.format, args.compress,
+                            args.workers, limit=args.limit, **settings)
+
+    print(f"verified: {summary['verified']}, differing: {len(summary['differing'])}, "
+          f"missing: {len(summary['missing'])}, failed: {len(summary['failed'])}")
+    if summary['differences']:
+        print(', '.join(f"{count} {kind}"
+                        for kind, count in summary['differences'].most_common()))
+    for src, diffs in summary['differing'].items():
+        print(f"{src}:")
+        print(report(diffs))
+    for src in summary['missing']:
+        print(f"{src}: no output")
+    for src, error in summary['failed'].items():
+        print(f"{src}: {error}")
+
+    return 1 if summary['differing'] or summary['missing'] or summary['failed'] else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,73 @@
+"""Measures start-up cost of AnnCo entry points.
+
+Every module is imported in a fresh interpreter several times; the median
+import time is reported together with heavy modules it pulled in. Exits
+with status 1 if a headless module imports tkinter, so the check can run
+in CI:
+
+    python benchmarks/import_time.py
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEADLESS = ('annco', 'annco.batch', 'annco.server', 'annco.archive',
+            'annco.shard', 'annco.merge', 'annco.table', 'annco.index')
+WATCHED = ('tkinter', 'xml.etree.ElementTree', 'wave', 'annco.formats.textgrid',
+           'annco.formats.eaf', 'annco.formats.trs', 'annco.formats.antx')
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps([elapsed, [m for m in {watched!r} if m in sys.modules]]))
+"""
+
+
+def measure(module: str, repeat=5) -> tuple:
+    """Returns median import time of module in seconds and watched modules
+    it imported.
+    """
+
+    times = []
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, '-c', PROBE.format(module=module, watched=WATCHED)],
+            cwd=ROOT, check=True, capture_output=True, text=True
+        ).stdout
+        elapsed, loaded = json.loads(out)
+        times.append(elapsed)
+
+    return statistics.median(times), loaded
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('modules', nargs='*', default=HEADLESS + ('AnnCo_2',),
+                        help="modules to import (default: headless tools and the GUI)")
+    parser.add_argument('-r', '--repeat', type=int, default=5,
+                        help="fresh interpreters per module (default: 5)")
+    args = parser.parse_args()
+
+    failed = False
+    for module in args.modules:
+        elapsed, loaded = measure(module, args.repeat)
+        print(f"{module:<16}{elapsed * 1000:8.1f} ms  {', '.join(loaded) or '-'}")
+        if module in HEADLESS and 'tkinter' in loaded:
+            failed = True
+
+    if failed:
+        print("tkinter imported by a headless module", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,26 @@
+import pytest
+
+from annco.model import Annotation, Interval, Tier
+
+
+@pytest.fixture
+def ann():
+    """Small annotation with gaps, non-ASCII and XML special texts and a
+    point tier."""
+
+    return Annotation([
+        Tier('Words', [Interval(0.5, 1.25, 'привіт'), Interval(1.25, 2.0, 'світ "q"'),
+                       Interval(3.0, 4.5, 'a & <b>')]),
+        Tier('Phones', [Interval(0.5, 0.8, 'p'), Interval(0.8, 2.0, 'r')]),
+        Tier('Marks', [Interval(1.0, 1.0, 'm1'), Interval(2.5, 2.5, 'm2')], is_point=True),
+    ], 5.0)
+
+
+@pytest.fixture
+def big_ann():
+    """Annotation with tiers of many intervals."""
+
+    words = [Interval(i * 0.01, (i + 1) * 0.01, f'w{i % 7}') for i in range(1500)]
+    phones = [Interval(i * 0.02, i * 0.02 + 0.015, 'ph') for i in range(700)]
+
+    return Annotation([Tier('Words', words), Tier('Phones', phones)], 15.0)
@@ -0,0 +1,124 @@
+import os
+
+import pytest
+
+from annco import write_annotation
+from annco.batch import convert_corpus, output_path
+
+
+BROKEN = b'File type = "ooTextFile"\nObject class = "TextGrid"\n\nxmin = oops\n'
+
+
+@pytest.fixture
+def corpus(tmp_path, ann):
+    src = tmp_path / 'corpus'
+    (src / 'sub').mkdir(parents=True)
+    write_annotation(ann, str(src / 'a.TextGrid'), 'textgrid')
+    write_annotation(ann, str(src / 'sub' / 'b.eaf'), 'eaf')
+
+    return src
+
+
+def _output(corpus, out, name, fmt='eaf'):
+    return output_path(str(corpus / name), str(corpus), str(out), fmt)
+
+
+def _changed(path):
+    "Moves mtime of path rewritten by the test, so the change is seen"
+
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+
+def test_manifest_skips_unchanged_and_reconverts_changed(corpus, tmp_path, ann):
+    out, manifest = tmp_path / 'out', str(tmp_path / 'manifest.json')
+
+    summary = convert_corpus(str(corpus), str(out), 'eaf', manifest)
+    assert len(summary['converted']) == 2
+    assert os.path.exists(_output(corpus, out, 'a.TextGrid'))
+
+    summary = convert_corpus(str(corpus), str(out), 'eaf', manifest)
+    assert (summary['converted'], summary['skipped']) == ([], 2)
+
+    ann[0].relabel(0, 'changed')
+    write_annotation(ann, str(corpus / 'a.TextGrid'), 'textgrid')
+    _changed(corpus / 'a.TextGrid')
+    summary = convert_corpus(str(corpus), str(out), 'eaf', manifest)
+    assert summary['converted'] == [str(corpus / 'a.TextGrid')]
+    assert summary['skipped'] == 1
+
+
+def test_manifest_removes_outputs_of_deleted_inputs(corpus, tmp_path):
+    out, manifest = tmp_path / 'out', str(tmp_path / 'manifest.json')
+    convert_corpus(str(corpus), str(out), 'eaf', manifest)
+    dst = _output(corpus, out, 'sub/b.eaf')
+
+    os.remove(corpus / 'sub' / 'b.eaf')
+    summary = convert_corpus(str(corpus), str(out), 'eaf', manifest)
+
+    assert summary['removed'] == [dst]
+    assert not os.path.exists(dst)
+
+
+def test_manifest_prunes_inputs_no_longer_annotations(corpus, tmp_path):
+    out, manifest = tmp_path / 'out', str(tmp_path / 'manifest.json')
+    convert_corpus(str(corpus), str(out), 'eaf', manifest)
+    dst = _output(corpus, out, 'a.TextGrid')
+
+    (corpus / 'a.TextGrid').write_bytes(b'not an annotation\n')
+    _changed(corpus / 'a.TextGrid')
+    summary = convert_corpus(str(corpus), str(out), 'eaf', manifest)
+
+    assert summary['ignored'] == 1
+    assert summary['removed'] == [dst]
+    assert not os.path.exists(dst)
+
+
+def test_manifest_format_change_removes_old_outputs(corpus, tmp_path):
+    out, manifest = tmp_path / 'out', str(tmp_path / 'manifest.json')
+    convert_corpus(str(corpus), str(out), 'eaf', manifest)
+
+    summary = convert_corpus(str(corpus), str(out), 'antx', manifest)
+
+    assert len(summary['converted']) == 2
+    assert sorted(summary['removed']) == sorted(
+        _output(corpus, out, name) for name in ('a.TextGrid', 'sub/b.eaf'))
+    for name in ('a.TextGrid', 'sub/b.eaf'):
+        assert not os.path.exists(_output(corpus, out, name))
+        assert os.path.exists(_output(corpus, out, name, 'antx'))
+
+
+def test_manifest_ignores_runtime_options(corpus, tmp_path):
+    out, manifest = tmp_path / 'out', str(tmp_path / 'manifest.json')
+    convert_corpus(str(corpus), str(out), 'eaf', manifest)
+
+    summary = convert_corpus(str(corpus), str(out), 'eaf', manifest, write_workers=2)
+
+    assert (summary['converted'], summary['skipped']) == ([], 2)
+
+
+def test_journal_resumes_failed_run(corpus, tmp_path, ann):
+    out, journal = tmp_path / 'out', tmp_path / 'journal'
+    (corpus / 'c.TextGrid').write_bytes(BROKEN)
+
+    summary = convert_corpus(str(corpus), str(out), 'eaf', journal_path=str(journal))
+    assert list(summary['failed']) == [str(corpus / 'c.TextGrid')]
+    assert len(summary['converted']) == 2
+    assert journal.exists()
+
+    write_annotation(ann, str(corpus / 'c.TextGrid'), 'textgrid')
+    summary = convert_corpus(str(corpus), str(out), 'eaf', journal_path=str(journal))
+
+    assert summary['resumed'] == 2
+    assert summary['converted'] == [str(corpus / 'c.TextGrid')]
+    assert not summary['failed']
+    assert not journal.exists()
+
+
+def test_journal_of_another_run_is_refused(corpus, tmp_path):
+    out, journal = tmp_path / 'out', tmp_path / 'journal'
+    (corpus / 'c.TextGrid').write_bytes(BROKEN)
+    convert_corpus(str(corpus), str(out), 'eaf', journal_path=str(journal))
+
+    with pytest.raises(ValueError):
+        convert_corpus(str(corpus), str(out), 'antx', journal_path=str(journal))
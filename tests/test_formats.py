@@ -0,0 +1,99 @@
+import io
+
+import pytest
+
+from annco import read_annotation, write_annotation
+from annco.model import Tier
+from annco.verify import compare
+
+
+TRS = """<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE Trans SYSTEM "trans-14.dtd">
+<Trans>
+<Speakers><Speaker id="spk1" name="Олена"/><Speaker id="spk2" name="Petro"/></Speakers>
+<Topics><Topic id="to1" desc="weather"/></Topics>
+<Episode>
+<Section type="report" topic="to1" startTime="0" endTime="3">
+<Turn speaker="spk1" startTime="0" endTime="2">
+<Sync time="0"/>добрий день
+<Sync time="1"/>
+<Background time="1" type="music" level="high"/>sunny
+</Turn>
+<Turn speaker="spk1 spk2" startTime="2" endTime="3">
+<Sync time="2"/>
+<Who nb="1"/>yes
+<Who nb="2"/>no
+</Turn>
+</Section>
+<Section type="nontrans" startTime="3" endTime="4">
+<Turn startTime="3" endTime="4">
+<Sync time="3"/>
+</Turn>
+</Section>
+</Episode>
+</Trans>
+"""
+
+
+def _round_trip(ann, fmt, **options):
+    f = io.BytesIO()
+    write_annotation(ann, f, fmt, **options)
+    f.seek(0)
+
+    return read_annotation(f)
+
+
+@pytest.mark.parametrize('mode', ['long', 'short', 'binary'])
+def test_textgrid_round_trip(ann, mode):
+    out = _round_trip(ann, 'textgrid', tg_mode=mode)
+
+    assert out.duration == ann.duration
+    assert [(t.name, t.is_point) for t in out] == [(t.name, t.is_point) for t in ann]
+    assert compare(ann, out, check_duration=True) == []
+
+
+@pytest.mark.parametrize('fmt', ['eaf', 'antx'])
+def test_xml_round_trip(ann, fmt):
+    out = _round_trip(ann, fmt)
+
+    assert [t.name for t in out] == ['Words', 'Phones']
+    assert compare(ann, out, ignore_points=True) == []
+
+
+@pytest.mark.parametrize('fmt', ['eaf', 'antx'])
+def test_xml_round_trip_points(ann, fmt):
+    out = _round_trip(ann, fmt, incl_point=True)
+    marks = Tier('Marks', ann[2].extended(ann.duration))
+
+    assert compare(type(ann)([marks], ann.duration), type(ann)([out[2]], ann.duration)) == []
+
+
+def test_trs_read():
+    out = read_annotation(io.BytesIO(TRS.encode('UTF-8')))
+
+    assert out.duration == 4.0
+    assert [t.name for t in out] == ['Теми', 'Мовці', 'Транскрипція', 'Фон']
+    texts = {t.name: [(i.start, i.end, i.text) for i in t.intervals] for t in out}
+    assert texts['Теми'] == [(0.0, 3.0, 'weather'), (3.0, 4.0, 'nontrans')]
+    assert texts['Мовці'] == [(0.0, 2.0, 'Олена'), (2.0, 3.0, 'Олена + Petro'),
+                              (3.0, 4.0, '(без мовця)')]
+    assert texts['Транскрипція'] == [(0.0, 1.0, 'добрий день'), (1.0, 2.0, 'sunny'),
+                                     (2.0, 3.0, '1: yes 2: no'), (3.0, 4.0, '')]
+    assert texts['Фон'] == [(1.0, 4.0, 'music')]
+
+
+def test_trs_read_selected_tier():
+    out = read_annotation(io.BytesIO(TRS.encode('UTF-8')), ['Мовці'])
+
+    assert out.duration == 4.0
+    assert [t.name for t in out] == ['Мовці']
+    assert 'weather' not in out.labels
+
+
+@pytest.mark.parametrize('path', ['Ref_Anns_1.eaf', 'no_audio_file.antx'])
+@pytest.mark.parametrize('fmt', ['textgrid', 'eaf', 'antx'])
+def test_reference_files_convert(path, fmt):
+    source = read_annotation(path)
+    out = _round_trip(source, fmt)
+
+    assert compare(source, out, ignore_points=True) == []
@@ -0,0 +1,93 @@
+import os
+
+import pytest
+
+from annco import index, write_annotation
+from annco.index import CorpusIndex
+from annco.model import Annotation, Interval, Tier
+
+
+@pytest.fixture
+def db(tmp_path):
+    with CorpusIndex(str(tmp_path / 'corpus.db')) as db:
+        yield db
+
+
+def _corpus(root, ann, names):
+    for name in names:
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        write_annotation(ann, str(path), 'textgrid')
+
+
+def test_ingest_and_search(db, tmp_path, ann):
+    _corpus(tmp_path / 'corpus', ann, ['a.TextGrid', 'sub/b.TextGrid'])
+
+    summary = db.ingest(str(tmp_path / 'corpus'), workers=1)
+    assert (summary['ingested'], summary['failed']) == (2, {})
+
+    hits = db.search('привіт', tier='Words')
+    assert [hit.file for hit in hits] == [str(tmp_path / 'corpus' / 'a.TextGrid'),
+                                          str(tmp_path / 'corpus' / 'sub' / 'b.TextGrid')]
+    assert (hits[0].interval.start, hits[0].interval.end) == (0.5, 1.25)
+
+
+def test_ingest_skips_unchanged_and_removes_deleted(db, tmp_path, ann):
+    root = tmp_path / 'corpus'
+    _corpus(root, ann, ['a.TextGrid', 'b.TextGrid'])
+    db.ingest(str(root), workers=1)
+
+    os.remove(root / 'b.TextGrid')
+    summary = db.ingest(str(root), workers=1)
+
+    assert (summary['ingested'], summary['skipped'], summary['removed']) == (0, 1, 1)
+    assert db.intervals(str(root / 'b.TextGrid'), 'Words') == []
+
+
+def test_ingest_skips_touched_file_with_same_content(db, tmp_path, ann):
+    root = tmp_path / 'corpus'
+    _corpus(root, ann, ['a.TextGrid'])
+    db.ingest(str(root), workers=1)
+
+    stat = os.stat(root / 'a.TextGrid')
+    os.utime(root / 'a.TextGrid', ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    assert db.ingest(str(root), workers=1)['skipped'] == 1
+
+
+def test_ingest_prefix_is_case_sensitive(db, tmp_path, ann):
+    # LIKE would take files under A for files under a which disappeared
+    _corpus(tmp_path / 'ci', ann, ['a/x.TextGrid', 'A/x.TextGrid'])
+    for name in ('A', 'a'):
+        db.ingest(str(tmp_path / 'ci' / name), workers=1)
+
+    summary = db.ingest(str(tmp_path / 'ci' / 'a'), workers=1)
+
+    assert (summary['skipped'], summary['removed']) == (1, 0)
+    for name in ('a', 'A'):
+        assert db.intervals(str(tmp_path / 'ci' / name / 'x.TextGrid'), 'Words')
+
+
+def test_ingest_reports_unreadable_files(db, tmp_path, ann):
+    root = tmp_path / 'corpus'
+    _corpus(root, ann, ['a.TextGrid'])
+    (root / 'gone.TextGrid').symlink_to(root / 'missing.TextGrid')
+
+    summary = db.ingest(str(root), workers=1)
+
+    assert summary['ingested'] == 1
+    assert list(summary['failed']) == [str(root / 'gone.TextGrid')]
+
+
+def test_parse_drops_invalid_times(tmp_path, ann, monkeypatch):
+    path = tmp_path / 'a.TextGrid'
+    _corpus(tmp_path, ann, ['a.TextGrid'])
+    broken = Annotation([Tier('Words', [Interval(0.0, 1.0, 'a'), Interval(None, 2.0, 'b'),
+                                        Interval(2.0, float('inf'), 'c')])], 3.0)
+    monkeypatch.setattr(index, 'read_annotation', lambda path: broken)
+
+    status, _, result = index._parse(str(path), None)
+
+    assert status == 'ok'
+    assert result[4] == [('Words', False, [(0.0, 1.0, 'a')])]
+    assert result[5] == 2
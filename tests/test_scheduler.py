@@ -0,0 +1,35 @@
+import os
+import time
+
+from annco.scheduler import Scheduler
+
+
+def test_timeout_respawns_worker():
+    jobs = [('slow', 10, time.sleep, (30,)), ('fast', 1, abs, (-2,)),
+            ('faster', 0, abs, (-3,))]
+
+    started = time.monotonic()
+    results = {key: (status, result)
+               for key, status, result in Scheduler(1, timeout=0.5).run(jobs)}
+
+    assert time.monotonic() - started < 10
+    assert results == {'slow': ('failed', "TimeoutError: no result after 0.5 s"),
+                       'fast': ('ok', 2), 'faster': ('ok', 3)}
+
+
+def test_dead_worker_is_replaced():
+    jobs = [('dies', 10, os._exit, (1,)), ('next', 1, abs, (-2,))]
+
+    results = {key: (status, result) for key, status, result in Scheduler(1).run(jobs)}
+
+    assert results == {'dies': ('failed', "Worker process died"), 'next': ('ok', 2)}
+
+
+def test_errors_are_reported():
+    jobs = [('bad', 1, int, ('x',)), ('good', 1, int, ('7',))]
+
+    results = {key: (status, result) for key, status, result in Scheduler(2).run(jobs)}
+
+    assert results['bad'][0] == 'failed'
+    assert results['bad'][1].startswith('ValueError: ')
+    assert results['good'] == ('ok', 7)
@@ -0,0 +1,73 @@
+import pytest
+
+from annco import validate
+from annco.model import Annotation, Interval, Tier
+from annco.validate import Issue, repair, repair_tier
+
+
+def _messy():
+    return Annotation([
+        Tier('Words', [Interval(1.0, 2.0, 'b'), Interval(0.0, 1.5, 'a'),
+                       Interval(None, None, 'y'), Interval(2.5, 7.0, 'c'),
+                       Interval(3.0, 'x', 'z')]),
+    ], 5.0)
+
+
+@pytest.mark.parametrize('fixes', [['sort'], ['clip'], ['merge'], ['sort', 'clip'],
+                                   ['drop'], list(validate.FIXES)])
+def test_repair_leaves_out_invalid_times(fixes):
+    ann = _messy()
+    issues = repair(ann, fixes)
+
+    assert Issue('Words', 'left out', 2, [2, 4]) in issues
+    assert all(isinstance(i.start, float) and isinstance(i.end, float)
+               for i in ann[0].intervals)
+
+
+def test_repair_clip():
+    ann = _messy()
+    repair(ann, ['clip'])
+
+    assert [(i.start, i.end, i.text) for i in ann[0].intervals] == [
+        (0.0, 1.0, 'a'), (1.0, 2.0, 'b'), (2.5, 5.0, 'c')]
+    assert validate.validate(ann) == []
+
+
+def test_repair_merge():
+    ann = _messy()
+    repair(ann, ['merge'])
+
+    assert [(i.start, i.end, i.text) for i in ann[0].intervals] == [
+        (0.0, 2.0, 'a b'), (2.5, 7.0, 'c')]
+
+
+def test_repair_tier_rejects_unknown_fixes():
+    with pytest.raises(ValueError):
+        repair_tier(_messy()[0], 5.0, ['shuffle'])
+
+
+def test_problems_with_invalid_times():
+    found = validate._problems([1.0, 0.0, None, 2.5, 3.0, '4'],
+                               [2.0, 1.5, None, 7.0, 'x', 4.5], 5.0, False)
+
+    assert found == {'invalid': [2, 4, 5], 'inverted': [], 'unsorted': [1],
+                     'overlap': [0], 'out of range': [3]}
+
+
+def test_problems_of_point_tier():
+    found = validate._problems([1.0, 0.5, 6.0], [1.0, 0.5, 6.0], 5.0, True)
+
+    assert found == {'invalid': [], 'inverted': [], 'unsorted': [1],
+                     'out of range': [2]}
+
+
+@pytest.mark.parametrize('is_point', [False, True])
+def test_numpy_and_plain_python_agree(monkeypatch, is_point):
+    pytest.importorskip('numpy')
+    starts = [1.0, 0.0, None, 2.5, float('nan'), 3, '4', 4.0, -1.0]
+    ends = [2.0, 1.5, None, 7.0, 3.0, 3.5, 4.5, 3.9, 0.5]
+
+    with_numpy = validate._problems(starts, ends, 5.0, is_point)
+    monkeypatch.setattr(validate, 'np', None)
+
+    assert validate._problems(starts, ends, 5.0, is_point) == with_numpy
@@ -0,0 +1,66 @@
+import io
+import re
+
+from functools import partial
+
+import pytest
+
+from annco import TierCache, formats, write_annotation
+from annco.model import Interval
+
+
+OUTPUTS = [('textgrid', {'tg_mode': 'long'}), ('textgrid', {'tg_mode': 'short'}),
+           ('textgrid', {'tg_mode': 'binary'}), ('eaf', {}), ('antx', {})]
+
+UUID = re.compile(rb'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}')
+
+
+def _written(ann, fmt, **options) -> bytes:
+    f = io.BytesIO()
+    write_annotation(ann, f, fmt, **options)
+    data = f.getvalue()
+
+    if fmt == 'antx':
+        # IDs of .antx elements are random, number them in order instead
+        ids = {}
+        data = UUID.sub(lambda m: b'id%d' % ids.setdefault(m.group(), len(ids)), data)
+
+    return data
+
+
+@pytest.mark.parametrize('fmt, options', OUTPUTS)
+def test_chunked_writer_matches_plain(big_ann, fmt, options, monkeypatch):
+    # tiers are cut in the parent, so smaller chunks reach the workers too
+    monkeypatch.setattr(formats, 'chunks', partial(formats.chunks, size=400))
+
+    assert (_written(big_ann, fmt, write_workers=2, **options)
+            == _written(big_ann, fmt, **options))
+
+
+@pytest.mark.parametrize('fmt, options', OUTPUTS)
+def test_cached_writer_matches_plain(ann, fmt, options):
+    cache = TierCache()
+    assert _written(ann, fmt, tier_cache=cache, **options) == _written(ann, fmt, **options)
+
+    # unchanged annotation is put together from the cache
+    assert _written(ann, fmt, tier_cache=cache, **options) == _written(ann, fmt, **options)
+
+    ann[0].relabel(1, 'змінено')
+    ann[1].insert(Interval(2.5, 3.5, 'new'))
+    ann[1].retime(0, 0.4, 0.8)
+    assert _written(ann, fmt, tier_cache=cache, **options) == _written(ann, fmt, **options)
+
+    ann[0].remove(2)
+    ann[1].intervals.append(Interval(4.0, 4.5, 'touched'))
+    ann[1].touch()
+    assert _written(ann, fmt, tier_cache=cache, **options) == _written(ann, fmt, **options)
+
+
+@pytest.mark.parametrize('fmt, options', OUTPUTS)
+def test_cached_writer_large_tiers(big_ann, fmt, options):
+    cache = TierCache()
+    _written(big_ann, fmt, tier_cache=cache, **options)
+    big_ann[0].relabel(100, 'edited')
+
+    assert (_written(big_ann, fmt, tier_cache=cache, **options)
+            == _written(big_ann, fmt, **options))